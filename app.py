@@ -1,11 +1,59 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from datetime import datetime
-import time
+import os
 
-from preprocess import load_and_preprocess_data
+from data_cache import load_and_preprocess_cached
 from model import train_isolation_forest, predict_anomalies
+from artifact import (DEFAULT_ARTIFACT_PATH, build_artifact, load_artifact, require_single_forest,
+                      transform_with_artifact)
+from retrain import BackgroundRetrainer, ModelHolder, RollingWindow, TrainingJob, DEFAULT_WINDOW_ROWS
+from model_cache import ModelCache, canonical_params, config_key
+from thresholds import ScoreIndex
+from downsample import decimate
+from summary_store import RankedSummaryStore
+from export import EXPORT_CHUNK_ROWS, EXPORT_FORMATS, export_chunks, parquet_available
+from features import raw_columns
+from kpi_store import KpiStore, MANIFEST, SCORE_COLUMN
+from preprocess import preprocess_frame
+from results_db import ResultsDB, model_label, run_source
+
+# Jeu de données analysé
+DATA_CSV = os.environ.get("KPI_DATA_CSV", "kpi_5g.csv")
+
+# Stockage KPI partitionné (python kpi_store.py build ...) : remplace le CSV,
+# les pages travaillent sur une fenêtre de temps
+KPI_STORE = os.environ.get("KPI_STORE")
+
+# Base SQLite des résultats (results_db.py), remplie par main.py / streaming.py
+# (--results-db) : l'application y retrouve la dernière exécution des données
+# affichées et lit ses pages par requêtes indexées ; elle n'y écrit jamais
+# (vide ou aucune exécution = scoring et tri en mémoire)
+RESULTS_DB = os.environ.get("KPI_RESULTS_DB")
+
+# Artefact modèle pré-entraîné (python main.py --save-model ...)
+# Avec un stockage : son artefact par défaut (scores déjà stockés)
+MODEL_ARTIFACT = os.environ.get("KPI_MODEL_ARTIFACT")
+if MODEL_ARTIFACT is None and KPI_STORE and os.path.exists(os.path.join(KPI_STORE, "model_artifact.joblib")):
+    MODEL_ARTIFACT = os.path.join(KPI_STORE, "model_artifact.joblib")
+MODEL_ARTIFACT = MODEL_ARTIFACT or DEFAULT_ARTIFACT_PATH
+
+# Réentraînement en arrière-plan : période en secondes (vide = à la demande)
+RETRAIN_INTERVAL = float(os.environ["KPI_RETRAIN_INTERVAL"]) if os.environ.get("KPI_RETRAIN_INTERVAL") else None
+RETRAIN_WINDOW_ROWS = int(os.environ.get("KPI_RETRAIN_WINDOW", DEFAULT_WINDOW_ROWS))
+
+# Hyperparamètres du modèle initial (valeurs par défaut de train_isolation_forest)
+DEFAULT_MODEL_PARAMS = {"contamination": 0.05, "n_estimators": 200, "max_features": 1.0}
+
+# Graphique temporel : budget de points envoyés au navigateur
+CHART_MAX_POINTS = 4000
+CHART_MAX_ANOMALIES = 20_000   # Au-delà, seules les plus critiques sont tracées
+WEBGL_MIN_POINTS = 1000        # Rendu WebGL (Scattergl) au-delà de ce nombre de points
+
+# Page Anomalies : lignes par page du tableau
+PAGE_SIZES = [10, 20, 50, 100, 500]
 
 # ======================================================
 # CONFIGURATION PAGE
@@ -208,30 +256,257 @@ st.markdown("""
 # ======================================================
 # CHARGEMENT DONNÉES & MODÈLE
 # ======================================================
-@st.cache_data(show_spinner=False)
-def load_data():
-    return load_and_preprocess_data("kpi_5g.csv")
+# Clés de cache peu coûteuses : (taille, date de modification) du fichier
+# et version du modèle, au lieu de hacher X_scaled à chaque rerun
+def file_key(path):
+    stat = os.stat(path)
+    return (path, stat.st_size, stat.st_mtime_ns)
+
+def store_key(root, start, end):
+    # Fenêtre d'un stockage : révision du manifeste (ajouts) + bornes
+    return ("store", root, os.stat(os.path.join(root, MANIFEST)).st_mtime_ns, start, end)
 
 @st.cache_resource(show_spinner=False)
-def load_model(X):
-    return train_isolation_forest(X)
+def get_store(root, manifest_mtime):
+    return KpiStore(root)
 
-# Animation de chargement
-with st.spinner(" **Analyse des KPI 5G en cours...**"):
-    progress_bar = st.progress(0)
-    for i in range(100):
-        time.sleep(0.01)
-        progress_bar.progress(i + 1)
-    
-    df, df_numeric, X_scaled = load_data()
-    model = load_model(X_scaled)
-    predictions, scores = predict_anomalies(model, X_scaled)
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_data(data_key):
+    # cache_resource : pas de copie du DataFrame à chaque rerun (lecture seule)
+    if data_key[0] == "store":
+        # Seules les partitions de la fenêtre sont lues
+        store = get_store(data_key[1], data_key[2])
+        df = store.query(data_key[3], data_key[4], [c for c in store.columns if c != SCORE_COLUMN])
+        if df.empty:
+            return df, df, np.empty((0, df.shape[1]))
+        df_numeric, X_scaled = preprocess_frame(df)
+        return df, df_numeric, X_scaled
+    return load_and_preprocess_cached(data_key[0])
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def stored_scores(data_key):
+    # Scores bruts de la fenêtre, calculés à la construction du stockage
+    return get_store(data_key[1], data_key[2]).query(data_key[3], data_key[4], [SCORE_COLUMN])[SCORE_COLUMN].to_numpy()
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def training_data(model_key):
+    # Données d'entraînement : le fichier, ou les lignes les plus récentes du stockage
+    if model_key[0] == "store":
+        store = get_store(model_key[1], model_key[2])
+        df = store.tail(RETRAIN_WINDOW_ROWS, [c for c in store.columns if c != SCORE_COLUMN])
+        df_numeric, X_scaled = preprocess_frame(df)
+        return df, df_numeric, X_scaled
+    return load_data(model_key)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_model(model_key):
+    df, df_numeric, X_scaled = training_data(model_key)
+    return train_isolation_forest(X_scaled)
+
+@st.cache_resource(show_spinner=False)
+def load_model_artifact(path, mtime):
+    # mtime dans la clé : un artefact redéployé est rechargé
+    return require_single_forest(load_artifact(path), "l'application")
+
+@st.cache_resource(show_spinner=False)
+def get_model_cache():
+    # Modèles entraînés par (données, hyperparamètres), partagés entre sessions
+    return ModelCache()
+
+@st.cache_resource(show_spinner=False)
+def get_training_jobs():
+    # Jobs d'entraînement en cours ou terminés, par clé de configuration
+    return {}
+
+@st.cache_resource(show_spinner=False)
+def get_retrainer(model_key, artifact_mtime):
+    # Modèle initial (artefact ou entraînement) + fenêtre glissante des KPI récents
+    # (un seul modèle par stockage, quelle que soit la fenêtre affichée)
+    df, df_numeric, X_scaled = training_data(model_key)
+    if artifact_mtime is not None:
+        artifact = load_model_artifact(MODEL_ARTIFACT, artifact_mtime)
+    else:
+        artifact = build_artifact(load_model(model_key), df_numeric)
+        params = canonical_params(DEFAULT_MODEL_PARAMS, X_scaled.shape[1])
+        get_model_cache().put(config_key(model_key, **params), artifact)
+    # Colonnes brutes uniquement : les features temporelles sont recalculées au réentraînement
+    window = RollingWindow(raw_columns(artifact["stats"]["columns"], artifact.get("features")),
+                           capacity=RETRAIN_WINDOW_ROWS)
+    window.append(df)
+    retrainer = BackgroundRetrainer(ModelHolder(artifact), window, interval=RETRAIN_INTERVAL)
+    retrainer.start()
+    return retrainer
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def score_data(data_key, artifact_mtime, model_version, use_stored, _artifact):
+    """
+    Scoring et tri par score : calculés une fois par (données, modèle), puis
+    partagés en lecture seule par tous les reruns. Le seuil d'anomalie n'est
+    appliqué qu'ensuite (view_for_count) : changer de taux ne rescore rien.
+    use_stored : scores bruts lus dans le stockage (artefact du stockage)
+    """
+    df, df_numeric, _ = load_data(data_key)
+    if use_stored:
+        scores = stored_scores(data_key) - _artifact["threshold"]
+        predictions = np.where(scores < 0, -1, 1)
+    else:
+        X_scaled = transform_with_artifact(df, _artifact)
+        predictions, scores = predict_anomalies(_artifact["model"], X_scaled)
+    model = _artifact["model"]
+    return rank_results(df, scores, predictions, _artifact.get("threshold") or 0.0,
+                        _artifact.get("train_scores"), getattr(model, "contamination", "auto"))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def run_results(data_key, run_id, _run, _artifact):
+    """
+    Résultats lus dans une exécution de la base (main.py --results-all) :
+    aucun scoring. None si l'exécution ne couvre pas chaque ligne affichée
+    (anomalies seules, scores manquants).
+    """
+    df, _, _ = load_data(data_key)
+    if _run["rows"] != len(df):
+        return None
+    source_rows, scores, predictions = get_results_db(RESULTS_DB).scores(run_id)
+    positions = df.index.get_indexer(source_rows)
+    if (positions < 0).any() or np.isnan(scores).any():
+        return None
+    aligned_scores = np.empty(len(df))
+    aligned_scores[positions] = scores
+    aligned_predictions = np.empty(len(df), dtype=np.int64)
+    aligned_predictions[positions] = predictions
+
+    # Scores d'entraînement et taux de l'artefact seulement s'il a produit l'exécution
+    same_model = _run["model_version"] == model_label(_artifact)
+    contamination = getattr(_artifact["model"], "contamination", "auto") if same_model else "auto"
+    return rank_results(df, aligned_scores, aligned_predictions, _run["threshold"] or 0.0,
+                        _artifact.get("train_scores") if same_model else None, contamination)
+
+def rank_results(df, scores, predictions, offset, train_scores, contamination):
+    """
+    Index trié par score et statistiques partagés par score_data et run_results
+    """
+    # Nouveau DataFrame : le DataFrame en cache n'est jamais modifié
+    scored = df.assign(anomaly_score=scores)
+
+    # Index trié par score : les k plus bas sont les anomalies de tout seuil,
+    # score moyen de toute coupure par sommes cumulées
+    order = np.argsort(scores, kind="stable")
+    sorted_scores = scores[order]
+
+    # Scores bruts d'entraînement (taux -> seuil) ; à défaut, ceux des données affichées
+    train_index = ScoreIndex(train_scores if train_scores is not None else sorted_scores + offset,
+                             presorted=True)
+
+    return {
+        "df": scored,
+        "ranked": scored.iloc[order],
+        "order": order,
+        "sorted_scores": sorted_scores,
+        "score_cumsum": np.concatenate([[0.0], np.cumsum(sorted_scores)]),
+        "offset": offset,
+        "train_index": train_index,
+        "default_count": int((predictions == -1).sum()),
+        "default_rate": float(contamination) if contamination != "auto" else None,
+        "score_min": float(scores.min()),
+        "score_max": float(scores.max()),
+        "score_mean": float(scores.mean()),
+        "score_q80": float(np.quantile(scores, 0.8)),
+    }
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def view_for_count(data_key, results_key, n_anomalies, _results):
+    """
+    Séparation normal / anomalies pour les n_anomalies scores les plus bas
+    """
+    df = _results["df"]
+    is_anomaly = np.zeros(len(df), dtype=bool)
+    is_anomaly[_results["order"][:n_anomalies]] = True
+    normal_pos = np.flatnonzero(~is_anomaly)
+    return {
+        "anomalies": _results["ranked"].iloc[:n_anomalies],
+        "is_anomaly": is_anomaly,
+        # Positions (triées) pour extraire rapidement une plage du graphique
+        "normal_pos": normal_pos,
+        "anomaly_pos": np.flatnonzero(is_anomaly),
+        "anomaly_scores": _results["sorted_scores"][:n_anomalies],
+    }
+
+@st.cache_resource(show_spinner=False)
+def get_results_db(path):
+    # Connexion unique (verrouillée) partagée par toutes les sessions
+    return ResultsDB(path)
+
+def latest_run(source):
+    # Requête indexée à chaque rerun : une exécution terminée entre-temps est vue
+    return get_results_db(RESULTS_DB).latest_run(source) if RESULTS_DB else None
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def ranked_summary(data_key, results_key, columns, _results):
+    # Résumés par blocs des lignes triées par score : construits une fois par résultats
+    return RankedSummaryStore(_results["ranked"], columns)
 
-df["anomaly"] = predictions
-df["anomaly_score"] = scores
+@st.cache_resource(show_spinner=False, max_entries=4)
+def class_summary(data_key, results_key, n_anomalies, columns, _results):
+    # Résumés par KPI et par classe (box plots, statistiques descriptives) :
+    # un changement de seuil ne relit que le bloc coupé
+    return ranked_summary(data_key, results_key, columns, _results).at(n_anomalies)
 
-anomalies = df[df["anomaly"] == -1].sort_values("anomaly_score")
-normal = df[df["anomaly"] == 1]
+# Fenêtre de temps (stockage partitionné) : choisie avant tout chargement
+store = None
+if KPI_STORE:
+    store = get_store(KPI_STORE, os.stat(os.path.join(KPI_STORE, MANIFEST)).st_mtime_ns)
+    t_min, t_max = store.time_bounds()
+    if t_min is None:
+        st.warning("Aucune mesure dans le stockage KPI")
+        st.stop()
+    if t_min == t_max:
+        # Un seul instant stocké : le slider exige min < max
+        t_max = t_min + store.bucket_width
+    with st.sidebar:
+        st.markdown("### 🕒 Fenêtre temporelle")
+        # Par défaut : la dernière tranche du stockage
+        window_start, window_end = st.slider(
+            "Plage de temps",
+            min_value=t_min,
+            max_value=t_max,
+            value=(max(t_min, t_max - store.bucket_width), t_max),
+            key="time_window",
+            help="Seules les partitions de la plage sont lues"
+        )
+        st.caption(f"{len(store.partitions_for(window_start, window_end))} partition(s) "
+                   f"sur {len(store.manifest['partitions'])}, {store.n_rows:,} lignes au total")
+
+with st.spinner(" **Analyse des KPI 5G en cours...**"):
+    if store is not None:
+        data_key = store_key(KPI_STORE, window_start, window_end)
+        model_key = data_key[:3]
+        source = run_source(KPI_STORE, (window_start, window_end))
+    else:
+        data_key = model_key = file_key(DATA_CSV)
+        source = run_source(DATA_CSV)
+    artifact_mtime = os.path.getmtime(MODEL_ARTIFACT) if os.path.exists(MODEL_ARTIFACT) else None
+    _, df_numeric, _ = load_data(data_key)
+    if df_numeric.empty:
+        st.warning("Aucune mesure dans cette fenêtre de temps")
+        st.stop()
+    retrainer = get_retrainer(model_key, artifact_mtime)
+    # Artefact courant : remplacé atomiquement par le thread de réentraînement
+    artifact = retrainer.holder.get()
+    model_version = artifact.get("model_version", 1)
+    # Scores du stockage valables tant que son artefact n'a pas été remplacé
+    use_stored = (store is not None and store.has_scores and model_version == 1
+                  and MODEL_ARTIFACT == store.artifact_path)
+    # Exécution enregistrée de ces données : scores lus dans la base si elle
+    # couvre toutes les lignes, sinon scoring en mémoire
+    run = latest_run(source)
+    results = run_results(data_key, run["id"], run, artifact) if run is not None else None
+    if results is not None:
+        results_key = ("run", run["id"])
+    else:
+        results_key = (artifact_mtime, model_version)
+        results = score_data(data_key, artifact_mtime, model_version, use_stored, artifact)
+
+df = results["df"]
 
 # ======================================================
 # SIDEBAR MODERNE
@@ -262,13 +537,33 @@ with st.sidebar:
     # État du système
     st.markdown("### 📊 État du système")
     
-    rate = len(anomalies) / len(df)
+    # Taux de contamination : seuil lu dans les scores triés, sans refit
+    default_rate = results["default_rate"]
+    if default_rate is None:
+        default_rate = results["default_count"] / len(df)
+    contamination_rate = st.slider(
+        "Taux d'anomalies attendu",
+        min_value=0.0,
+        max_value=0.5,
+        value=float(default_rate),
+        step=0.005,
+        format="%.3f",
+        key=f"contamination_rate_{model_version}",
+        help="Seuil recalculé à partir des scores d'entraînement, sans réentraîner le modèle"
+    )
+    if contamination_rate == default_rate:
+        n_anomalies = results["default_count"]
+    else:
+        threshold = results["train_index"].threshold_for_rate(contamination_rate)
+        n_anomalies = int(np.searchsorted(results["sorted_scores"], threshold - results["offset"]))
+    
+    rate = n_anomalies / len(df)
     
     col1, col2 = st.columns(2)
     with col1:
         st.metric("Échantillons", f"{len(df):,}")
     with col2:
-        st.metric("Anomalies", len(anomalies), delta=f"{rate*100:.1f}%")
+        st.metric("Anomalies", n_anomalies, delta=f"{rate*100:.1f}%")
     
     # Indicateur d'état
     if rate < 0.05:
@@ -291,6 +586,11 @@ with st.sidebar:
     </div>
     """.format(datetime.now().strftime("%d/%m/%Y %H:%M:%S")), unsafe_allow_html=True)
 
+# Vue du seuil courant (mise en cache par nombre d'anomalies)
+view = view_for_count(data_key, results_key, n_anomalies, results)
+anomalies = view["anomalies"]
+normal = df.iloc[view["normal_pos"][:5]]   # Aperçu : premières lignes normales
+
 # ======================================================
 # FONCTION KPI CARD MODERNE
 # ======================================================
@@ -347,7 +647,7 @@ if page == "🏠 Dashboard":
     with col3:
         st.markdown(modern_kpi_card(
             "Score moyen", 
-            f"{df['anomaly_score'].mean():.2f}", 
+            f"{results['score_mean']:.2f}", 
             "📈", 
             "#10b981",
             "Score de confiance IA"
@@ -381,14 +681,56 @@ if page == "🏠 Dashboard":
             key="kpi_select",
             label_visibility="collapsed"
         )
+    with col2:
+        lod_method = st.selectbox(
+            "Réduction",
+            ["minmax", "lttb"],
+            format_func=lambda m: {"minmax": "Min/max (pics)", "lttb": "LTTB (forme)"}[m],
+            key="lod_method",
+            label_visibility="collapsed"
+        )
+    
+    # Plage affichée : zoomer relance l'extraction sur une tranche plus fine
+    n_rows = len(df)
+    lo, hi = 0, n_rows - 1
+    if n_rows > CHART_MAX_POINTS:
+        lo, hi = st.slider(
+            "Plage affichée (lignes)",
+            min_value=0,
+            max_value=n_rows - 1,
+            value=(0, n_rows - 1),
+            key="chart_range"
+        )
+    
+    x_all = df.index.to_numpy()
+    y_all = df[selected_kpi].to_numpy()
+    
+    # Trafic normal de la plage, réduit à ~CHART_MAX_POINTS points
+    normal_pos = view["normal_pos"]
+    normal_pos = normal_pos[np.searchsorted(normal_pos, lo):np.searchsorted(normal_pos, hi, side="right")]
+    normal_pos = normal_pos[decimate(y_all[normal_pos], CHART_MAX_POINTS, method=lod_method)]
+    
+    # Anomalies de la plage : toutes conservées (les plus critiques si trop nombreuses)
+    anomaly_pos = view["anomaly_pos"]
+    anomaly_pos = anomaly_pos[np.searchsorted(anomaly_pos, lo):np.searchsorted(anomaly_pos, hi, side="right")]
+    scores_all = df["anomaly_score"].to_numpy()
+    if len(anomaly_pos) > CHART_MAX_ANOMALIES:
+        critical = np.argpartition(scores_all[anomaly_pos], CHART_MAX_ANOMALIES)[:CHART_MAX_ANOMALIES]
+        anomaly_pos = np.sort(anomaly_pos[critical])
+        st.caption(f"{CHART_MAX_ANOMALIES:,} anomalies les plus critiques affichées : zoomez pour toutes les voir")
+    
+    def scatter(n_points, **kwargs):
+        # WebGL pour les traces volumineuses, SVG sinon
+        return go.Scattergl(**kwargs) if n_points > WEBGL_MIN_POINTS else go.Scatter(**kwargs)
     
     # Graphique interactif
     fig = go.Figure()
     
     # Ligne normale
-    fig.add_trace(go.Scatter(
-        x=normal.index,
-        y=normal[selected_kpi],
+    fig.add_trace(scatter(
+        len(normal_pos),
+        x=x_all[normal_pos],
+        y=y_all[normal_pos],
         mode="lines",
         name="Trafic normal",
         line=dict(color="#10b981", width=2),
@@ -398,10 +740,11 @@ if page == "🏠 Dashboard":
     ))
     
     # Points d'anomalies
-    if len(anomalies) > 0:
-        fig.add_trace(go.Scatter(
-            x=anomalies.index,
-            y=anomalies[selected_kpi],
+    if len(anomaly_pos) > 0:
+        fig.add_trace(scatter(
+            len(anomaly_pos),
+            x=x_all[anomaly_pos],
+            y=y_all[anomaly_pos],
             mode="markers",
             name="Anomalies",
             marker=dict(
@@ -411,7 +754,7 @@ if page == "🏠 Dashboard":
                 line=dict(width=1, color="white")
             ),
             hovertemplate="<b>ANOMALIE</b><br>Valeur: %{y:.2f}<br>Score: %{customdata}<extra></extra>",
-            customdata=anomalies["anomaly_score"].round(3)
+            customdata=scores_all[anomaly_pos].round(3)
         ))
     
     fig.update_layout(
@@ -475,22 +818,27 @@ elif page == "📈 Analyse KPI":
         </div>
         """, unsafe_allow_html=True)
     
-    # Graphique boxplot
+    # Graphique boxplot (statistiques précalculées : aucune colonne brute envoyée)
+    summary = class_summary(data_key, results_key, n_anomalies, tuple(df_numeric.columns), results)
     fig_box = go.Figure()
     
-    fig_box.add_trace(go.Box(
-        y=normal[selected_kpi],
-        name="Normal",
-        marker_color="#10b981",
-        boxmean='sd'
-    ))
-    
-    fig_box.add_trace(go.Box(
-        y=anomalies[selected_kpi],
-        name="Anomalies",
-        marker_color="#ef4444",
-        boxmean='sd'
-    ))
+    for label, name, color in [(1, "Normal", "#10b981"), (-1, "Anomalies", "#ef4444")]:
+        box = summary.stats(selected_kpi, label)
+        if not box["count"]:
+            continue
+        fig_box.add_trace(go.Box(
+            x=[name],
+            q1=[box["q1"]],
+            median=[box["median"]],
+            q3=[box["q3"]],
+            lowerfence=[box["lower_fence"]],
+            upperfence=[box["upper_fence"]],
+            mean=[box["mean"]],
+            sd=[box["std"]],
+            name=name,
+            marker_color=color,
+            boxmean='sd'
+        ))
     
     fig_box.update_layout(
         title=f"Distribution de {selected_kpi}",
@@ -514,8 +862,8 @@ elif page == "📈 Analyse KPI":
             <h4 style="color: white; margin: 0 0 16px 0;">📈 Statistiques descriptives</h4>
         """, unsafe_allow_html=True)
         
-        stats_normal = normal[selected_kpi].describe()
-        stats_anomalies = anomalies[selected_kpi].describe()
+        stats_normal = summary.describe(selected_kpi, 1)
+        stats_anomalies = summary.describe(selected_kpi, -1)
         
         for stat in ['mean', 'std', 'min', '50%', 'max']:
             col_stat1, col_stat2, col_stat3 = st.columns(3)
@@ -569,16 +917,16 @@ elif page == "🚨 Anomalies":
     with col1:
         min_score = st.slider(
             "Score minimum",
-            min_value=float(df['anomaly_score'].min()),
-            max_value=float(df['anomaly_score'].max()),
-            value=float(df['anomaly_score'].quantile(0.8)),
+            min_value=results["score_min"],
+            max_value=results["score_max"],
+            value=results["score_q80"],
             step=0.01
         )
     
     with col2:
-        show_count = st.select_slider(
-            "Nombre d'anomalies à afficher",
-            options=[10, 20, 50, 100, "Toutes"],
+        page_size = st.select_slider(
+            "Anomalies par page",
+            options=PAGE_SIZES,
             value=20
         )
     
@@ -589,11 +937,45 @@ elif page == "🚨 Anomalies":
             default=["Moyen", "Élevé"]
         )
     
-    # Filtrage des anomalies
-    filtered_anomalies = anomalies[anomalies['anomaly_score'] >= min_score]
-    
-    if show_count != "Toutes":
-        filtered_anomalies = filtered_anomalies.head(show_count)
+    # Exécution de la base cohérente avec les scores affichés : lue par
+    # requêtes si elle contient toutes les lignes, ou, pour le même modèle,
+    # toutes les anomalies du seuil courant (seuil au plus aussi large que
+    # celui de l'exécution : ses anomalies seules sont enregistrées) ; sinon
+    # index trié en mémoire
+    if run is not None and (results_key == ("run", run["id"])
+                            or (run["model_version"] == model_label(artifact)
+                                and n_anomalies <= (run["anomalies"] or 0))):
+        # Base de résultats : comptage et pages par requêtes sur l'index
+        # (run, score), bornées par le score de la n-ième anomalie
+        results_db = get_results_db(RESULTS_DB)
+        max_score = float(view["anomaly_scores"][-1]) if n_anomalies else -np.inf
+        n_filtered, avg_score = results_db.count(run["id"], min_score=min_score, max_score=max_score)
+        st.caption(f"Exécution {run['id']} du {run['created_at']} (modèle {run['model_version']})")
+
+        def fetch_anomalies(offset=0, limit=None):
+            return results_db.query(run["id"], min_score=min_score, max_score=max_score,
+                                    limit=limit, offset=offset)
+
+        def export_pages():
+            # Pagination par clé (score, rowid) : export complet en temps linéaire
+            return results_db.iter_query(run["id"], min_score=min_score, max_score=max_score,
+                                         page_rows=EXPORT_CHUNK_ROWS)
+    else:
+        # Filtrage des anomalies : recherche dichotomique dans l'index trié par score
+        anomaly_scores = view["anomaly_scores"]
+        cut = int(np.searchsorted(anomaly_scores, min_score, side="left"))
+        n_filtered = len(anomaly_scores) - cut
+        filtered_anomalies = anomalies.iloc[cut:]   # Tranche : aucune copie ni masque
+        cumsum = results["score_cumsum"]
+        avg_score = (cumsum[n_anomalies] - cumsum[cut]) / n_filtered if n_filtered else None
+
+        def fetch_anomalies(offset=0, limit=None):
+            return filtered_anomalies.iloc[offset:None if limit is None else offset + limit]
+
+        def export_pages():
+            # Tranches successives de l'index trié : aucune copie de l'ensemble
+            for offset in range(0, n_filtered, EXPORT_CHUNK_ROWS):
+                yield fetch_anomalies(offset, EXPORT_CHUNK_ROWS)
     
     # Tableau des anomalies
     st.markdown("""
@@ -603,26 +985,33 @@ elif page == "🚨 Anomalies":
     # En-tête avec compteur
     col_header1, col_header2 = st.columns([3, 1])
     with col_header1:
-        st.markdown(f"### {len(filtered_anomalies)} anomalies critiques")
+        st.markdown(f"### {n_filtered} anomalies critiques")
     with col_header2:
-        if len(filtered_anomalies) > 0:
-            avg_score = filtered_anomalies['anomaly_score'].mean()
+        if n_filtered > 0:
             st.metric("Score moyen", f"{avg_score:.3f}")
     
     st.markdown("</div>", unsafe_allow_html=True)
     
     # Tableau interactif
-    if len(filtered_anomalies) > 0:
+    if n_filtered > 0:
         display_cols = ["anomaly_score"] + df_numeric.columns.tolist()[:6]
         
-        # Style conditionnel pour le tableau
-        styled_df = filtered_anomalies[display_cols].copy()
-        
-        # Formater les scores
-        styled_df['anomaly_score'] = styled_df['anomaly_score'].apply(lambda x: f"{x:.3f}")
+        # Pagination : seule la page affichée est extraite
+        n_pages = -(-n_filtered // page_size)
+        if st.session_state.get("anomaly_page", 1) > n_pages:
+            st.session_state["anomaly_page"] = n_pages
+        page_number = st.number_input(
+            f"Page (sur {n_pages:,})",
+            min_value=1,
+            max_value=n_pages,
+            step=1,
+            key="anomaly_page"
+        )
+        start = (page_number - 1) * page_size
+        page_rows = fetch_anomalies(start, page_size)[display_cols]
         
         st.dataframe(
-            styled_df,
+            page_rows,
             use_container_width=True,
             height=400,
             column_config={
@@ -630,19 +1019,35 @@ elif page == "🚨 Anomalies":
                     "Score d'anomalie",
                     help="Score IA de détection d'anomalie",
                     format="%.3f",
-                    min_value=float(df['anomaly_score'].min()),
-                    max_value=float(df['anomaly_score'].max())
+                    min_value=results["score_min"],
+                    max_value=results["score_max"]
                 )
             }
         )
+        st.caption(f"Lignes {start + 1:,} à {min(start + page_size, n_filtered):,} sur {n_filtered:,}")
+        
+        # Téléchargement des anomalies : fichier généré par blocs au clic
+        formats = ["csv", "parquet"] if parquet_available() else ["csv"]
+        export_format = st.radio("Format d'export", formats, horizontal=True,
+                                 format_func=str.upper)
         
-        # Téléchargement des anomalies
-        csv = filtered_anomalies.to_csv(index=False).encode('utf-8')
+        def export_file():
+            # Streamlit garde de toute façon le contenu en mémoire : octets lus
+            # puis fichier temporaire fermé et supprimé
+            path = export_chunks(export_pages(), export_format)
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            finally:
+                os.unlink(path)
+        
+        mime, extension = EXPORT_FORMATS[export_format]
         st.download_button(
             label="📥 Exporter les anomalies",
-            data=csv,
-            file_name=f"anomalies_5g_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-            mime="text/csv"
+            data=export_file,
+            file_name=f"anomalies_5g_{datetime.now().strftime('%Y%m%d_%H%M')}{extension}",
+            mime=mime,
+            on_click="ignore"
         )
     else:
         st.markdown("""
@@ -678,7 +1083,7 @@ elif page == "⚙️ Paramètres":
             "Taux de contamination estimé",
             min_value=0.01,
             max_value=0.5,
-            value=0.1,
+            value=DEFAULT_MODEL_PARAMS["contamination"],
             step=0.01,
             help="Proportion attendue d'anomalies dans les données"
         )
@@ -686,7 +1091,7 @@ elif page == "⚙️ Paramètres":
         n_estimators = st.selectbox(
             "Nombre d'arbres",
             [50, 100, 200, 500],
-            index=1,
+            index=[50, 100, 200, 500].index(DEFAULT_MODEL_PARAMS["n_estimators"]),
             help="Nombre d'arbres dans la forêt d'isolation"
         )
         
@@ -694,11 +1099,85 @@ elif page == "⚙️ Paramètres":
             "Nombre maximum de features",
             min_value=1,
             max_value=len(df_numeric.columns),
-            value=min(10, len(df_numeric.columns)),
+            # Valeurs par défaut : configuration du modèle initial (déjà en cache)
+            value=canonical_params(DEFAULT_MODEL_PARAMS, len(df_numeric.columns))["max_features"],
             step=1
         )
         
-        st.button("🔄 Réentraîner le modèle", use_container_width=True)
+        # Forme canonique : la configuration par défaut (max_features=1.0)
+        # retrouve le modèle initial dans le cache
+        params = canonical_params({
+            "contamination": float(contamination),
+            "n_estimators": int(n_estimators),
+            "max_features": max_features,
+        }, len(df_numeric.columns))
+        key = config_key(model_key, **params)
+        model_cache = get_model_cache()
+        jobs = get_training_jobs()
+        
+        if st.button("🔄 Réentraîner le modèle", use_container_width=True):
+            cached = model_cache.get(key)
+            if cached is not None:
+                # Configuration déjà entraînée : aucun fit
+                retrainer.holder.swap(dict(cached))
+                retrainer.params = params
+                st.toast("Modèle déjà entraîné avec ces paramètres : restauré depuis le cache")
+                st.rerun()
+            elif key in jobs and jobs[key].is_alive():
+                st.info("Entraînement déjà en cours pour ces paramètres")
+            else:
+                def publish(new_artifact, key=key, params=params):
+                    model_cache.put(key, new_artifact)
+                    retrainer.holder.swap(dict(new_artifact))
+                    # Les réentraînements sur la fenêtre glissante suivent la nouvelle configuration
+                    retrainer.params = params
+                
+                _, df_train, X_train = training_data(model_key)
+                jobs[key] = TrainingJob(X_train, df_train, on_done=publish, **params)
+                jobs[key].start()
+                st.session_state["training_watch"] = True
+        
+        @st.fragment(run_every=1.0)
+        def training_progress():
+            for k in [k for k, job in jobs.items() if job.status == "done"]:
+                del jobs[k]   # Le modèle est dans le cache
+            running = [(k, job) for k, job in jobs.items() if job.is_alive()]
+            for (_, job_params), job in running:
+                job_config = dict(job_params)
+                st.progress(job.progress, text=(
+                    f"Entraînement en cours : {job_config['n_estimators']} arbres, "
+                    f"contamination {job_config['contamination']:.2f}, "
+                    f"{job_config['max_features']} features"
+                ))
+            for job in jobs.values():
+                if job.status == "error":
+                    st.warning(f"Échec de l'entraînement : {job.error}")
+            # Fin d'un job lancé depuis cette session : rerun complet pour rescorer
+            if not running and st.session_state.pop("training_watch", False):
+                st.rerun(scope="app")
+        
+        training_progress()
+        
+        # Suivi du réentraînement (dimensionnement de la cadence vs budget CPU)
+        retrain_stats = retrainer.metrics()
+        st.caption(
+            f"Modèle v{retrain_stats['model_version']} • "
+            f"{retrain_stats['retrain_count']} réentraînement(s) • "
+            f"fenêtre {retrain_stats['window_rows']:,}/{retrain_stats['window_capacity']:,} lignes"
+        )
+        if retrain_stats["last_duration_s"] is not None:
+            st.caption(
+                f"Dernier entraînement : {retrain_stats['last_duration_s']:.2f} s sur "
+                f"{retrain_stats['last_window_rows']:,} lignes • "
+                f"swaps : {', '.join(retrain_stats['swaps'][-3:])}"
+            )
+        if retrain_stats["last_error"]:
+            st.warning(retrain_stats["last_error"])
+        cache_stats = model_cache.metrics()
+        st.caption(
+            f"Cache modèles : {cache_stats['entries']} configuration(s), "
+            f"{cache_stats['nbytes'] / 2**20:.1f}/{cache_stats['budget_bytes'] / 2**20:.0f} Mo"
+        )
         
         st.markdown("</div>", unsafe_allow_html=True)
     
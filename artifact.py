@@ -0,0 +1,132 @@
+# artifact.py
+# Artefact modèle versionné :
+# - Forêt entraînée, statistiques du scaler, médianes, colonnes retenues, seuil
+# - Scores bruts d'entraînement triés : changement de contamination sans refit
+# - Configuration des features temporelles éventuelles (features.py)
+# - Statistiques du préfiltre en cascade (prefilter.py)
+# - Sauvegardé une fois (joblib), rechargé en mémoire mappée (mmap_mode)
+
+import os
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from data_cache import load_and_preprocess_cached
+from features import add_temporal_features
+from prefilter import fit_prefilter
+from model import train_isolation_forest, predict_anomalies, score_samples_batched
+from partitioned import PartitionedForest
+from preprocess import stats_from_frame, transform_chunk
+
+# Incrémenté à chaque changement du contenu de l'artefact
+ARTIFACT_VERSION = 4
+
+DEFAULT_ARTIFACT_PATH = "model_artifact.joblib"
+
+
+def build_artifact(model, df_numeric=None, X=None, stats=None, features=None):
+    """
+    Regroupe le modèle et tout ce qu'il faut pour prétraiter de nouvelles données
+    - X (optionnel) : données d'entraînement prétraitées, dont les scores bruts
+      triés sont conservés (thresholds.ScoreIndex), ainsi que le préfiltre
+      calibré sur ces scores
+    - stats : statistiques déjà calculées (mode allégé), au lieu de df_numeric
+    - features : configuration des features temporelles (features.feature_config)
+      si le modèle a été entraîné avec
+    """
+    train_scores = prefilter = None
+    if X is not None and hasattr(model, "offset_"):
+        raw_scores = score_samples_batched(model, X)
+        prefilter = fit_prefilter(X, raw_scores, model.offset_, model=model)
+        train_scores = np.sort(raw_scores)
+
+    return {
+        "version": ARTIFACT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "model": model,
+        "stats": stats if stats is not None else stats_from_frame(df_numeric),
+        # decision_function < 0 => anomalie (seuil propre à chaque partition sinon)
+        "threshold": float(model.offset_) if hasattr(model, "offset_") else None,
+        "train_scores": train_scores,
+        "features": features,
+        "prefilter": prefilter,
+    }
+
+
+def save_artifact(artifact, path=DEFAULT_ARTIFACT_PATH):
+    """
+    Sauvegarde non compressée (condition pour le chargement mmap)
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Écriture dans un fichier temporaire puis renommage (atomique)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_artifact(path=DEFAULT_ARTIFACT_PATH, mmap_mode="r"):
+    """
+    Chargement de l'artefact : les tableaux des arbres sont mappés en mémoire
+    """
+    artifact = joblib.load(path, mmap_mode=mmap_mode)
+
+    version = artifact.get("version") if isinstance(artifact, dict) else None
+    if version != ARTIFACT_VERSION:
+        raise ValueError(
+            f"Artefact {path} en version {version}, version attendue {ARTIFACT_VERSION} : "
+            "réentraîner avec main.py --save-model"
+        )
+    return artifact
+
+
+def transform_with_artifact(df, artifact):
+    """
+    Prétraitement de nouvelles données avec les statistiques de l'artefact
+    (features temporelles recalculées d'abord si l'artefact en utilise)
+    """
+    if artifact.get("features"):
+        df = add_temporal_features(df, artifact["features"])
+    return transform_chunk(df, artifact["stats"])
+
+
+def predict_with_artifact(artifact, frame, X):
+    """
+    Labels et scores d'un bloc prétraité (X) ; artefact partitionné
+    (main.py --partition-key) : chaque ligne est routée vers le modèle de
+    sa partition d'après la colonne clé du bloc brut `frame`
+    """
+    model = artifact["model"]
+    if isinstance(model, PartitionedForest):
+        if model.key_column not in frame.columns:
+            raise ValueError(f"Colonne de partition absente des données : {model.key_column}")
+        return model.predict_anomalies(X, frame[model.key_column].to_numpy())
+    return predict_anomalies(model, X)
+
+
+def require_single_forest(artifact, usage):
+    """
+    Refuse un artefact partitionné là où une seule forêt est attendue
+    (scores bruts, préfiltre, requêtes sans colonne de partition)
+    """
+    model = artifact["model"]
+    if isinstance(model, PartitionedForest):
+        raise ValueError(
+            f"Artefact partitionné (un modèle par {model.key_column}) non pris en charge par {usage} : "
+            "utiliser main.py --model ou le mode lots (--inputs)"
+        )
+    return artifact
+
+
+def load_or_train_artifact(path=None, reference_csv="kpi_5g.csv"):
+    """
+    Charge l'artefact s'il est fourni, sinon entraîne sur le CSV de référence
+    """
+    if path:
+        return load_artifact(path)
+    df, df_numeric, X_scaled = load_and_preprocess_cached(reference_csv)
+    return build_artifact(train_isolation_forest(X_scaled), df_numeric, X_scaled)
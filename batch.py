@@ -0,0 +1,191 @@
+# batch.py
+# Traitement par lots de nombreux fichiers KPI (exports par site) :
+# - Entrées : motifs glob et / ou dossiers (fichiers CSV, Parquet, Arrow, npy)
+# - Un fichier par tâche dans un pool de processus : lecture, prétraitement,
+#   scoring ; modèle partagé (artefact chargé une fois par processus, mappé
+#   en mémoire) ou un modèle entraîné par fichier
+# - Chaque processus n'a qu'un fichier en mémoire à la fois (mémoire bornée
+#   par le nombre de processus) et n'utilise qu'un cœur : la durée totale
+#   dépend du nombre de cœurs, pas du nombre de fichiers
+# - Sorties par fichier (anomalies, ou toutes les lignes) et résumé fusionné
+#   écrit au fil de l'eau (summary.csv)
+
+import csv
+import glob
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from artifact import build_artifact, load_artifact, predict_with_artifact, transform_with_artifact
+from features import DEFAULT_EWMA_SPANS, DEFAULT_WINDOWS, add_temporal_features, feature_config
+from model import train_isolation_forest
+from prefilter import DEFAULT_AUDIT_RATE, predict_anomalies_cascade
+from partitioned import PartitionedForest
+from preprocess import preprocess_frame
+from readers import FORMATS, read_kpis, write_kpis
+from results_db import model_label
+
+SUMMARY_FILE = "summary.csv"
+SUMMARY_FIELDS = ["file", "rows", "anomalies", "anomaly_rate", "score_min", "model_version",
+                  "read_s", "score_s", "total_s", "output", "error"]
+
+# Tâches soumises d'avance par processus (le pool ne reste jamais à vide)
+TASKS_PER_WORKER = 2
+
+# Artefact partagé, chargé une fois par processus du pool
+_worker_data = {}
+
+
+def expand_inputs(patterns):
+    """
+    Liste triée et sans doublon des fichiers KPI désignés par des motifs
+    glob (** récursif), des dossiers ou des chemins
+    """
+    files = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        files.update(os.path.abspath(m) for m in matches
+                     if os.path.isfile(m) and os.path.splitext(m)[1].lower() in FORMATS)
+    return sorted(files)
+
+
+def output_paths(files, output_dir, fmt):
+    """
+    Sortie de chaque fichier : chemin relatif aplati (deux sites avec le même
+    nom de fichier ne s'écrasent pas), extension d'origine gardée si deux
+    fichiers ne diffèrent que par elle
+    """
+    root = os.path.commonpath([os.path.dirname(f) for f in files]) if files else ""
+    stems = [os.path.splitext(os.path.relpath(f, root)) for f in files]
+    seen = {}
+    for stem, _ in stems:
+        seen[stem] = seen.get(stem, 0) + 1
+    extension = next(ext for ext, f in FORMATS.items() if f == fmt)
+    names = [(stem if seen[stem] == 1 else stem + ext.replace(".", "_")).replace(os.sep, "__")
+             for stem, ext in stems]
+    return [os.path.join(output_dir, f"{name}_anomalies{extension}") for name in names]
+
+
+def _init_worker(model_path):
+    if model_path:
+        artifact = load_artifact(model_path)
+        # Un cœur par processus : le parallélisme vient du pool
+        model = artifact["model"]
+        forests = [model.fallback, *model.models.values()] if isinstance(model, PartitionedForest) else [model]
+        for forest in forests:
+            forest.n_jobs = 1
+        _worker_data["artifact"] = artifact
+
+
+def _score(artifact, frame, X, options):
+    if options["prefilter"] and artifact.get("prefilter") is not None:
+        predictions, scores, _ = predict_anomalies_cascade(
+            artifact["model"], X, artifact["prefilter"], options["audit_rate"])
+        return predictions, scores
+    # Artefact partitionné : routage par la colonne clé du fichier
+    return predict_with_artifact(artifact, frame, X)
+
+
+def process_file(path, output, options):
+    """
+    Traite un fichier (dans un processus du pool) et renvoie sa ligne de
+    résumé ; une erreur est reportée dans le résumé sans arrêter le lot
+    """
+    start = time.perf_counter()
+    summary = {"file": path, "rows": 0, "anomalies": 0, "output": output, "error": ""}
+    try:
+        # 1. Lecture (plage de temps éventuelle)
+        frame = read_kpis(path, time_range=options["time_range"])
+        summary["read_s"] = time.perf_counter() - start
+
+        # 2. Prétraitement : statistiques de l'artefact partagé, ou propres au fichier
+        artifact = _worker_data.get("artifact")
+        if artifact is not None:
+            X = transform_with_artifact(frame, artifact)
+        else:
+            features = None
+            df = frame
+            if options["features"]:
+                features = feature_config(frame, windows=options["feature_windows"],
+                                          spans=options["ewma_spans"])
+                df = add_temporal_features(frame, features)
+            df_numeric, X = preprocess_frame(df)
+            model = train_isolation_forest(X, n_jobs=1)
+            # Scores d'entraînement (préfiltre) calculés seulement s'ils servent
+            artifact = build_artifact(model, df_numeric, X if options["prefilter"] else None,
+                                      features=features)
+
+        # 3. Scoring
+        t_score = time.perf_counter()
+        predictions, scores = _score(artifact, frame, X, options)
+        summary["score_s"] = time.perf_counter() - t_score
+
+        # 4. Sortie du fichier : numéro de ligne (parmi les lignes lues), KPI, label, score
+        mask = predictions == -1
+        result = frame.assign(anomaly=predictions, anomaly_score=scores)
+        result.insert(0, "row", np.arange(len(frame)))
+        if not options["all_rows"]:
+            result = result[mask]
+        write_kpis(result, output)
+
+        summary.update(
+            rows=len(frame),
+            anomalies=int(mask.sum()),
+            anomaly_rate=float(mask.mean()) if len(frame) else 0.0,
+            score_min=float(scores.min()) if len(frame) else None,
+            model_version=model_label(artifact),
+        )
+    except Exception as exc:
+        summary["error"] = f"{type(exc).__name__}: {exc}"
+    summary["total_s"] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(files, output_dir, model_path=None, n_workers=None, fmt="csv", time_range=None,
+              all_rows=False, features=False, feature_windows=DEFAULT_WINDOWS,
+              ewma_spans=DEFAULT_EWMA_SPANS, prefilter=False, audit_rate=DEFAULT_AUDIT_RATE,
+              on_result=None):
+    """
+    Traite `files` dans un pool de n_workers processus.
+    - model_path : artefact partagé ; None = un modèle par fichier
+    - on_result(résumé) : appelé dans le processus principal à chaque fichier
+      terminé, avant l'écriture de sa ligne dans summary.csv
+    Renvoie la liste des résumés (ordre de fin de traitement).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(files) or 1))
+    options = {"time_range": time_range, "all_rows": all_rows, "features": features,
+               "feature_windows": feature_windows, "ewma_spans": ewma_spans,
+               "prefilter": prefilter, "audit_rate": audit_rate}
+
+    summaries = []
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w", newline="", encoding="utf-8") as f, \
+            ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                initargs=(model_path,)) as pool:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+
+        def collect(done):
+            for future in done:
+                summary = future.result()
+                if on_result is not None:
+                    # Avant l'écriture de la ligne : on_result peut y reporter une erreur
+                    on_result(summary)
+                writer.writerow(summary)
+                f.flush()      # Résumé partiel lisible pendant le traitement
+                summaries.append(summary)
+
+        # Soumission progressive : au plus TASKS_PER_WORKER tâches en attente par processus
+        pending = set()
+        for path, output in zip(files, output_paths(files, output_dir, fmt)):
+            if len(pending) >= n_workers * TASKS_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(process_file, path, output, options))
+        collect(wait(pending).done)
+    return summaries
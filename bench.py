@@ -0,0 +1,267 @@
+# bench.py
+# Banc de mesure de bout en bout du pipeline de détection :
+# - Tables KPI synthétiques (synth.py) de taille configurable
+# - Pour chaque étape : temps réel, temps CPU, lignes/s, pic de RSS
+# - Résultats écrits en JSON pour suivre régressions et améliorations
+#
+# Exemple : python bench.py --rows 100000 1000000 --output bench_results.json
+
+import argparse
+import gc
+import json
+import os
+import platform
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from compiled_forest import compile_forest
+from instrumentation import current_rss
+from model import train_isolation_forest, predict_anomalies, score_samples_batched
+from prefilter import cascade_recall, fit_prefilter
+from preprocess import load_and_preprocess_data, iter_preprocessed_chunks, load_preprocessed_matrix
+from readers import convert
+from results_db import ResultsDB
+from sampling import DEFAULT_SAMPLE_ROWS, iter_scored_chunks, train_on_sample
+from synth import write_kpi_csv
+
+DEFAULT_STAGES = ["load", "load_streaming", "load_lean", "fit", "predict", "predict_compiled",
+                  "predict_cascade", "fit_sampled", "predict_chunked", "load_parquet",
+                  "load_parquet_range", "results_write", "results_page"]
+DEFAULT_DATA_DIR = ".bench_data"
+
+
+class PeakRSS:
+    """
+    Échantillonne la RSS dans un thread pendant une étape (pic par étape,
+    ru_maxrss n'étant qu'un maximum sur toute la vie du processus)
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        gc.collect()
+        self.start = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        self.end = current_rss()
+
+
+def measure(stage, rows, fn):
+    """
+    Exécute fn() et renvoie (résultat, mesures de l'étape)
+    """
+    with PeakRSS() as rss:
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = fn()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    return result, {
+        "stage": stage,
+        "rows": rows,
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "rows_per_s": rows / wall if wall > 0 else None,
+        "peak_rss_mb": rss.peak / 2**20,
+        "rss_delta_mb": (rss.end - rss.start) / 2**20,
+        "peak_over_start_mb": (rss.peak - rss.start) / 2**20,
+    }
+
+
+def _consume_streaming(csv_path, chunksize):
+    n = 0
+    for _, X_chunk in iter_preprocessed_chunks(csv_path, chunksize=chunksize):
+        n += len(X_chunk)
+    return n
+
+
+def bench_size(n_rows, n_kpis, stages, data_dir, chunksize, seed=0,
+               sample_rows=DEFAULT_SAMPLE_ROWS):
+    """
+    Mesure toutes les étapes demandées pour une taille de table
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    csv_path = os.path.join(data_dir, f"kpi_{n_rows}x{n_kpis}_s{seed}.csv")
+    labels_path = csv_path.replace(".csv", "_labels.npy")
+    results = []
+
+    if not os.path.exists(csv_path):
+        _, m = measure("generate", n_rows, lambda: write_kpi_csv(
+            csv_path, n_rows, seed=seed, labels_path=labels_path, n_kpis=n_kpis))
+        results.append(m)
+    labels = np.load(labels_path, mmap_mode="r")
+
+    X_scaled = model = predictions = None
+    scored_stages = {"fit", "predict", "predict_compiled", "predict_cascade", "results_write", "results_page"}
+    need_matrix = scored_stages & set(stages)
+    if "load" in stages or need_matrix:
+        (df, df_numeric, X_scaled), m = measure(
+            "load", n_rows, lambda: load_and_preprocess_data(csv_path))
+        del df, df_numeric
+        if "load" in stages:
+            results.append(m)
+
+    if "load_streaming" in stages:
+        _, m = measure("load_streaming", n_rows, lambda: _consume_streaming(csv_path, chunksize))
+        m["chunksize"] = chunksize
+        results.append(m)
+
+    # Même table en Parquet (convertie une fois) : lecture complète, puis 10 % de la plage de temps
+    if {"load_parquet", "load_parquet_range"} & set(stages):
+        parquet_path = csv_path.replace(".csv", ".parquet")
+        if not os.path.exists(parquet_path):
+            convert(csv_path, parquet_path)
+        if "load_parquet" in stages:
+            _, m = measure("load_parquet", n_rows, lambda: load_and_preprocess_data(parquet_path))
+            results.append(m)
+        if "load_parquet_range" in stages:
+            time_range = (0.45 * n_rows, 0.55 * n_rows)
+            (_, _, X_range), m = measure("load_parquet_range", n_rows, lambda: load_and_preprocess_data(
+                parquet_path, time_range=time_range))
+            m["rows_read"] = len(X_range)
+            results.append(m)
+
+    if "load_lean" in stages:
+        _, m = measure("load_lean", n_rows, lambda: load_preprocessed_matrix(csv_path, chunksize=chunksize))
+        results.append(m)
+
+    if need_matrix:
+        model, m = measure("fit", n_rows, lambda: train_isolation_forest(X_scaled))
+        if "fit" in stages:
+            results.append(m)
+
+    if "predict" in stages:
+        (predictions, scores), m = measure("predict", n_rows, lambda: predict_anomalies(model, X_scaled))
+        # Qualité de détection sur les anomalies injectées
+        detected = predictions == -1
+        m["recall"] = float(detected[labels].mean()) if labels.any() else None
+        m["precision"] = float(labels[detected].mean()) if detected.any() else None
+        results.append(m)
+
+    if "predict_compiled" in stages:
+        compiled = compile_forest(model)
+        (compiled_predictions, compiled_scores), m = measure(
+            "predict_compiled", n_rows, lambda: compiled.predict_anomalies(X_scaled))
+        if predictions is not None:
+            m["labels_equal_sklearn"] = bool(np.array_equal(compiled_predictions, predictions))
+            m["max_abs_score_diff"] = float(np.abs(compiled_scores - scores).max())
+        results.append(m)
+
+    if "predict_cascade" in stages:
+        # Préfiltre calibré sur les scores d'entraînement (comme build_artifact)
+        prefilter = fit_prefilter(X_scaled, score_samples_batched(model, X_scaled), model.offset_,
+                                  model=model)
+        report, m = measure("predict_cascade", n_rows, lambda: cascade_recall(model, X_scaled, prefilter))
+        # Temps du scoring en cascade seul (cascade_recall score aussi tout le lot)
+        m["wall_s"] = report["cascade_s"]
+        m["rows_per_s"] = n_rows / report["cascade_s"] if report["cascade_s"] > 0 else None
+        m["full_wall_s"] = report["full_s"]
+        m["recall_vs_full"] = report["recall"]
+        m["forest_fraction"] = report["forest_fraction"]
+        m["audit_anomalies"] = report["audit_anomalies"]
+        results.append(m)
+
+    # Entraînement sur échantillon de réservoir (mémoire bornée) puis scoring par blocs
+    if {"fit_sampled", "predict_chunked"} & set(stages):
+        (artifact, _), m = measure("fit_sampled", n_rows, lambda: train_on_sample(
+            csv_path, min(sample_rows, n_rows), chunksize))
+        m["sample_rows"] = min(sample_rows, n_rows)
+        if "fit_sampled" in stages:
+            results.append(m)
+
+    if "predict_chunked" in stages:
+        chunked, m = measure("predict_chunked", n_rows, lambda: np.concatenate(
+            [p for _, p, _ in iter_scored_chunks(csv_path, artifact, chunksize)]))
+        detected = chunked == -1
+        m["recall"] = float(detected[labels].mean()) if labels.any() else None
+        m["precision"] = float(labels[detected].mean()) if detected.any() else None
+        results.append(m)
+
+    # Base de résultats : insertion groupée de toutes les lignes, puis une page d'anomalies
+    if {"results_write", "results_page"} & set(stages):
+        if predictions is None:
+            predictions, scores = predict_anomalies(model, X_scaled)
+        frame = pd.read_csv(csv_path)
+        db_path = os.path.join(data_dir, f"results_{n_rows}x{n_kpis}.sqlite")
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        db = ResultsDB(db_path)
+        run_id = db.start_run(csv_path)
+        _, m = measure("results_write", n_rows, lambda: db.insert(run_id, frame, scores, predictions))
+        db.finish_run(run_id)
+        if "results_write" in stages:
+            results.append(m)
+        if "results_page" in stages:
+            (_, page), m = measure("results_page", n_rows, lambda: (
+                db.count(run_id, max_score=0.0), db.query(run_id, max_score=0.0, limit=100, offset=1000)))
+            m["latency_ms"] = m["wall_s"] * 1000
+            m["page_rows"] = len(page)
+            results.append(m)
+        db.close()
+
+    for m in results:
+        m["kpis"] = n_kpis
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de mesure du pipeline KPI 5G")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--kpis", type=int, default=4, help="Nombre de colonnes KPI")
+    parser.add_argument("--stages", nargs="+", default=DEFAULT_STAGES, choices=DEFAULT_STAGES)
+    parser.add_argument("--chunksize", type=int, default=100_000,
+                        help="Taille des blocs pour load_streaming / fit_sampled / predict_chunked")
+    parser.add_argument("--sample-rows", type=int, default=DEFAULT_SAMPLE_ROWS,
+                        help="Taille du réservoir pour fit_sampled")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR,
+                        help="Dossier des CSV générés (réutilisés d'un run à l'autre)")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "cpu_count": os.cpu_count(),
+            "machine": platform.machine(),
+        },
+        "results": [],
+    }
+
+    for n_rows in args.rows:
+        for m in bench_size(n_rows, args.kpis, args.stages, args.data_dir, args.chunksize,
+                            sample_rows=args.sample_rows):
+            report["results"].append(m)
+            print(f"{m['rows']:>12,} lignes | {m['stage']:<17} | {m['wall_s']:8.2f} s | "
+                  f"{m['rows_per_s'] or 0:>12,.0f} l/s | pic RSS {m['peak_rss_mb']:8.1f} Mo"
+                  + (f" | rappel {m['recall_vs_full']:.1%}, forêt {m['forest_fraction']:.1%}"
+                     if "recall_vs_full" in m else ""))
+        gc.collect()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+# data_cache.py
+# Cache disque du prétraitement des KPI :
+# - Clé : taille, date de modification et inode du fichier source (et du
+#   fichier .meta.json d'un .npy, qui porte les noms de colonnes) ; le
+#   SHA-256 du contenu n'est recalculé que si l'un d'eux a changé (fichier
+#   touché ou recopié à l'identique : l'entrée reste valable)
+# - Contenu : colonnes retenues, médianes, paramètres du scaler,
+#   X_scaled, DataFrame brut et DataFrame numérique déjà complété (aucun
+#   fillna au démarrage à chaud) ; colonnes numériques en .npy mappés en
+#   mémoire (une matrice par type), seules les autres colonnes sont picklées
+# - Chaque écriture publie une nouvelle version sous un nom unique, puis
+#   remplace atomiquement le fichier pointeur CURRENT : un lecteur voit
+#   toujours une version complète, même avec des écritures concurrentes
+# - Démarrage à froid et à chaud renvoient les mêmes types (tableaux mappés
+#   en lecture seule)
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from preprocess import load_and_preprocess_data
+from readers import FORMATS, _npy_meta_path
+
+DEFAULT_CACHE_DIR = ".kpi_cache"
+
+CACHE_FORMAT_VERSION = 3
+
+# Fichier pointeur : nom de la version publiée de l'entrée
+POINTER_FILE = "CURRENT"
+
+# Âge (s) au-delà duquel une version remplacée est supprimée : une
+# écriture concurrente a le temps de publier la sienne
+STALE_VERSION_S = 60.0
+
+# Fichiers du format 1 (entrée sans versions), supprimés à la première écriture
+LEGACY_FILES = ("meta.json", "frame.pkl", "X_scaled.npy")
+
+
+def file_stat(path):
+    """
+    Identité peu coûteuse d'un fichier source : taille, mtime, inode
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "inode": stat.st_ino}
+
+
+def _sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _sidecars(path):
+    # Fichiers lus avec la source : noms de colonnes d'un .npy
+    if FORMATS.get(os.path.splitext(path)[1].lower()) == "npy":
+        return [_npy_meta_path(path)]
+    return []
+
+
+def file_fingerprint(path, block_size=1 << 20):
+    """
+    Empreinte complète d'un fichier source : taille, mtime, inode et hash du
+    contenu, de même pour ses fichiers associés
+    """
+    fingerprint = {**file_stat(path), "sha256": _sha256(path, block_size)}
+    for sidecar in _sidecars(path):
+        fingerprint.setdefault("sidecars", {})[os.path.basename(sidecar)] = {
+            **file_stat(sidecar), "sha256": _sha256(sidecar, block_size)}
+    return fingerprint
+
+
+def _file_matches(path, source):
+    current = file_stat(path)
+    if all(source.get(key) == value for key, value in current.items()):
+        return {**current, "sha256": source.get("sha256")}
+    if source.get("size") != current["size"]:
+        return None
+    sha256 = _sha256(path)
+    return {**current, "sha256": sha256} if sha256 == source.get("sha256") else None
+
+
+def source_matches(path, source):
+    """
+    Compare le fichier (et ses fichiers associés) à l'empreinte enregistrée :
+    None s'il diffère, sinon l'empreinte à jour (hash relu seulement si
+    taille, mtime ou inode diffèrent)
+    """
+    if source is None:
+        return None
+    matched = _file_matches(path, source)
+    recorded = source.get("sidecars", {})
+    sidecars = _sidecars(path)
+    if matched is None or sorted(os.path.basename(s) for s in sidecars) != sorted(recorded):
+        return None
+    for sidecar in sidecars:
+        name = os.path.basename(sidecar)
+        sidecar_matched = _file_matches(sidecar, recorded[name])
+        if sidecar_matched is None:
+            return None
+        matched.setdefault("sidecars", {})[name] = sidecar_matched
+    return matched
+
+
+def _entry_dir(csv_path, cache_dir):
+    name = os.path.basename(os.path.abspath(csv_path))
+    path_hash = hashlib.sha256(os.path.abspath(csv_path).encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{name}-{path_hash}")
+
+
+def _current_version(entry):
+    try:
+        with open(os.path.join(entry, POINTER_FILE), encoding="utf-8") as f:
+            return os.path.join(entry, f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def _write_frame(frame, folder, name):
+    """
+    Écrit un DataFrame : colonnes numériques regroupées par type dans des
+    .npy en ordre Fortran (chaque colonne contiguë, relue sans copie) ;
+    autres colonnes et index non standard dans un petit pickle.
+    Renvoie la description à garder dans meta.json.
+    """
+    groups = {}
+    for column, dtype in frame.dtypes.items():
+        if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+            groups.setdefault(dtype.str, []).append(column)
+
+    arrays = []
+    for i, (dtype, columns) in enumerate(groups.items()):
+        file = f"{name}-{i}.npy"
+        np.save(os.path.join(folder, file), np.asfortranarray(frame[columns].to_numpy(dtype=dtype)))
+        arrays.append({"file": file, "columns": columns})
+
+    stored = {c for group in arrays for c in group["columns"]}
+    others = frame[[c for c in frame.columns if c not in stored]]
+    index = frame.index
+    range_index = isinstance(index, pd.RangeIndex)
+    pickled = None
+    if len(others.columns) or not range_index:
+        pickled = f"{name}.pkl"
+        pd.to_pickle((others, None if range_index else index), os.path.join(folder, pickled))
+
+    return {
+        "columns": frame.columns.tolist(),
+        "arrays": arrays,
+        "index": [index.start, index.stop, index.step] if range_index else None,
+        "pickle": pickled,
+    }
+
+
+def _read_frame(folder, layout):
+    # Colonnes numériques : vues (ndarray) sur les .npy mappés, aucune copie
+    columns = {}
+    for group in layout["arrays"]:
+        values = np.load(os.path.join(folder, group["file"]), mmap_mode="r").view(np.ndarray)
+        for j, column in enumerate(group["columns"]):
+            columns[column] = values[:, j]
+    index = pd.RangeIndex(*layout["index"]) if layout["index"] else None
+    if layout["pickle"]:
+        others, pickled_index = pd.read_pickle(os.path.join(folder, layout["pickle"]))
+        columns.update((column, others[column].array) for column in others.columns)
+        if pickled_index is not None:
+            index = pickled_index
+    return pd.DataFrame({c: columns[c] for c in layout["columns"]}, index=index, copy=False)
+
+
+def _read_version(version, meta):
+    # Démarrage à chaud : pas de parsing texte ni de DataFrame dépicklé,
+    # les matrices sont mappées en mémoire
+    df = _read_frame(version, meta["frame"])
+    df_numeric = _read_frame(version, meta["numeric"])
+    X_scaled = np.load(os.path.join(version, "X_scaled.npy"), mmap_mode="r")
+    return df, df_numeric, X_scaled
+
+
+def _read_entry(entry, csv_path):
+    version = _current_version(entry)
+    if version is None:
+        return None
+    try:
+        with open(os.path.join(version, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != CACHE_FORMAT_VERSION:
+            return None
+        source = source_matches(csv_path, meta.get("source"))
+        if source is None:
+            return None
+        if source != meta["source"]:
+            # Même contenu, fichier touché : empreinte mise à jour (plus de hash au prochain démarrage)
+            _write_json(os.path.join(version, "meta.json"), {**meta, "source": source})
+        return _read_version(version, meta)
+    except FileNotFoundError:
+        # Version remplacée et supprimée entre la lecture du pointeur et celle des fichiers
+        return None
+
+
+def _write_json(path, data):
+    # Fichier temporaire voisin puis os.replace : jamais de JSON à moitié écrit
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _write_entry(entry, fingerprint, df, df_numeric, X_scaled):
+    """
+    Publie une nouvelle version de l'entrée et renvoie son dossier
+    """
+    os.makedirs(entry, exist_ok=True)
+
+    # 1. Version écrite sous un nom temporaire unique, renommée une fois complète
+    tmp = tempfile.mkdtemp(dir=entry, prefix="tmp-")
+    version = os.path.join(entry, "v-" + os.path.basename(tmp)[len("tmp-"):])
+    try:
+        columns = df_numeric.columns.tolist()
+        meta = {
+            "version": CACHE_FORMAT_VERSION,
+            "source": fingerprint,
+            "columns": columns,
+            "medians": df_numeric.median().tolist(),
+            "scaler_mean": df_numeric.mean().tolist(),
+            "scaler_scale": df_numeric.std(ddof=0).tolist(),
+        }
+        np.save(os.path.join(tmp, "X_scaled.npy"), np.ascontiguousarray(X_scaled))
+        meta["frame"] = _write_frame(df, tmp, "frame")
+        meta["numeric"] = _write_frame(df_numeric, tmp, "numeric")
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.rename(tmp, version)
+
+        # 2. Pointeur remplacé atomiquement (os.replace d'un fichier)
+        fd, pointer = tempfile.mkstemp(dir=entry, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(os.path.basename(version))
+        os.replace(pointer, os.path.join(entry, POINTER_FILE))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.rmtree(version, ignore_errors=True)
+        raise
+
+    # 3. Anciennes versions supprimées (un lecteur qui les a mappées garde ses fichiers)
+    current = _current_version(entry)
+    for name in os.listdir(entry):
+        path = os.path.join(entry, name)
+        if name in LEGACY_FILES:
+            os.remove(path)
+        elif (name.startswith("v-") and path not in (version, current)
+              and time.time() - os.path.getmtime(path) > STALE_VERSION_S):
+            shutil.rmtree(path, ignore_errors=True)
+    return version
+
+
+def load_and_preprocess_cached(csv_path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Même résultat que load_and_preprocess_data, avec cache disque :
+    - Démarrage à chaud : lecture mmap de X_scaled et des colonnes numériques
+    - Démarrage à froid (ou CSV modifié) : prétraitement puis mise en cache
+    Dans les deux cas X_scaled et les colonnes numériques des DataFrames
+    sont mappés en lecture seule.
+    """
+    entry = _entry_dir(csv_path, cache_dir)
+
+    with stage("load_cache"):
+        cached = _read_entry(entry, csv_path)
+    if cached is not None:
+        return cached
+
+    fingerprint = file_fingerprint(csv_path)
+    df, df_numeric, X_scaled = load_and_preprocess_data(csv_path)
+    version = _write_entry(entry, fingerprint, df, df_numeric, X_scaled)
+
+    # Relu depuis la version publiée : mêmes types qu'au démarrage à chaud
+    with open(os.path.join(version, "meta.json"), encoding="utf-8") as f:
+        return _read_version(version, json.load(f))
@@ -0,0 +1,88 @@
+# downsample.py
+# Réduction des séries temporelles avant affichage (niveau de détail) :
+# - min/max par bucket : conserve les pics (attaques courtes visibles)
+# - LTTB (Largest Triangle Three Buckets) : conserve la forme de la courbe
+# - Les points à garder (anomalies) sont toujours réinjectés
+# Le navigateur reçoit au plus quelques milliers de points, quelle que soit
+# la taille de la plage affichée.
+
+import numpy as np
+
+# Budget de points envoyés au navigateur pour une courbe
+DEFAULT_MAX_POINTS = 4000
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Indices du minimum et du maximum de chaque bucket (2 points par bucket)
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    # Buckets de taille égale : une seule matrice (n_buckets, taille)
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(n_buckets, size)
+
+    nan = np.isnan(padded)
+    low = np.where(nan, np.inf, padded).argmin(axis=1)
+    high = np.where(nan, -np.inf, padded).argmax(axis=1)
+    offsets = np.arange(n_buckets) * size
+
+    indices = np.unique(np.concatenate([offsets + low, offsets + high, [0, n - 1]]))
+    return indices[indices < n]
+
+
+def lttb_indices(y, n_out, x=None):
+    """
+    Largest Triangle Three Buckets : dans chaque bucket, garde le point qui
+    forme le plus grand triangle avec le point retenu précédent et la
+    moyenne du bucket suivant
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+
+    # Premier et dernier points fixes, n_out - 2 buckets entre les deux
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = np.nanmean(y[next_start:next_stop]) if next_stop > next_start else y[-1]
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a])
+        )
+        a = start + int(np.nanargmax(area)) if not np.isnan(area).all() else start
+        indices[i + 1] = a
+
+    return indices
+
+
+def decimate(y, max_points=DEFAULT_MAX_POINTS, method="minmax", x=None, keep=None):
+    """
+    Indices (triés) des points à afficher :
+    - au plus ~max_points points issus de la réduction
+    - plus tous les indices de `keep` (ex. anomalies), jamais supprimés
+    """
+    if method == "lttb":
+        indices = lttb_indices(y, max_points, x)
+    elif method == "minmax":
+        indices = minmax_indices(y, max_points // 2)
+    else:
+        raise ValueError(f"Méthode de réduction inconnue : {method}")
+
+    if keep is not None and len(keep):
+        indices = np.union1d(indices, keep)
+    return indices
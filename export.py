@@ -0,0 +1,96 @@
+# export.py
+# Export des anomalies par blocs (CSV, Parquet) :
+# - Le DataFrame n'est jamais converti d'un seul coup : chaque bloc est
+#   sérialisé puis écrit, la mémoire dépend de `chunk_rows`
+# - Les blocs peuvent aussi venir d'un itérateur (pages d'une requête sur la
+#   base de résultats) : les lignes ne sont jamais toutes en mémoire
+# - Écriture dans un fichier temporaire sur disque, transmis ensuite
+#   au bouton de téléchargement (ou à tout autre consommateur)
+# - Parquet : pyarrow optionnel, importé seulement si nécessaire
+
+import os
+import tempfile
+
+EXPORT_CHUNK_ROWS = 100_000
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def iter_chunks(frame, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Blocs de `frame` (un bloc vide pour un DataFrame vide : colonnes connues)
+    """
+    if len(frame) == 0:
+        yield frame
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def write_csv(chunks, fileobj):
+    """
+    CSV écrit bloc par bloc dans un fichier binaire ouvert
+    (en-tête pris du premier bloc)
+    """
+    for i, chunk in enumerate(chunks):
+        fileobj.write(chunk.to_csv(index=False, header=i == 0).encode("utf-8"))
+
+
+def write_parquet(chunks, fileobj):
+    """
+    Parquet : un row group par bloc non vide (schéma déduit du premier bloc)
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("L'export Parquet nécessite pyarrow (pip install pyarrow)") from exc
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk.iloc[:0], preserve_index=False)
+                writer = pq.ParquetWriter(fileobj, schema)
+            if len(chunk):
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_frame(frame, fmt="csv", chunk_rows=EXPORT_CHUNK_ROWS, directory=None):
+    """
+    Exporte `frame` dans un fichier temporaire, renvoie son chemin
+    (à supprimer par l'appelant une fois transmis)
+    """
+    return export_chunks(iter_chunks(frame, chunk_rows), fmt, directory)
+
+
+def export_chunks(chunks, fmt="csv", directory=None):
+    """
+    Exporte une suite de DataFrames de mêmes colonnes (au moins un, même
+    vide) dans un fichier temporaire, renvoie son chemin
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt}")
+    writer = write_csv if fmt == "csv" else write_parquet
+
+    fd, path = tempfile.mkstemp(suffix=EXPORT_FORMATS[fmt][1], dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer(chunks, f)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
@@ -0,0 +1,204 @@
+# features.py
+# Features temporelles dérivées des KPI ordonnés par `time` :
+# - delta (écart à la mesure précédente) et taux de variation (delta / durée)
+# - moyenne et écart-type glissants sur plusieurs fenêtres
+# - moyenne mobile exponentielle (EWMA)
+# Mode batch : calcul vectorisé sur tout le DataFrame (rolling / ewm pandas)
+# Mode streaming : TemporalFeatureState garde dans un tampon circulaire les
+# dernières lignes et l'état des EWMA ; chaque micro-lot est calculé avec ce
+# seul contexte (coût proportionnel au lot, pas à l'historique)
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_WINDOWS = (5, 20)     # Fenêtres glissantes (nombre de mesures)
+DEFAULT_EWMA_SPANS = (10,)    # Portées des EWMA (alpha = 2 / (span + 1))
+DEFAULT_TIME_COLUMN = "time"
+
+
+def feature_config(frame, windows=DEFAULT_WINDOWS, spans=DEFAULT_EWMA_SPANS,
+                   time_column=DEFAULT_TIME_COLUMN, columns=None):
+    """
+    Configuration des features (stockée dans l'artefact) :
+    par défaut toutes les colonnes numériques sauf le temps
+    """
+    if columns is None:
+        columns = [c for c in frame.select_dtypes(include=[np.number]).columns if c != time_column]
+    windows = sorted({int(w) for w in windows})
+    if not columns:
+        raise ValueError("Aucune colonne KPI numérique pour les features temporelles")
+    if windows and windows[0] < 2:
+        raise ValueError(f"Fenêtre glissante trop petite : {windows[0]} (minimum 2)")
+    return {
+        "columns": list(columns),
+        "time_column": time_column,
+        "windows": windows,
+        "spans": sorted({int(s) for s in spans}),
+    }
+
+
+def feature_names(config):
+    names = []
+    for col in config["columns"]:
+        names += [f"{col}_delta", f"{col}_roc"]
+        for w in config["windows"]:
+            names += [f"{col}_mean_{w}", f"{col}_std_{w}"]
+        names += [f"{col}_ewma_{s}" for s in config["spans"]]
+    return names
+
+
+def raw_columns(stats_columns, config):
+    """
+    Colonnes brutes nécessaires pour un artefact : ses colonnes sans les
+    features dérivées, plus les entrées des features (même si le filtre de
+    variance les a écartées du modèle)
+    """
+    if not config:
+        return list(stats_columns)
+    derived = set(feature_names(config))
+    columns = [c for c in stats_columns if c not in derived]
+    return columns + [c for c in config["columns"] if c not in columns]
+
+
+def _ewma(values, span, init=None):
+    """
+    EWMA (adjust=False, valeurs manquantes ignorées) colonne par colonne, reprise depuis `init`
+    (dernière valeur du lot précédent) si fourni
+    """
+    frame = pd.DataFrame(values)
+    if init is not None:
+        frame = pd.concat([pd.DataFrame(init[None, :]), frame], ignore_index=True)
+    result = frame.ewm(span=span, adjust=False, ignore_na=True).mean().to_numpy()
+    return result[1:] if init is not None else result
+
+
+def _compute(values, times, config, context=0, ewma_init=None):
+    """
+    Calcul vectorisé des features :
+    - values, times : lignes de contexte (les `context` premières) puis lignes à traiter
+    - renvoie un dict nom -> colonne, pour les lignes à traiter uniquement
+    """
+    frame = pd.DataFrame(values)
+    delta = frame.diff().to_numpy()
+    dt = np.diff(times, prepend=np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roc = np.where((dt > 0)[:, None], delta / dt[:, None], np.nan)
+
+    # 1. Delta et taux de variation
+    blocks = {"delta": delta[context:], "roc": roc[context:]}
+
+    # 2. Moyenne et écart-type glissants (fenêtres partielles en début de série)
+    for w in config["windows"]:
+        rolling = frame.rolling(w, min_periods=1)
+        blocks[f"mean_{w}"] = rolling.mean().to_numpy()[context:]
+        blocks[f"std_{w}"] = rolling.std(ddof=0).to_numpy()[context:]
+
+    # 3. EWMA : état porté d'un lot à l'autre, indépendant de la taille du contexte
+    for s in config["spans"]:
+        init = None if ewma_init is None else ewma_init[s]
+        blocks[f"ewma_{s}"] = _ewma(values[context:], s, init)
+
+    features = {}
+    for j, col in enumerate(config["columns"]):
+        features[f"{col}_delta"] = blocks["delta"][:, j]
+        features[f"{col}_roc"] = blocks["roc"][:, j]
+        for w in config["windows"]:
+            features[f"{col}_mean_{w}"] = blocks[f"mean_{w}"][:, j]
+            features[f"{col}_std_{w}"] = blocks[f"std_{w}"][:, j]
+        for s in config["spans"]:
+            features[f"{col}_ewma_{s}"] = blocks[f"ewma_{s}"][:, j]
+    return features
+
+
+def _times(frame, config):
+    time_column = config["time_column"]
+    if time_column in frame.columns:
+        return frame[time_column].to_numpy(dtype=np.float64)
+    return np.arange(len(frame), dtype=np.float64)   # Sans horodatage : une mesure par pas
+
+
+def add_temporal_features(df, config):
+    """
+    Mode batch : ajoute les features temporelles à une copie de `df`.
+    Les lignes sont traitées dans l'ordre de `time` (tri stable si nécessaire)
+    puis remises dans l'ordre d'origine.
+    """
+    times = _times(df, config)
+    order = None
+    if len(times) > 1 and not (np.diff(times) >= 0).all():
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+
+    values = df[config["columns"]].to_numpy(dtype=np.float64)
+    if order is not None:
+        values = values[order]
+    features = _compute(values, times, config)
+
+    if order is not None:
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        features = {name: col[inverse] for name, col in features.items()}
+    return pd.concat([df, pd.DataFrame(features, index=df.index)], axis=1)
+
+
+class TemporalFeatureState:
+    """
+    Mode streaming : même résultat que add_temporal_features sur la
+    concaténation des lots (lignes reçues dans l'ordre du temps).
+    - Tampon circulaire des max(windows) dernières lignes (contexte des
+      fenêtres glissantes et du delta)
+    - Dernière valeur de chaque EWMA
+    Chaque ligne est écrite une fois dans le tampon et calculée une fois :
+    coût O(1) par mesure, quel que soit l'historique.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.capacity = max(config["windows"], default=1)
+        n_cols = len(config["columns"])
+        self._values = np.full((self.capacity, n_cols), np.nan)
+        self._times = np.full(self.capacity, np.nan)
+        self._next = 0
+        self._size = 0
+        self._ewma = None
+        self.rows = 0
+
+    def _context(self):
+        if self._size < self.capacity:
+            return self._values[:self._size], self._times[:self._size]
+        order = np.r_[self._next:self.capacity, 0:self._next]
+        return self._values[order], self._times[order]
+
+    def _push(self, values, times):
+        values, times = values[-self.capacity:], times[-self.capacity:]
+        n = len(values)
+        first = min(n, self.capacity - self._next)
+        self._values[self._next:self._next + first] = values[:first]
+        self._times[self._next:self._next + first] = times[:first]
+        self._values[:n - first] = values[first:]
+        self._times[:n - first] = times[first:]
+        self._next = (self._next + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def transform(self, chunk):
+        """
+        Ajoute les features temporelles à un micro-lot et met l'état à jour
+        """
+        if len(chunk) == 0:
+            return pd.concat([chunk, pd.DataFrame(columns=feature_names(self.config))], axis=1)
+        values = chunk[self.config["columns"]].to_numpy(dtype=np.float64)
+        times = _times(chunk, self.config)
+        if self.config["time_column"] not in chunk.columns:
+            times = times + self.rows
+
+        ctx_values, ctx_times = self._context()
+        features = _compute(
+            np.concatenate([ctx_values, values]), np.concatenate([ctx_times, times]),
+            self.config, context=len(ctx_values), ewma_init=self._ewma,
+        )
+
+        self._ewma = {s: np.array([features[f"{c}_ewma_{s}"][-1] for c in self.config["columns"]])
+                      for s in self.config["spans"]}
+        self._push(values, times)
+        self.rows += len(chunk)
+        return pd.concat([chunk, pd.DataFrame(features, index=chunk.index)], axis=1)
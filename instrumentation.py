@@ -0,0 +1,209 @@
+# instrumentation.py
+# Mesure par étape du pipeline (chargement, médianes, filtre de variance,
+# normalisation, entraînement, prédiction, scoring) :
+# - temps réel, temps CPU du thread de l'étape et du processus entier
+#   (threads de joblib / BLAS compris), lignes traitées, variation de mémoire (RSS)
+# - rapport JSON (main.py --profile)
+# - export texte Prometheus (endpoint /metrics du service, fichier pour le
+#   mode streaming) : compteurs cumulés et histogramme des durées
+
+import json
+import os
+import resource
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Bornes (secondes) de l'histogramme des durées d'étape
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+# Dernières exécutions conservées pour le rapport JSON (mémoire bornée)
+MAX_EVENTS = 1000
+
+METRIC_PREFIX = "kpi"
+
+
+def current_rss():
+    """
+    RSS courant en octets (/proc sous Linux, sinon pic ru_maxrss)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageRecorder:
+    """
+    Agrège les mesures par étape (thread-safe : le service score dans un
+    pool de threads, le réentraînement tourne dans son propre thread)
+    """
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self._lock = threading.Lock()
+        self._totals = {}
+        self.events = deque(maxlen=max_events)
+        self.started = time.time()
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self.events.clear()
+            self.started = time.time()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        # CPU du thread : propre à l'étape même si d'autres threads scorent en
+        # parallèle (service) ; CPU du processus : inclut les threads lancés
+        # par l'étape (fit n_jobs=-1, BLAS) mais aussi tout travail concurrent
+        rss_start = current_rss()
+        wall, cpu, process_cpu = time.perf_counter(), time.thread_time(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            process_cpu = time.process_time() - process_cpu
+            self.record(name, wall, cpu, rows, current_rss() - rss_start, process_cpu)
+
+    def record(self, name, wall_s, cpu_s, rows=None, memory_delta=0, process_cpu_s=0.0):
+        with self._lock:
+            totals = self._totals.get(name)
+            if totals is None:
+                totals = self._totals[name] = {
+                    "calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "process_cpu_s": 0.0, "rows": 0,
+                    "max_wall_s": 0.0, "last_memory_delta": 0,
+                    "buckets": [0] * len(DURATION_BUCKETS),
+                }
+            totals["calls"] += 1
+            totals["wall_s"] += wall_s
+            totals["cpu_s"] += cpu_s
+            totals["process_cpu_s"] += process_cpu_s
+            totals["rows"] += rows or 0
+            totals["max_wall_s"] = max(totals["max_wall_s"], wall_s)
+            totals["last_memory_delta"] = memory_delta
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if wall_s <= bound:
+                    totals["buckets"][i] += 1
+
+            self.events.append({
+                "stage": name,
+                "wall_s": wall_s,
+                "cpu_s": cpu_s,
+                "process_cpu_s": process_cpu_s,
+                "rows": rows,
+                "rows_per_s": rows / wall_s if rows and wall_s > 0 else None,
+                "memory_delta_mb": memory_delta / 2**20,
+            })
+
+    def summary(self):
+        """
+        Totaux par étape (ordre de première exécution)
+        """
+        with self._lock:
+            return {
+                name: {
+                    "calls": t["calls"],
+                    "wall_s": t["wall_s"],
+                    "cpu_s": t["cpu_s"],
+                    "process_cpu_s": t["process_cpu_s"],
+                    "rows": t["rows"],
+                    "rows_per_s": t["rows"] / t["wall_s"] if t["rows"] and t["wall_s"] > 0 else None,
+                    "max_wall_s": t["max_wall_s"],
+                }
+                for name, t in self._totals.items()
+            }
+
+    def report(self):
+        """
+        Rapport JSON-sérialisable : chaque exécution d'étape + totaux
+        """
+        return {
+            "events": list(self.events),
+            "stages": self.summary(),
+            "elapsed_s": time.time() - self.started,
+            "rss_mb": current_rss() / 2**20,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+
+    def write_report(self, path):
+        report = self.report()
+        if path == "-":
+            print(json.dumps(report, indent=2))
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return report
+
+    def prometheus(self, extra=None):
+        """
+        Exposition au format texte Prometheus (version 0.0.4).
+        extra : {nom: valeur} de jauges propres au mode (file, lignes...)
+        """
+        p = METRIC_PREFIX
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} {kind}")
+
+        with self._lock:
+            totals = {name: dict(t, buckets=list(t["buckets"])) for name, t in self._totals.items()}
+
+        metric("stage_calls_total", "counter", "Nombre d'exécutions par étape")
+        for name, t in totals.items():
+            lines.append(f'{p}_stage_calls_total{{stage="{name}"}} {t["calls"]}')
+        metric("stage_cpu_seconds_total", "counter", "Temps CPU cumulé du thread de l'étape")
+        for name, t in totals.items():
+            lines.append(f'{p}_stage_cpu_seconds_total{{stage="{name}"}} {t["cpu_s"]:.6f}')
+        metric("stage_process_cpu_seconds_total", "counter",
+               "Temps CPU cumulé du processus pendant l'étape (tous threads)")
+        for name, t in totals.items():
+            lines.append(f'{p}_stage_process_cpu_seconds_total{{stage="{name}"}} {t["process_cpu_s"]:.6f}')
+        metric("stage_rows_total", "counter", "Lignes traitées par étape")
+        for name, t in totals.items():
+            lines.append(f'{p}_stage_rows_total{{stage="{name}"}} {t["rows"]}')
+        metric("stage_memory_delta_bytes", "gauge", "Variation de RSS lors de la dernière exécution")
+        for name, t in totals.items():
+            lines.append(f'{p}_stage_memory_delta_bytes{{stage="{name}"}} {t["last_memory_delta"]}')
+
+        metric("stage_duration_seconds", "histogram", "Durée (temps réel) des étapes")
+        for name, t in totals.items():
+            for bound, count in zip(DURATION_BUCKETS, t["buckets"]):
+                lines.append(f'{p}_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+            lines.append(f'{p}_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {t["calls"]}')
+            lines.append(f'{p}_stage_duration_seconds_sum{{stage="{name}"}} {t["wall_s"]:.6f}')
+            lines.append(f'{p}_stage_duration_seconds_count{{stage="{name}"}} {t["calls"]}')
+
+        metric("process_resident_memory_bytes", "gauge", "RSS du processus")
+        lines.append(f"{p}_process_resident_memory_bytes {current_rss()}")
+
+        for name, value in (extra or {}).items():
+            if value is None or isinstance(value, (str, list, dict)):
+                continue
+            metric(name, "gauge", name.replace("_", " "))
+            lines.append(f"{p}_{name} {float(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, extra=None):
+        """
+        Écriture atomique (collecteur textfile de node_exporter)
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus(extra))
+        os.replace(tmp, path)
+
+
+# Enregistreur du processus, partagé par tous les modules du pipeline
+RECORDER = StageRecorder()
+
+
+def stage(name, rows=None):
+    """
+    Mesure un bloc : with stage("fit", rows=len(X)): ...
+    """
+    return RECORDER.stage(name, rows)
@@ -0,0 +1,330 @@
+# kpi_store.py
+# Stockage local des KPI partitionné par tranche de temps :
+# - une partition par tranche de `bucket_width` unités de `time`, faite de
+#   segments .npy (mappés en mémoire) triés par temps : un ajout écrit un
+#   nouveau segment sans relire la partition ; les segments sont fusionnés
+#   par taille (au plus ~log2(lignes) segments par tranche)
+# - manifeste JSON : bornes de temps et nombre de lignes de chaque partition
+#   et de ses segments, trié par tranche (index des plages)
+# - score brut de l'artefact (colonne raw_score) stocké avec les KPI si un
+#   modèle est fourni : une fenêtre s'affiche sans rescoring
+# Une requête sur [début, fin] n'ouvre que les partitions qui la recoupent
+# et n'en copie que les lignes de la plage (recherche dichotomique) :
+# la latence dépend de la longueur de la fenêtre, pas de l'historique.
+# Colonnes numériques uniquement (format .npy).
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from readers import (DEFAULT_ROW_GROUP_ROWS, DEFAULT_TIME_COLUMN, iter_kpis, read_kpis, read_npy,
+                     write_kpis)
+
+MANIFEST = "manifest.json"
+STORE_ARTIFACT = "model_artifact.joblib"
+SCORE_COLUMN = "raw_score"
+DEFAULT_BUCKET_WIDTH = 3600.0    # Une partition par heure si `time` est en secondes
+
+
+class KpiStore:
+    """
+    Dossier de partitions + manifeste
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.reload()
+
+    def reload(self):
+        with open(os.path.join(self.root, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        for p in self.manifest["partitions"]:
+            # Format précédent : un seul fichier par partition
+            if "file" in p:
+                p["segments"] = [{"file": p.pop("file"), "rows": p["rows"],
+                                  "time_min": p["time_min"], "time_max": p["time_max"]}]
+        self.manifest.setdefault("next_segment", 0)
+        self._index()
+
+    @classmethod
+    def create(cls, root, columns, bucket_width=DEFAULT_BUCKET_WIDTH, time_column=DEFAULT_TIME_COLUMN):
+        os.makedirs(root, exist_ok=True)
+        if os.path.exists(os.path.join(root, MANIFEST)):
+            raise FileExistsError(f"Un stockage KPI existe déjà dans {root}")
+        if time_column not in columns:
+            raise ValueError(f"Colonne de temps absente : {time_column}")
+        manifest = {
+            "columns": list(columns),
+            "time_column": time_column,
+            "bucket_width": float(bucket_width),
+            "revision": 0,
+            "next_segment": 0,
+            "partitions": [],
+        }
+        _write_json(os.path.join(root, MANIFEST), manifest)
+        return cls(root)
+
+    def _index(self):
+        partitions = self.manifest["partitions"]
+        self._buckets = np.array([p["bucket"] for p in partitions], dtype=np.int64)
+        self._time_min = np.array([p["time_min"] for p in partitions], dtype=np.float64)
+        self._time_max = np.array([p["time_max"] for p in partitions], dtype=np.float64)
+
+    @property
+    def columns(self):
+        return self.manifest["columns"]
+
+    @property
+    def time_column(self):
+        return self.manifest["time_column"]
+
+    @property
+    def bucket_width(self):
+        return self.manifest["bucket_width"]
+
+    @property
+    def revision(self):
+        # Incrémentée à chaque ajout : clé de cache des fenêtres
+        return self.manifest["revision"]
+
+    @property
+    def n_rows(self):
+        return sum(p["rows"] for p in self.manifest["partitions"])
+
+    @property
+    def has_scores(self):
+        return SCORE_COLUMN in self.columns
+
+    @property
+    def artifact_path(self):
+        path = os.path.join(self.root, STORE_ARTIFACT)
+        return path if os.path.exists(path) else None
+
+    def time_bounds(self):
+        if not len(self._buckets):
+            return None, None
+        return float(self._time_min.min()), float(self._time_max.max())
+
+    def partitions_for(self, start=None, end=None):
+        """
+        Partitions dont la plage [time_min, time_max] recoupe [start, end]
+        (tranches triées : recherche dichotomique sur le numéro de tranche)
+        """
+        lo = 0 if start is None else int(np.searchsorted(
+            self._buckets, np.floor(start / self.bucket_width), side="left"))
+        hi = len(self._buckets) if end is None else int(np.searchsorted(
+            self._buckets, np.floor(end / self.bucket_width), side="right"))
+        partitions = self.manifest["partitions"][lo:hi]
+        return [p for p in partitions
+                if (start is None or p["time_max"] >= start) and (end is None or p["time_min"] <= end)]
+
+    def _read_partition(self, partition, columns, time_range=None):
+        """
+        Lignes d'une partition (plage éventuelle), segments fusionnés dans l'ordre du temps
+        """
+        segments = [s for s in partition["segments"] if time_range is None
+                    or ((time_range[0] is None or s["time_max"] >= time_range[0])
+                        and (time_range[1] is None or s["time_min"] <= time_range[1]))]
+        if len(segments) == 1:
+            return read_npy(os.path.join(self.root, segments[0]["file"]), columns, time_range,
+                            self.time_column)
+        read_columns = columns if self.time_column in columns else [*columns, self.time_column]
+        frame = pd.concat([read_npy(os.path.join(self.root, s["file"]), read_columns, time_range,
+                                    self.time_column) for s in segments], ignore_index=True)
+        # Tri stable : à temps égal, les lignes des segments les plus anciens d'abord
+        frame = frame.sort_values(self.time_column, kind="stable", ignore_index=True)
+        return frame[columns]
+
+    def _read(self, read):
+        try:
+            return read()
+        except FileNotFoundError:
+            # Segments fusionnés et supprimés par un ajout concurrent : manifeste relu
+            self.reload()
+            return read()
+
+    def query(self, start=None, end=None, columns=None):
+        """
+        Lignes dont `time` est dans [start, end] (None = non borné), dans
+        l'ordre du temps
+        """
+        columns = list(columns or self.columns)
+        time_range = None if start is None and end is None else (start, end)
+        frames = self._read(lambda: [self._read_partition(p, columns, time_range)
+                                     for p in self.partitions_for(start, end)])
+        if not frames:
+            return pd.DataFrame({c: pd.Series(dtype=np.float64) for c in columns})
+        return pd.concat(frames, ignore_index=True)
+
+    def tail(self, n_rows, columns=None):
+        """
+        Les n_rows lignes les plus récentes (dernières partitions seulement)
+        """
+        selected, total = [], 0
+        for p in reversed(self.manifest["partitions"]):
+            selected.append(p)
+            total += p["rows"]
+            if total >= n_rows:
+                break
+        if not selected:
+            return self.query(columns=columns)
+        columns = list(columns or self.columns)
+        frames = self._read(lambda: [self._read_partition(p, columns) for p in reversed(selected)])
+        return pd.concat(frames, ignore_index=True).iloc[-n_rows:].reset_index(drop=True)
+
+    def _write_segment(self, rows, bucket):
+        name = f"part-{bucket}-{self.manifest['next_segment']:06d}.npy"
+        self.manifest["next_segment"] += 1
+        _write_partition(rows, os.path.join(self.root, name), self.time_column)
+        times = rows[self.time_column].to_numpy()
+        return {"file": name, "rows": len(rows), "time_min": float(times[0]), "time_max": float(times[-1])}
+
+    def append(self, frame, raw_scores=None):
+        """
+        Ajoute des lignes (et leurs scores bruts) : un nouveau segment par
+        tranche concernée ; un segment n'est réécrit que lors d'une fusion
+        avec un segment plus récent au moins aussi gros (coût amorti en
+        O(log n) écritures par ligne, quel que soit le nombre d'ajouts)
+        """
+        frame = frame[[c for c in self.columns if c != SCORE_COLUMN]].astype(np.float64)
+        if self.has_scores:
+            if raw_scores is None:
+                raise ValueError("Ce stockage contient des scores : raw_scores est requis")
+            frame = frame.assign(**{SCORE_COLUMN: np.asarray(raw_scores, dtype=np.float64)})
+        frame = frame.sort_values(self.time_column, kind="stable")
+
+        buckets = np.floor(frame[self.time_column].to_numpy() / self.bucket_width).astype(np.int64)
+        entries = {p["bucket"]: p for p in self.manifest["partitions"]}
+        obsolete = []
+        for bucket in np.unique(buckets).tolist():
+            entry = entries.get(bucket)
+            segments = [*(entry["segments"] if entry else []),
+                        self._write_segment(frame[buckets == bucket], bucket)]
+            # Fusion par taille : le dernier segment absorbe le précédent s'il est au moins aussi gros
+            while len(segments) >= 2 and segments[-1]["rows"] >= segments[-2]["rows"]:
+                merged = self._read_partition({"segments": segments[-2:]}, self.columns)
+                obsolete.extend(segments[-2:])
+                segments[-2:] = [self._write_segment(merged, bucket)]
+            entries[bucket] = {"bucket": bucket, "rows": sum(s["rows"] for s in segments),
+                               "time_min": min(s["time_min"] for s in segments),
+                               "time_max": max(s["time_max"] for s in segments),
+                               "segments": segments}
+
+        self.manifest["partitions"] = [entries[b] for b in sorted(entries)]
+        self.manifest["revision"] += 1
+        _write_json(os.path.join(self.root, MANIFEST), self.manifest)
+        self._index()
+
+        # Segments fusionnés supprimés une fois le nouveau manifeste publié
+        for segment in obsolete:
+            for path in (segment["file"], f"{segment['file']}.meta.json"):
+                try:
+                    os.remove(os.path.join(self.root, path))
+                except FileNotFoundError:
+                    pass
+        return self
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _write_partition(rows, path, time_column):
+    # Fichier temporaire puis renommage : une requête concurrente lit l'ancienne ou la nouvelle partition
+    tmp = f"{path}.tmp.npy"
+    write_kpis(rows, tmp, time_column=time_column)
+    os.replace(f"{tmp}.meta.json", f"{path}.meta.json")
+    os.replace(tmp, path)
+
+
+def build_store(source, root, bucket_width=DEFAULT_BUCKET_WIDTH, artifact=None,
+                time_column=DEFAULT_TIME_COLUMN, chunk_rows=DEFAULT_ROW_GROUP_ROWS):
+    """
+    Crée un stockage à partir d'un fichier KPI (CSV, Parquet, Arrow, npy),
+    lu et ajouté par blocs de chunk_rows lignes (mémoire bornée par le bloc).
+    Avec un artefact : scores bruts calculés une fois et stockés, artefact
+    copié dans le stockage.
+    """
+    from artifact import require_single_forest, save_artifact
+    from features import TemporalFeatureState
+    from model import score_samples_batched
+    from preprocess import transform_chunk
+
+    features = None
+    if artifact is not None:
+        # Scores bruts comparables d'une ligne à l'autre : une seule forêt
+        require_single_forest(artifact, "kpi_store.py")
+        if artifact.get("features"):
+            # État des features temporelles porté d'un bloc à l'autre
+            features = TemporalFeatureState(artifact["features"])
+
+    def create(chunk):
+        columns = chunk.select_dtypes(include=[np.number]).columns.tolist()
+        return KpiStore.create(root, columns + ([SCORE_COLUMN] if artifact is not None else []),
+                               bucket_width, time_column), columns
+
+    store = columns = None
+    for chunk in iter_kpis(source, chunk_rows=chunk_rows):
+        if store is None:
+            store, columns = create(chunk)
+        chunk = chunk[columns]
+        raw_scores = None
+        if artifact is not None:
+            frame = features.transform(chunk) if features is not None else chunk
+            raw_scores = score_samples_batched(artifact["model"], transform_chunk(frame, artifact["stats"]))
+        store.append(chunk, raw_scores)
+    if store is None:
+        # Fichier sans lignes : stockage vide, colonnes lues sur le fichier entier
+        store, _ = create(read_kpis(source))
+    if artifact is not None:
+        save_artifact(artifact, os.path.join(root, STORE_ARTIFACT))
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stockage KPI partitionné par tranche de temps")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Crée un stockage à partir d'un fichier KPI")
+    build.add_argument("source", help="CSV, Parquet, Arrow IPC ou .npy")
+    build.add_argument("root", help="Dossier du stockage")
+    build.add_argument("--bucket", type=float, default=DEFAULT_BUCKET_WIDTH,
+                       help="Largeur d'une partition (unités de `time`)")
+    build.add_argument("--model", metavar="CHEMIN", help="Artefact modèle : scores stockés avec les KPI")
+
+    query = sub.add_parser("query", help="Lignes d'une plage de temps")
+    query.add_argument("root")
+    query.add_argument("--start", type=float)
+    query.add_argument("--end", type=float)
+    query.add_argument("--output", help="Fichier de sortie (CSV, Parquet...), sinon résumé")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        artifact = None
+        if args.model:
+            from artifact import load_artifact
+            artifact = load_artifact(args.model)
+        try:
+            store = build_store(args.source, args.root, args.bucket, artifact)
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        print(f"{store.n_rows} lignes en {len(store.manifest['partitions'])} partitions dans {args.root}")
+        return
+
+    store = KpiStore(args.root)
+    window = store.query(args.start, args.end)
+    print(f"{len(window)} lignes, {len(store.partitions_for(args.start, args.end))} partition(s) lue(s) "
+          f"sur {len(store.manifest['partitions'])}")
+    if args.output:
+        write_kpis(window, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,435 @@
 # main.py
-# - Chargement des KPI 5G
-# - Prétraitement des données
-# - Entraînement du modèle IA (Isolation Forest)
-# - Détection et affichage des anomalies
+# - Chargement des KPI 5G (ou échantillon de réservoir pour les très gros fichiers)
+# - Prétraitement des données (features temporelles optionnelles)
+# - Entraînement du modèle IA (Isolation Forest) ou chargement d'un artefact
+# - Détection et affichage des anomalies (enregistrement optionnel dans une
+#   base SQLite de résultats)
+# - Mode lots (--inputs) : nombreux fichiers traités en parallèle (batch.py)
 
-# Module de prétraitement des données
-from preprocess import load_and_preprocess_data
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Module de prétraitement des données (avec cache disque)
+from data_cache import load_and_preprocess_cached
+from preprocess import iter_csv_rows, load_and_preprocess_data, load_preprocessed_matrix, preprocess_frame
+from readers import FORMATS, detect_format, read_kpis
+
+# Stockage KPI partitionné par tranche de temps
+from kpi_store import KpiStore, SCORE_COLUMN
+
+# Features temporelles (delta, fenêtres glissantes, EWMA)
+from features import DEFAULT_WINDOWS, DEFAULT_EWMA_SPANS, add_temporal_features, feature_config
 
 # Module IA : entraînement et prédiction des anomalies
-from model import train_isolation_forest, predict_anomalies
+from model import train_isolation_forest, predict_anomalies, score_samples_batched
+
+# Entraînement sur échantillon puis scoring par blocs
+from sampling import train_on_sample, iter_scored_chunks
+
+# Préfiltre en cascade (z-scores robustes) avant la forêt
+from prefilter import DEFAULT_AUDIT_RATE, fit_prefilter, predict_anomalies_cascade
+
+# Un modèle par cellule / gNB (pool de processus)
+from partitioned import train_per_partition
+
+# Artefact modèle versionné (forêt + statistiques de prétraitement)
+from artifact import (build_artifact, save_artifact, load_artifact, require_single_forest,
+                      transform_with_artifact)
+
+# Base persistante des résultats (anomalies consultées sans rescoring)
+from results_db import ResultsDB, model_label, run_source
+
+# Traitement de nombreux fichiers dans un pool de processus
+from batch import SUMMARY_FILE, expand_inputs, run_batch
+
+# Mesures par étape (temps, CPU, lignes, mémoire)
+from instrumentation import RECORDER, stage
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Détection d'anomalies de sécurité 5G (KPI)")
+    parser.add_argument("--data", default="kpi_5g.csv", metavar="FICHIER",
+                        help="Fichier de KPI à analyser (CSV, Parquet, Arrow IPC ou .npy)")
+    parser.add_argument("--store", metavar="DOSSIER",
+                        help="Stockage KPI partitionné (kpi_store.py) à la place de --data")
+    parser.add_argument("--inputs", nargs="+", metavar="MOTIF",
+                        help="Mode lots : motifs glob (entre guillemets) et / ou dossiers de fichiers KPI")
+    parser.add_argument("--output-dir", default="batch_results", metavar="DOSSIER",
+                        help="Mode lots : sorties par fichier et résumé fusionné")
+    parser.add_argument("--output-format", default="csv", choices=sorted(set(FORMATS.values())),
+                        help="Mode lots : format des sorties par fichier")
+    parser.add_argument("--start", type=float, help="Début de la plage de `time` analysée")
+    parser.add_argument("--end", type=float, help="Fin de la plage de `time` analysée (incluse)")
+    parser.add_argument("--model", metavar="CHEMIN",
+                        help="Artefact modèle à charger au lieu de réentraîner")
+    parser.add_argument("--save-model", metavar="CHEMIN",
+                        help="Sauvegarde l'artefact modèle après entraînement")
+    parser.add_argument("--partition-key", metavar="COLONNE",
+                        help="Un modèle par valeur de cette colonne (cellule, gNB...)")
+    parser.add_argument("--workers", type=int,
+                        help="Processus pour l'entraînement par partition ou le mode lots "
+                             "(défaut : tous les cœurs)")
+    parser.add_argument("--lean", action="store_true",
+                        help="Mode allégé : matrice float32 seule, sans DataFrame (grands fichiers)")
+    parser.add_argument("--features", action="store_true",
+                        help="Ajoute les features temporelles (delta, moyennes / écarts-types glissants, EWMA)")
+    parser.add_argument("--feature-windows", type=int, nargs="+", default=list(DEFAULT_WINDOWS),
+                        metavar="N", help="Fenêtres glissantes des features (mesures)")
+    parser.add_argument("--ewma-spans", type=int, nargs="+", default=list(DEFAULT_EWMA_SPANS),
+                        metavar="N", help="Portées des EWMA")
+    parser.add_argument("--prefilter", action="store_true",
+                        help="Préfiltre z-score robuste : seules les lignes suspectes passent par la forêt")
+    parser.add_argument("--audit-rate", type=float, default=DEFAULT_AUDIT_RATE,
+                        help="Part des lignes normales auditées par la forêt avec --prefilter")
+    parser.add_argument("--sample-rows", type=int, metavar="N",
+                        help="Entraînement sur un échantillon de réservoir de N lignes, "
+                             "puis scoring du fichier par blocs (historiques très volumineux)")
+    parser.add_argument("--results-db", metavar="CHEMIN",
+                        help="Enregistre les anomalies (score, label, modèle) dans une base SQLite")
+    parser.add_argument("--results-all", action="store_true",
+                        help="Enregistre aussi les lignes normales (--results-db, sorties du mode lots)")
+    parser.add_argument("--profile", metavar="CHEMIN", nargs="?", const="-",
+                        help="Rapport JSON des étapes (fichier, ou stdout sans argument)")
+    return parser.parse_args(argv)
+
+
+def detect(model, X_scaled, artifact, args):
+    """
+    Scoring complet, ou en cascade avec --prefilter (préfiltre de l'artefact,
+    sinon calibré sur les données courantes)
+    """
+    if not args.prefilter:
+        return predict_anomalies(model, X_scaled)
+
+    prefilter = artifact.get("prefilter") if artifact else None
+    if prefilter is None:
+        prefilter = fit_prefilter(X_scaled, score_samples_batched(model, X_scaled), model.offset_,
+                                  model=model)
+    predictions, scores, info = predict_anomalies_cascade(model, X_scaled, prefilter, args.audit_rate)
+    print(f"🧹 Préfiltre (|z| > {info['threshold']:.2f}) : {info['forest_rows']} lignes évaluées "
+          f"par la forêt sur {info['rows']} ({info['forest_fraction']:.1%}), "
+          f"audit : {info['audit_anomalies']} anomalie(s) sur {info['audit_rows']} lignes")
+    return predictions, scores
+
+
+def open_results(args, artifact, source):
+    """
+    Base de résultats et nouvelle exécution (None sans --results-db) :
+    renvoie (base, exécution, version du modèle)
+    """
+    if not args.results_db:
+        return None, None, None
+    # Modèle entraîné sans artefact : horodaté comme un artefact
+    version = model_label(artifact) or f"{datetime.now().isoformat(timespec='seconds')}#0"
+    db = ResultsDB(args.results_db)
+    threshold = artifact["threshold"] if artifact else None
+    return db, db.start_run(source, version, threshold), version
+
+
+def record_results(db, run_id, version, args, frame, predictions, scores):
+    """
+    Insertion groupée des lignes scorées (anomalies seules sauf --results-all)
+    """
+    if db is None:
+        return 0
+    if not args.results_all:
+        mask = predictions == -1
+        frame, predictions, scores = frame[mask], predictions[mask], scores[mask]
+    with stage("results_db", rows=len(frame)):
+        return db.insert(run_id, frame, scores, predictions, version)
+
+
+def run_lean(args):
+    """
+    Pipeline en mode allégé : une seule matrice float32 prétraitée en place,
+    pas de DataFrame des données (les lignes affichées ou enregistrées sont
+    relues dans le fichier, valeurs d'origine)
+    """
+    print("🔄 Chargement et prétraitement des données (mode allégé)...")
+    if args.model:
+        print(f"📦 Chargement de l'artefact modèle {args.model}...")
+        artifact = load_artifact(args.model)
+        # Matrice sans features temporelles, scorée par une seule forêt
+        try:
+            require_single_forest(artifact, "--lean")
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        if artifact.get("features"):
+            raise SystemExit("Artefact avec features temporelles non pris en charge par --lean "
+                             "(utiliser main.py sans --lean)")
+        model = artifact["model"]
+        X_scaled, stats = load_preprocessed_matrix(args.data, stats=artifact["stats"])
+    else:
+        X_scaled, stats = load_preprocessed_matrix(args.data)
+        print("🤖 Entraînement du modèle Isolation Forest...")
+        model = train_isolation_forest(X_scaled)
+        artifact = None
+
+    if args.save_model:
+        artifact = artifact or build_artifact(model, X=X_scaled, stats=stats)
+        save_artifact(artifact, args.save_model)
+        print(f"💾 Artefact modèle sauvegardé : {args.save_model}")
+
+    print("🚨 Détection des anomalies...")
+    predictions, scores = detect(model, X_scaled, artifact, args)
+    rows = (predictions == -1).nonzero()[0]
+
+    db, run_id, version = open_results(args, artifact, run_source(args.data))
+    if db is not None:
+        # Lignes d'origine relues par blocs (valeurs manquantes comprises)
+        keep = np.arange(len(X_scaled)) if args.results_all else rows
+        for values in iter_csv_rows(args.data, keep):
+            record_results(db, run_id, version, args, values,
+                           predictions[values.index], scores[values.index])
+        db.finish_run(run_id)
 
-def main():
+    # Lignes d'origine des premières anomalies (lecture arrêtée après la 5e)
+    examples = pd.concat(list(iter_csv_rows(args.data, rows[:5]))) if len(rows) else pd.DataFrame()
+    examples["anomaly"] = predictions[rows[:5]]
+    examples["anomaly_score"] = scores[rows[:5]]
+
+    print(f"Nombre total d'échantillons : {len(X_scaled)}")
+    print(f"Nombre d'anomalies détectées : {len(rows)}")
+
+    print("\nExemples d'anomalies :")
+    print(examples)
+    if db is not None:
+        print(f"🗄️ Résultats enregistrés dans {args.results_db} (exécution {run_id})")
+        db.close()
+
+
+def run_sampled(args):
+    """
+    Pipeline pour les très gros fichiers : entraînement sur un échantillon de
+    réservoir (mémoire bornée), puis scoring de tout le fichier par blocs
+    """
+    if args.model:
+        print(f"📦 Chargement de l'artefact modèle {args.model}...")
+        artifact = load_artifact(args.model)
+    else:
+        print(f"🎲 Échantillonnage de {args.sample_rows} lignes et entraînement du modèle...")
+        artifact, n_rows = train_on_sample(args.data, args.sample_rows)
+        print(f"   Échantillon de {artifact['stats']['n_rows']} lignes sur {n_rows}")
+
+    if args.save_model:
+        save_artifact(artifact, args.save_model)
+        print(f"💾 Artefact modèle sauvegardé : {args.save_model}")
+
+    print("🚨 Détection des anomalies (par blocs)...")
+    db, run_id, version = open_results(args, artifact, run_source(args.data))
+    total = 0
+    anomalies = []
+    n_anomalies = 0
+    for chunk, predictions, scores in iter_scored_chunks(
+            args.data, artifact, prefilter=args.prefilter, audit_rate=args.audit_rate):
+        mask = predictions == -1
+        chunk.index += total     # Numéros de ligne dans le fichier
+        total += len(chunk)
+        n_anomalies += int(mask.sum())
+        record_results(db, run_id, version, args, chunk, predictions, scores)
+        # Seules les premières anomalies sont gardées pour l'affichage
+        if sum(len(a) for a in anomalies) < 5 and mask.any():
+            anomalies.append(chunk[mask].assign(anomaly=-1, anomaly_score=scores[mask]))
+
+    print(f"Nombre total d'échantillons : {total}")
+    print(f"Nombre d'anomalies détectées : {n_anomalies}")
+
+    print("\nExemples d'anomalies :")
+    print(pd.concat(anomalies).head() if anomalies else pd.DataFrame())
+    if db is not None:
+        db.finish_run(run_id)
+        print(f"🗄️ Résultats enregistrés dans {args.results_db} (exécution {run_id})")
+        db.close()
+
+
+def run_files(args, time_range):
+    """
+    Mode lots : un fichier par tâche dans un pool de processus, modèle
+    partagé (--model) ou un modèle par fichier
+    """
+    files = expand_inputs(args.inputs)
+    if not files:
+        raise SystemExit(f"Aucun fichier KPI trouvé pour : {' '.join(args.inputs)}")
+    mode = f"modèle partagé {args.model}" if args.model else "un modèle par fichier"
+    print(f"🗂️ {len(files)} fichier(s), {mode}, sorties dans {args.output_dir}")
+
+    # Base de résultats : chaque fichier est enregistré dès qu'il est terminé,
+    # pendant que le pool traite les suivants (une seule connexion)
+    db = ResultsDB(args.results_db) if args.results_db else None
+
+    def record(summary):
+        # Erreur de la base (disque plein, base verrouillée...) reportée dans le
+        # résumé du fichier, comme une erreur de traitement : le lot continue
+        # (exécution laissée incomplète, ignorée par les lectures)
+        try:
+            result = read_kpis(summary["output"]).set_index("row")
+            run_id = db.start_run(run_source(summary["file"], time_range), summary["model_version"])
+            with stage("results_db", rows=len(result)):
+                db.insert(run_id, result.drop(columns=["anomaly", "anomaly_score"]),
+                          result["anomaly_score"].to_numpy(), result["anomaly"].to_numpy(),
+                          summary["model_version"])
+            db.finish_run(run_id)
+        except Exception as exc:
+            summary["error"] = f"Base de résultats : {type(exc).__name__}: {exc}"
+            print(f"   ❌ {os.path.basename(summary['file'])} : {summary['error']}")
+
+    def report(summary):
+        name = os.path.basename(summary["file"])
+        if summary["error"]:
+            print(f"   ❌ {name} : {summary['error']}")
+            return
+        print(f"   {name} : {summary['rows']} lignes, {summary['anomalies']} anomalies "
+              f"({summary['total_s']:.2f} s)")
+        if db is not None:
+            record(summary)
+
+    start = time.perf_counter()
+    try:
+        summaries = run_batch(
+            files, args.output_dir, model_path=args.model, n_workers=args.workers,
+            fmt=args.output_format, time_range=time_range, all_rows=args.results_all,
+            features=args.features, feature_windows=args.feature_windows, ewma_spans=args.ewma_spans,
+            prefilter=args.prefilter, audit_rate=args.audit_rate, on_result=report,
+        )
+    finally:
+        if db is not None:
+            db.close()
+    elapsed = time.perf_counter() - start
+
+    failed = [s for s in summaries if s["error"]]
+    total_rows = sum(s["rows"] for s in summaries)
+    print(f"Fichiers traités : {len(summaries) - len(failed)} sur {len(summaries)}")
+    print(f"Nombre total d'échantillons : {total_rows} ({total_rows / elapsed:,.0f} lignes/s)")
+    print(f"Nombre d'anomalies détectées : {sum(s['anomalies'] for s in summaries)}")
+    print(f"Résumé : {os.path.join(args.output_dir, SUMMARY_FILE)}")
+    if db is not None:
+        print(f"🗄️ Résultats enregistrés dans {args.results_db}")
+
+    if failed:
+        raise SystemExit(f"{len(failed)} fichier(s) en erreur (voir le résumé)")
+
+
+def main(argv=None):
     """
     Fonction principale du pipeline de détection d'anomalies.
     Elle orchestre toutes les étapes du projet :
     - Prétraitement
-    - Entraînement du modèle
+    - Entraînement du modèle (ou chargement de l'artefact)
     - Détection des anomalies
     """
+    args = parse_args(argv)
+
+    if args.features and (args.lean or args.partition_key):
+        raise SystemExit("--features n'est pas disponible avec --lean ou --partition-key")
+    if args.prefilter and args.partition_key:
+        raise SystemExit("--prefilter n'est pas disponible avec --partition-key")
+
+    time_range = None
+    if args.start is not None or args.end is not None:
+        time_range = (args.start, args.end)
+
+    if args.inputs:
+        if args.store or args.lean or args.sample_rows is not None or args.partition_key or args.save_model:
+            raise SystemExit("--inputs n'est pas disponible avec --store, --lean, --sample-rows, "
+                             "--partition-key ou --save-model")
+        run_files(args, time_range)
+        if args.profile:
+            RECORDER.write_report(args.profile)
+        return
+    if (args.lean or args.sample_rows is not None) and (
+            detect_format(args.data) != "csv" or time_range is not None or args.store):
+        raise SystemExit("--lean et --sample-rows lisent un CSV complet (sans --start / --end / --store)")
+
+    if args.sample_rows is not None:
+        if args.lean or args.partition_key or args.features:
+            raise SystemExit("--sample-rows n'est pas disponible avec --lean, --partition-key ou --features")
+        run_sampled(args)
+        if args.profile:
+            RECORDER.write_report(args.profile)
+        return
+
+    if args.lean:
+        if args.partition_key:
+            raise SystemExit("--partition-key n'est pas disponible en mode --lean")
+        run_lean(args)
+        if args.profile:
+            RECORDER.write_report(args.profile)
+        return
+
     print("🔄 Chargement et prétraitement des données...")
-    df, df_numeric, X_scaled = load_and_preprocess_data("kpi_5g.csv")
+    stored_scores = None
+    if args.store:
+        # Fenêtre de temps : seules les partitions concernées sont lues
+        store = KpiStore(args.store)
+        df = store.query(args.start, args.end)
+        print(f"   {len(df)} lignes, {len(store.partitions_for(args.start, args.end))} partition(s) "
+              f"lue(s) sur {len(store.manifest['partitions'])}")
+        if df.empty:
+            raise SystemExit("Aucune mesure dans cette fenêtre de temps")
+        if store.has_scores:
+            stored_scores = df.pop(SCORE_COLUMN).to_numpy()
+            # Scores stockés valables pour l'artefact du stockage uniquement
+            if not args.model and not (args.features or args.partition_key):
+                args.model = store.artifact_path
+            if args.model != store.artifact_path:
+                stored_scores = None
+        df_numeric, X_scaled = preprocess_frame(df)
+    elif time_range is not None:
+        # Plage de temps : seules les lignes utiles sont lues (pas de cache)
+        df, df_numeric, X_scaled = load_and_preprocess_data(args.data, time_range=time_range)
+    else:
+        df, df_numeric, X_scaled = load_and_preprocess_cached(args.data)
 
-    print("🤖 Entraînement du modèle Isolation Forest...")
-    model = train_isolation_forest(X_scaled)
+    features = None
+    if args.features and not args.model:
+        print("⏱️ Calcul des features temporelles...")
+        features = feature_config(df, windows=args.feature_windows, spans=args.ewma_spans)
+        with stage("features", rows=len(df)):
+            df_features = add_temporal_features(df, features)
+        df_numeric, X_scaled = preprocess_frame(df_features)
+
+    keys = None
+    if args.model:
+        print(f"📦 Chargement de l'artefact modèle {args.model}...")
+        artifact = load_artifact(args.model)
+        model = artifact["model"]
+        X_scaled = transform_with_artifact(df, artifact)  # Statistiques de l'entraînement
+        if getattr(model, "key_column", None):
+            keys = df[model.key_column].to_numpy()
+    elif args.partition_key:
+        print(f"🤖 Entraînement d'un Isolation Forest par valeur de {args.partition_key}...")
+        keys = df[args.partition_key].to_numpy()
+        # La clé de partition n'est pas une feature du modèle
+        kpi_columns = [c for c in df_numeric.columns if c != args.partition_key]
+        X_scaled = X_scaled[:, [df_numeric.columns.get_loc(c) for c in kpi_columns]]
+        df_numeric = df_numeric[kpi_columns]
+        model = train_per_partition(X_scaled, keys, n_workers=args.workers,
+                                    key_column=args.partition_key)
+        artifact = None
+    else:
+        print("🤖 Entraînement du modèle Isolation Forest...")
+        model = train_isolation_forest(X_scaled)
+        artifact = None
+
+    if args.save_model:
+        artifact = artifact or build_artifact(model, df_numeric, X_scaled, features=features)
+        save_artifact(artifact, args.save_model)
+        print(f"💾 Artefact modèle sauvegardé : {args.save_model}")
 
     print("🚨 Détection des anomalies...")
-    predictions, scores = predict_anomalies(model, X_scaled)
+    if keys is not None:
+        predictions, scores = model.predict_anomalies(X_scaled, keys)
+    elif stored_scores is not None and not args.prefilter:
+        # Scores bruts lus dans le stockage : seuil de l'artefact, sans parcours de la forêt
+        scores = stored_scores - artifact["threshold"]
+        predictions = np.where(scores < 0, -1, 1)
+    else:
+        predictions, scores = detect(model, X_scaled, artifact, args)
 
     df["anomaly"] = predictions
     df["anomaly_score"] = scores #anomaly_score : score de normalité (plus bas = plus anormal)
@@ -38,5 +442,21 @@ def main():
     print("\nExemples d'anomalies :")
     print(anomalies.head())
 
+    if args.results_db:
+        # Même nom de source que l'application : elle y retrouve cette exécution
+        if args.store:
+            source = run_source(args.store, (args.start, args.end))
+        else:
+            source = run_source(args.data, time_range)
+        db, run_id, version = open_results(args, artifact, source)
+        kpis = df.drop(columns=["anomaly", "anomaly_score"]).select_dtypes(include=[np.number])
+        record_results(db, run_id, version, args, kpis, predictions, np.asarray(scores))
+        db.finish_run(run_id)
+        db.close()
+        print(f"🗄️ Résultats enregistrés dans {args.results_db} (exécution {run_id})")
+
+    if args.profile:
+        RECORDER.write_report(args.profile)
+
 if __name__ == "__main__":
     main()
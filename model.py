@@ -3,28 +3,71 @@
 from sklearn.ensemble import IsolationForest
 import numpy as np
 
-def train_isolation_forest(X):
+from instrumentation import stage
+
+# Nombre de lignes évaluées par lot lors du scoring
+DEFAULT_BATCH_SIZE = 65_536
+
+# Arbres ajoutés entre deux notifications de progression
+DEFAULT_PROGRESS_STEP = 25
+
+def train_isolation_forest(X, n_estimators=200, contamination=0.05, max_features=1.0,
+                           n_jobs=-1, random_state=42, progress=None,
+                           progress_step=DEFAULT_PROGRESS_STEP):
     """
     Entraînement robuste du modèle Isolation Forest
+    - progress(arbres_construits, n_estimators) : appelé au fil de l'entraînement
+      (forêt construite par paliers, résultat identique à un fit unique)
     """
 
     model = IsolationForest(
-        n_estimators=200,          # Plus d'arbres = plus stable
+        n_estimators=n_estimators,     # Plus d'arbres = plus stable
         max_samples="auto",
-        contamination=0.05,        # 5% d'anomalies supposées
-        random_state=42,
-        n_jobs=-1                  # Utilise tous les cœurs CPU
+        contamination=contamination,   # 5% d'anomalies supposées par défaut
+        max_features=max_features,
+        random_state=random_state,
+        n_jobs=n_jobs                  # -1 : utilise tous les cœurs CPU
     )
 
-    model.fit(X)
+    with stage("fit", rows=len(X)):
+        if progress is None:
+            model.fit(X)
+        else:
+            # warm_start : chaque palier ajoute des arbres sans refaire les précédents.
+            # L'offset (seuil de contamination) n'est calculé qu'au dernier palier.
+            for n_trees in range(progress_step, n_estimators + progress_step, progress_step):
+                n_trees = min(n_trees, n_estimators)
+                last = n_trees == n_estimators
+                model.set_params(n_estimators=n_trees, warm_start=True,
+                                 contamination=contamination if last else "auto")
+                model.fit(X)
+                progress(n_trees, n_estimators)
+            model.set_params(warm_start=False)
     return model
 
 
-def predict_anomalies(model, X):
+def score_samples_batched(model, X, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Scores bruts (score_samples) calculés par lots :
+    la mémoire reste constante quel que soit le nombre de lignes
+    """
+    n_samples = len(X)
+    scores = np.empty(n_samples, dtype=np.float64)
+    for start in range(0, n_samples, batch_size):
+        stop = min(start + batch_size, n_samples)
+        scores[start:stop] = model.score_samples(X[start:stop])
+
+    return scores
+
+
+def predict_anomalies(model, X, batch_size=DEFAULT_BATCH_SIZE):
     """
     Prédiction des anomalies + score d'anomalie
+    - Un seul parcours de la forêt : les labels sont déduits
+      des scores via l'offset appris (comme model.predict)
     """
-    predictions = model.predict(X)      # -1 anomalie | 1 normal
-    scores = model.decision_function(X) # Score de normalité
+    with stage("predict", rows=len(X)):
+        scores = score_samples_batched(model, X, batch_size) - model.offset_  # Score de normalité
+        predictions = np.where(scores < 0, -1, 1)                            # -1 anomalie | 1 normal
 
     return predictions, scores
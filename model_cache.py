@@ -0,0 +1,129 @@
+# model_cache.py
+# Cache LRU des modèles entraînés, clé (empreinte des données, hyperparamètres) :
+# - revenir à une configuration déjà entraînée ne relance aucun fit
+# - budget mémoire : les modèles les moins récemment utilisés sont évincés
+#   (taille lue sur les tableaux des arbres, scores d'entraînement et préfiltre)
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_BUDGET_MB = int(os.environ.get("KPI_MODEL_CACHE_MB", 512))
+
+
+def config_key(data_key, **params):
+    """
+    Clé hachable et indépendante de l'ordre des paramètres
+    """
+    return (data_key, tuple(sorted(params.items())))
+
+
+def canonical_params(params, n_features):
+    """
+    Hyperparamètres sous une forme unique pour la clé : max_features en
+    nombre de features (1.0 et n_features entraînent le même modèle,
+    même règle que scikit-learn pour une fraction)
+    """
+    params = dict(params)
+    max_features = params.get("max_features")
+    if isinstance(max_features, float):
+        params["max_features"] = max(1, int(max_features * n_features))
+    elif max_features is not None:
+        params["max_features"] = int(max_features)
+    return params
+
+
+def _arrays_nbytes(values):
+    return sum(value.nbytes for value in values if isinstance(value, np.ndarray))
+
+
+def model_nbytes(model):
+    """
+    Mémoire d'un modèle d'après ses tableaux (noeuds et valeurs de chaque
+    arbre, features tirées, longueurs de chemin), sans le sérialiser
+    """
+    if hasattr(model, "fallback"):
+        # PartitionedForest : un modèle par partition + le modèle global
+        return sum(model_nbytes(m) for m in [model.fallback, *model.models.values()])
+
+    nbytes = _arrays_nbytes(vars(model).values())
+    for name in ("estimators_features_", "_average_path_length_per_tree", "_decision_path_lengths"):
+        nbytes += _arrays_nbytes(getattr(model, name, ()))
+    for tree in getattr(model, "estimators_", ()):
+        state = tree.tree_.__getstate__()
+        nbytes += state["nodes"].nbytes + state["values"].nbytes
+    return nbytes
+
+
+def artifact_nbytes(artifact):
+    """
+    Modèle + scores d'entraînement triés + tableaux du préfiltre
+    """
+    nbytes = model_nbytes(artifact["model"])
+    if artifact.get("train_scores") is not None:
+        nbytes += artifact["train_scores"].nbytes
+    if artifact.get("prefilter"):
+        nbytes += _arrays_nbytes(artifact["prefilter"].values())
+    return nbytes
+
+
+class ModelCache:
+    """
+    LRU borné en octets (thread-safe : alimenté par les jobs d'entraînement)
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_MB * 2**20):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()     # clé -> (artefact, taille)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        return sum(size for _, size in self._entries.values())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, artifact, nbytes=None):
+        """
+        Ajoute un artefact ; un artefact plus gros que le budget n'est pas gardé
+        """
+        if nbytes is None:
+            nbytes = artifact_nbytes(artifact)
+        if nbytes > self.budget_bytes:
+            return False
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (artifact, nbytes)
+            while self.nbytes > self.budget_bytes:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return True
+
+    def metrics(self):
+        return {
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,133 @@
+# partitioned.py
+# Un Isolation Forest par cellule / gNB :
+# - Les lignes sont triées par clé de partition puis copiées une seule fois
+#   dans un segment de mémoire partagée (pas de copie picklée par tâche)
+# - Chaque partition, ainsi que le modèle global de repli, est entraînée
+#   dans un pool de processus
+# - Le scoring route chaque groupe de lignes vers le modèle de sa partition
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from model import train_isolation_forest, predict_anomalies
+
+# En dessous de ce nombre de lignes, une partition utilise le modèle global
+DEFAULT_MIN_ROWS = 64
+
+# Copie vers la mémoire partagée par blocs (pas de copie triée complète en plus)
+COPY_BLOCK_ROWS = 65_536
+
+# Segment partagé ouvert une fois par processus du pool
+_worker_data = {}
+
+
+def _attach_shared(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    _worker_data["shm"] = shm
+    _worker_data["X"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _fit_partition(task):
+    key, start, stop, params = task
+    # Vue sur la mémoire partagée : aucune copie des lignes de la partition
+    model = train_isolation_forest(_worker_data["X"][start:stop], n_jobs=1, **params)
+    return key, model
+
+
+def _partition_bounds(keys):
+    """
+    Tri stable par clé : renvoie l'ordre, les clés uniques et leurs bornes
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    unique, starts = np.unique(sorted_keys, return_index=True)
+    stops = np.append(starts[1:], len(sorted_keys))
+    return order, unique, starts, stops
+
+
+class PartitionedForest:
+    """
+    Ensemble de forêts indexées par clé de partition (+ modèle global de repli
+    pour les partitions trop petites ou inconnues à l'entraînement)
+    """
+
+    def __init__(self, models, fallback, key_column=None):
+        self.models = models
+        self.fallback = fallback
+        self.key_column = key_column
+
+    def model_for(self, key):
+        return self.models.get(key, self.fallback)
+
+    def predict_anomalies(self, X, keys):
+        """
+        Même sortie que model.predict_anomalies, chaque ligne étant scorée
+        par le modèle de sa partition (un appel vectorisé par groupe)
+        """
+        keys = np.asarray(keys)
+        predictions = np.empty(len(X), dtype=np.int64)
+        scores = np.empty(len(X), dtype=np.float64)
+
+        order, unique, starts, stops = _partition_bounds(keys)
+        for key, start, stop in zip(unique, starts, stops):
+            rows = order[start:stop]
+            predictions[rows], scores[rows] = predict_anomalies(self.model_for(key), X[rows])
+
+        return predictions, scores
+
+
+def train_per_partition(X, keys, n_workers=None, min_rows=DEFAULT_MIN_ROWS,
+                        key_column=None, **params):
+    """
+    Entraîne un Isolation Forest par partition (cellule, gNB...) en parallèle.
+    - X : matrice prétraitée, keys : clé de partition de chaque ligne
+    - params : hyperparamètres transmis à train_isolation_forest
+    """
+    X = np.asarray(X)
+    keys = np.asarray(keys)
+    order, unique, starts, stops = _partition_bounds(keys)
+
+    tasks = [
+        (key.item(), start, stop, params)
+        for key, start, stop in zip(unique, starts, stops)
+        if stop - start >= min_rows
+    ]
+    if not tasks:
+        # Modèle global seul : repli pour toutes les partitions
+        return PartitionedForest({}, train_isolation_forest(X, **params), key_column)
+
+    # Copie unique, triée par partition, des données en float32
+    # (type utilisé en interne par IsolationForest)
+    shm = shared_memory.SharedMemory(create=True, size=max(X.shape[0] * X.shape[1] * 4, 1))
+    shared = None
+    try:
+        shared = np.ndarray(X.shape, dtype=np.float32, buffer=shm.buf)
+        for i in range(0, len(order), COPY_BLOCK_ROWS):
+            shared[i:i + COPY_BLOCK_ROWS] = X[order[i:i + COPY_BLOCK_ROWS]]
+
+        n_workers = n_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_attach_shared,
+            initargs=(shm.name, X.shape, np.float32),
+        ) as pool:
+            # Modèle global (repli pour les petites partitions et les clés inconnues) :
+            # la plus longue tâche, soumise en premier sur toutes les lignes partagées
+            fallback = pool.submit(_fit_partition, (None, 0, len(order), params))
+            # Plusieurs partitions par tâche pour amortir l'aller-retour IPC
+            chunksize = max(1, len(tasks) // (n_workers * 8))
+            models = dict(pool.map(_fit_partition, tasks, chunksize=chunksize))
+            fallback = fallback.result()[1]
+    finally:
+        # La vue doit être libérée avant close() (sinon BufferError, qui
+        # masquerait l'erreur d'entraînement) ; le segment est supprimé dans tous les cas
+        del shared
+        try:
+            shm.close()
+        finally:
+            shm.unlink()
+
+    return PartitionedForest(models, fallback, key_column)
@@ -0,0 +1,168 @@
+# prefilter.py
+# Préfiltre en cascade avant l'Isolation Forest :
+# - z-score robuste par KPI (médiane / MAD d'un échantillon des données
+#   d'entraînement : pas de copie de toute la matrice), calculé en une passe
+#   vectorisée, par lots
+# - seules les lignes hors de l'enveloppe (max des |z| au-dessus du seuil)
+#   et un échantillon d'audit aléatoire traversent la forêt
+# - seuil calibré à l'entraînement : quantile bas des |z| des anomalies
+#   d'entraînement (presque toutes restent dans la zone suspecte, une
+#   anomalie isolée à faible z ne fait pas tomber le seuil)
+# - lignes non évaluées : label normal et score défini, la borne supérieure
+#   des scores de la forêt (jamais NaN dans les sorties ni dans la base)
+# - cascade_recall : rappel de la cascade par rapport au scoring complet
+
+import time
+
+import numpy as np
+
+from compiled_forest import _average_path_length
+from instrumentation import stage
+from model import DEFAULT_BATCH_SIZE, predict_anomalies
+
+DEFAULT_Z_THRESHOLD = 3.0    # Seuil maximal de l'enveloppe (en MAD normalisées)
+DEFAULT_QUANTILE = 0.02      # Part des anomalies d'entraînement tolérée sous le seuil calibré
+DEFAULT_AUDIT_RATE = 0.01    # Part des lignes « normales » envoyées quand même à la forêt
+DEFAULT_STATS_SAMPLE = 100_000   # Lignes tirées pour la médiane / MAD
+
+# MAD -> écart-type pour une loi normale
+MAD_SCALE = 1.4826
+
+
+def robust_z_max(X, prefilter, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Plus grand |z| robuste de chaque ligne, calculé par lots
+    (mémoire temporaire bornée par batch_size)
+    """
+    z = np.empty(len(X), dtype=np.float64)
+    median, scale = prefilter["median"], prefilter["scale"]
+    for start in range(0, len(X), batch_size):
+        block = np.abs(X[start:start + batch_size] - median)
+        block /= scale
+        z[start:start + batch_size] = block.max(axis=1) if block.shape[1] else 0.0
+    return z
+
+
+def score_upper_bound(model):
+    """
+    Plus grand score (decision_function) que la forêt peut donner : chaque
+    arbre compté à sa feuille la plus profonde
+    - model : IsolationForest, ou moteur qui l'expose en .model (CompiledForest)
+    """
+    forest = getattr(model, "model", model)
+    depth = 0.0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        leaf = tree.children_left == -1
+        depth += float((tree.compute_node_depths()[leaf]
+                        + _average_path_length(tree.n_node_samples[leaf]) - 1.0).max())
+    denominator = len(forest.estimators_) * float(_average_path_length([forest.max_samples_])[0])
+    raw = -1.0 if denominator == 0 else -(2.0 ** (-depth / denominator))
+    return raw - float(forest.offset_)
+
+
+def fit_prefilter(X, raw_scores=None, offset=None, z_threshold=DEFAULT_Z_THRESHOLD,
+                  quantile=DEFAULT_QUANTILE, model=None, sample_rows=DEFAULT_STATS_SAMPLE,
+                  random_state=0):
+    """
+    Statistiques du préfiltre sur les données d'entraînement prétraitées
+    - raw_scores / offset (optionnels) : scores bruts de la forêt sur X et son
+      offset_ ; le seuil est alors abaissé au quantile `quantile` des |z| des
+      anomalies d'entraînement
+    - model (optionnel) : forêt, pour enregistrer le score des lignes non évaluées
+    - médiane / MAD sur sample_rows lignes tirées au hasard (X n'est jamais copié)
+    """
+    # 1. Médiane / MAD sur un échantillon de lignes
+    sample = X
+    if len(X) > sample_rows:
+        rng = np.random.default_rng(random_state)
+        sample = X[np.sort(rng.choice(len(X), size=sample_rows, replace=False))]
+    sample = np.asarray(sample, dtype=np.float64)
+    median = np.median(sample, axis=0)
+    scale = np.median(np.abs(sample - median), axis=0) * MAD_SCALE
+    # Colonnes à MAD nulle (valeurs discrètes) : écart-type, sinon 1
+    scale = np.where(scale > 0, scale, sample.std(axis=0))
+    scale = np.where(scale > 0, scale, 1.0)
+
+    prefilter = {"median": median, "scale": scale, "threshold": float(z_threshold)}
+    if model is not None:
+        prefilter["skipped_score"] = score_upper_bound(model)
+
+    # 2. Seuil calibré (|z| calculés par lots sur tout X)
+    z = robust_z_max(X, prefilter)
+    if raw_scores is not None and offset is not None:
+        anomalies = np.asarray(raw_scores) < offset
+        if anomalies.any():
+            prefilter["threshold"] = float(min(z_threshold, np.quantile(z[anomalies], quantile)))
+    prefilter["train_forest_fraction"] = float((z > prefilter["threshold"]).mean()) if len(z) else 0.0
+    return prefilter
+
+
+def predict_anomalies_cascade(model, X, prefilter, audit_rate=DEFAULT_AUDIT_RATE,
+                              random_state=0, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Même sortie que predict_anomalies (labels, scores) plus un résumé :
+    - model : forêt scikit-learn ou moteur exposant predict_anomalies(X)
+      (ex. CompiledForest)
+    - lignes dans l'enveloppe et hors audit : normales, non évaluées, avec
+      pour score la borne supérieure des scores de la forêt (score_upper_bound)
+    - audit_anomalies > 0 : la forêt trouve des anomalies que l'enveloppe
+      aurait laissé passer (seuil trop haut)
+    """
+    n_rows = len(X)
+
+    # 1. Préfiltre vectorisé
+    with stage("prefilter", rows=n_rows):
+        suspect = robust_z_max(X, prefilter, batch_size) > prefilter["threshold"]
+        rng = np.random.default_rng(random_state)
+        audit = (rng.random(n_rows) < audit_rate) & ~suspect
+        selected = np.flatnonzero(suspect | audit)
+
+    # 2. Forêt sur les lignes retenues uniquement
+    predictions = np.ones(n_rows, dtype=np.int64)
+    skipped_score = prefilter.get("skipped_score")
+    scores = np.full(n_rows, score_upper_bound(model) if skipped_score is None else skipped_score)
+    if len(selected):
+        if hasattr(model, "predict_anomalies"):
+            predictions[selected], scores[selected] = model.predict_anomalies(X[selected])
+        else:
+            predictions[selected], scores[selected] = predict_anomalies(model, X[selected], batch_size)
+
+    info = {
+        "rows": n_rows,
+        "threshold": prefilter["threshold"],
+        "suspect_rows": int(suspect.sum()),
+        "audit_rows": int(audit.sum()),
+        "audit_anomalies": int((predictions[audit] == -1).sum()),
+        "forest_rows": len(selected),
+        "forest_fraction": len(selected) / n_rows if n_rows else 0.0,
+    }
+    return predictions, scores, info
+
+
+def cascade_recall(model, X, prefilter, audit_rate=DEFAULT_AUDIT_RATE, random_state=0):
+    """
+    Compare la cascade au scoring complet sur les mêmes données :
+    rappel (anomalies complètes retrouvées), part de la forêt évitée, durées
+    """
+    start = time.perf_counter()
+    if hasattr(model, "predict_anomalies"):
+        full, _ = model.predict_anomalies(X)
+    else:
+        full, _ = predict_anomalies(model, X)
+    full_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictions, _, info = predict_anomalies_cascade(model, X, prefilter, audit_rate, random_state)
+    cascade_s = time.perf_counter() - start
+
+    full_anomalies = full == -1
+    found = int((full_anomalies & (predictions == -1)).sum())
+    return {
+        **info,
+        "full_anomalies": int(full_anomalies.sum()),
+        "cascade_anomalies": int((predictions == -1).sum()),
+        "recall": found / int(full_anomalies.sum()) if full_anomalies.any() else 1.0,
+        "full_s": full_s,
+        "cascade_s": cascade_s,
+    }
@@ -4,29 +4,380 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 
-def load_and_preprocess_data(csv_path):
+from instrumentation import stage
+from readers import read_kpis
+
+# Taille par défaut des blocs lus en mode streaming (lignes)
+DEFAULT_CHUNKSIZE = 100_000
+
+# Nombre de valeurs conservées par niveau du sketch de quantiles :
+# tant qu'une colonne en contient moins, la médiane est exacte.
+DEFAULT_SKETCH_CAPACITY = 200_000
+
+
+def load_and_preprocess_data(csv_path, columns=None, time_range=None):
     """
     Prétraitement robuste des données KPI 5G :
-    - Chargement
+    - Chargement (CSV, Parquet, Arrow IPC ou .npy, voir readers.py)
     - Nettoyage
     - Gestion des valeurs manquantes
     - Normalisation
+    columns / time_range : colonnes lues et plage de `time` (formats
+    colonnaires : le reste du fichier n'est pas lu)
     """
 
     # 1. Chargement
-    df = pd.read_csv(csv_path)
+    with stage("load"):
+        df = read_kpis(csv_path, columns=columns, time_range=time_range)
+
+    # 2 à 5. Nettoyage et normalisation
+    df_numeric, data_scaled = preprocess_frame(df)
+
+    return df, df_numeric, data_scaled
+
+
+def preprocess_frame(df):
+    """
+    Étapes de prétraitement sur un DataFrame déjà chargé
+    (fichier CSV, fenêtre glissante de KPI récents...)
+    """
 
     # 2. Sélection des colonnes numériques uniquement
     df_numeric = df.select_dtypes(include=[np.number])
 
     # 3. Gestion des valeurs manquantes (remplacement par la médiane)
-    df_numeric = df_numeric.fillna(df_numeric.median())
+    with stage("median_fill", rows=len(df_numeric)):
+        df_numeric = df_numeric.fillna(df_numeric.median())
 
     # 4. Suppression des colonnes constantes (variance nulle)
-    df_numeric = df_numeric.loc[:, df_numeric.var() > 0]
+    with stage("variance_filter", rows=len(df_numeric)):
+        df_numeric = df_numeric.loc[:, df_numeric.var() > 0]
 
     # 5. Normalisation (StandardScaler)
-    scaler = StandardScaler()
-    data_scaled = scaler.fit_transform(df_numeric)
+    with stage("scaling", rows=len(df_numeric)):
+        scaler = StandardScaler()
+        data_scaled = scaler.fit_transform(df_numeric)
 
-    return df, df_numeric, data_scaled
+    return df_numeric, data_scaled
+
+
+# ======================================================
+# MODE ALLÉGÉ (MATRICE FLOAT32 UNIQUE)
+# ======================================================
+def _count_rows(csv_path, block_size=1 << 20):
+    """
+    Nombre de lignes de données (hors en-tête), par simple comptage des sauts de ligne :
+    estimation seulement (saut de ligne entre guillemets, lignes vides, fins de ligne \r)
+    """
+    n_lines = 0
+    last = b"\n"
+    with open(csv_path, "rb") as f:
+        while block := f.read(block_size):
+            n_lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        n_lines += 1
+    return max(n_lines - 1, 0)
+
+
+def load_preprocessed_matrix(csv_path, dtype=np.float32, chunksize=DEFAULT_CHUNKSIZE, stats=None):
+    """
+    Même prétraitement que load_and_preprocess_data, sans DataFrame :
+    - seules les colonnes numériques sont lues, bloc par bloc, directement
+      dans une matrice contiguë préallouée (float32 par défaut)
+    - médiane, filtre de variance et normalisation appliqués en place
+    - stats (optionnel) : statistiques existantes (artefact) appliquées telles
+      quelles, comme transform_chunk
+    Renvoie (X, stats) : stats au format de stats_from_frame (colonnes,
+    médianes, moyenne, écart-type), utilisable pour transform_chunk / les artefacts.
+    """
+
+    # 1. Chargement : colonnes numériques détectées sur le premier bloc
+    with stage("load"):
+        n_rows = _count_rows(csv_path)
+        if stats is not None:
+            columns = list(stats["columns"])
+        else:
+            head = pd.read_csv(csv_path, nrows=chunksize)
+            columns = list(_numeric_chunk(head).columns)
+            del head
+
+        X = np.empty((n_rows, len(columns)), dtype=dtype)
+        filled = 0
+        for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+            non_numeric = [c for c in columns if c not in _numeric_chunk(chunk).columns]
+            if non_numeric:
+                raise ValueError(
+                    f"Colonnes non numériques après la ligne {filled} : {non_numeric} "
+                    "(utiliser load_and_preprocess_data)"
+                )
+            if filled + len(chunk) > len(X):
+                # Estimation trop basse : matrice agrandie (copie des lignes déjà lues)
+                grown = np.empty((max(2 * len(X), filled + len(chunk)), len(columns)), dtype=dtype)
+                grown[:filled] = X[:filled]
+                X = grown
+            X[filled:filled + len(chunk)] = chunk[columns].to_numpy(dtype=dtype)
+            filled += len(chunk)
+        if filled != len(X):
+            # Estimation trop haute (sauts de ligne entre guillemets, lignes vides) :
+            # matrice réduite en place, sans copie
+            X.resize((filled, len(columns)), refcheck=False)
+    if filled == 0:
+        raise ValueError(f"Aucune ligne de données dans {csv_path}")
+
+    if stats is not None:
+        with stage("scaling", rows=filled):
+            medians = np.asarray(stats["medians"], dtype=np.float64)
+            for j in range(len(columns)):
+                column = X[:, j]
+                column[np.isnan(column)] = medians[j]
+            X -= np.asarray(stats["mean"]).astype(dtype)
+            X /= np.asarray(stats["scale"]).astype(dtype)
+        return X, stats
+
+    # 2 à 3. Médianes (calcul en float64, une colonne à la fois) et complétion en place
+    with stage("median_fill", rows=filled):
+        medians = np.empty(len(columns))
+        for j in range(len(columns)):
+            column = X[:, j]
+            missing = np.isnan(column)
+            medians[j] = np.median(column[~missing].astype(np.float64)) if (~missing).any() else np.nan
+            if missing.any():
+                column[missing] = medians[j]
+
+    # 4. Suppression des colonnes constantes (variance nulle, ddof=1 comme pandas)
+    with stage("variance_filter", rows=filled):
+        mean = np.array([X[:, j].mean(dtype=np.float64) for j in range(len(columns))])
+        var = np.array([X[:, j].var(dtype=np.float64, ddof=1) if filled > 1 else np.nan
+                        for j in range(len(columns))])
+        keep = np.nan_to_num(var, nan=0.0) > 0
+        if not keep.all():
+            # Seule copie possible : quand des colonnes sont retirées
+            X = np.ascontiguousarray(X[:, keep])
+        columns = [c for c, k in zip(columns, keep) if k]
+        mean, var, medians = mean[keep], var[keep], medians[keep]
+
+    # 5. Normalisation en place (écart-type population, comme StandardScaler)
+    with stage("scaling", rows=filled):
+        scale = np.sqrt(var * (filled - 1) / filled)
+        X -= mean.astype(dtype)
+        X /= scale.astype(dtype)
+
+    stats = {
+        "columns": columns,
+        "medians": pd.Series(medians, index=columns, dtype=np.float64),
+        "mean": mean,
+        "scale": scale,
+        "n_rows": filled,
+    }
+    return X, stats
+
+
+def iter_csv_rows(csv_path, rows, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Relit les lignes d'origine (valeurs brutes, toutes colonnes) aux positions
+    triées `rows`, bloc par bloc : DataFrames indexés par numéro de ligne,
+    numérotation identique à celle de load_preprocessed_matrix
+    """
+    rows = np.asarray(rows)
+    start = 0
+    if len(rows) == 0:
+        return
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        stop = start + len(chunk)
+        lo, hi = np.searchsorted(rows, [start, stop])
+        if hi > lo:
+            selected = chunk.iloc[rows[lo:hi] - start]
+            selected.index = rows[lo:hi]
+            yield selected
+        if hi == len(rows):
+            break
+        start = stop
+
+
+# ======================================================
+# MODE STREAMING (MÉMOIRE BORNÉE)
+# ======================================================
+class QuantileSketch:
+    """
+    Sketch de quantiles fusionnable (compaction par niveaux, type KLL).
+    - Exact tant que le nombre de valeurs reste sous `capacity`
+    - Au-delà, chaque niveau garde au plus `capacity` valeurs pondérées
+    """
+
+    def __init__(self, capacity=DEFAULT_SKETCH_CAPACITY, seed=0):
+        self.capacity = capacity
+        self.count = 0
+        self._levels = [[]]          # niveau i : valeurs de poids 2**i
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self._levels[0].append(values)
+        self._compact()
+
+    def merge(self, other):
+        for level, buffers in enumerate(other._levels):
+            if level >= len(self._levels):
+                self._levels.append([])
+            self._levels[level].extend(buffers)
+        self.count += other.count
+        self._compact()
+
+    def _compact(self):
+        level = 0
+        while level < len(self._levels):
+            buffers = self._levels[level]
+            if sum(len(b) for b in buffers) > self.capacity:
+                values = np.sort(np.concatenate(buffers))
+                # Un élément sur deux monte au niveau supérieur (poids doublé)
+                offset = int(self._rng.integers(2))
+                if len(values) % 2:
+                    self._levels[level] = [values[-1:]]
+                    values = values[:-1]
+                else:
+                    self._levels[level] = []
+                if level + 1 == len(self._levels):
+                    self._levels.append([])
+                self._levels[level + 1].append(values[offset::2])
+            level += 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        if len(self._levels) == 1:
+            # Aucun compactage : quantile exact (même interpolation que pandas)
+            return float(np.quantile(np.concatenate(self._levels[0]), q))
+
+        values, weights = [], []
+        for level, buffers in enumerate(self._levels):
+            for b in buffers:
+                values.append(b)
+                weights.append(np.full(len(b), 2.0 ** level))
+        values = np.concatenate(values)
+        weights = np.concatenate(weights)
+        order = np.argsort(values)
+        values, weights = values[order], weights[order]
+        cum = np.cumsum(weights) - weights / 2
+        return float(np.interp(q * weights.sum(), cum, values))
+
+    def median(self):
+        return self.quantile(0.5)
+
+
+def _numeric_chunk(chunk):
+    return chunk.select_dtypes(include=[np.number])
+
+
+def fit_streaming_stats(csv_path, chunksize=DEFAULT_CHUNKSIZE,
+                        sketch_capacity=DEFAULT_SKETCH_CAPACITY):
+    """
+    Calcule les statistiques de prétraitement en deux passes sur le CSV :
+    - Passe 1 : médianes par sketch de quantiles
+    - Passe 2 : moyenne / variance en ligne (Welford, fusion de Chan)
+    La mémoire dépend de `chunksize`, pas de la taille du fichier.
+    """
+
+    # 1. Médianes (et détection des colonnes non numériques sur tout le fichier)
+    columns = None
+    excluded = set()
+    sketches = {}
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        numeric = _numeric_chunk(chunk)
+        if columns is None:
+            columns = list(numeric.columns)
+        excluded.update(c for c in columns if c not in numeric.columns)
+        for col in columns:
+            if col in excluded:
+                continue
+            sketch = sketches.setdefault(col, QuantileSketch(sketch_capacity))
+            sketch.update(numeric[col].to_numpy())
+
+    columns = [c for c in (columns or []) if c not in excluded]
+    medians = pd.Series({c: sketches[c].median() for c in columns}, dtype=np.float64)
+
+    # 2. Moyenne / variance sur les valeurs complétées par la médiane
+    n = 0
+    mean = np.zeros(len(columns))
+    m2 = np.zeros(len(columns))
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, usecols=columns):
+        block = chunk[columns].fillna(medians).to_numpy(dtype=np.float64)
+        n_b = len(block)
+        if n_b == 0:
+            continue
+        mean_b = block.mean(axis=0)
+        m2_b = ((block - mean_b) ** 2).sum(axis=0)
+        delta = mean_b - mean
+        total = n + n_b
+        mean = mean + delta * n_b / total
+        m2 = m2 + m2_b + delta ** 2 * n * n_b / total
+        n = total
+
+    # 3. Suppression des colonnes constantes (variance nulle, ddof=1 comme pandas)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = m2 / (n - 1)
+    keep = np.nan_to_num(var, nan=0.0) > 0
+
+    # 4. Paramètres du StandardScaler (écart-type population, ddof=0)
+    kept = [c for c, k in zip(columns, keep) if k]
+    return {
+        "columns": kept,
+        "medians": medians[kept],
+        "mean": mean[keep],
+        "scale": np.sqrt(m2[keep] / n),
+        "n_rows": n,
+    }
+
+
+def stats_from_frame(df_numeric):
+    """
+    Statistiques de prétraitement (même format que fit_streaming_stats)
+    déduites du df_numeric renvoyé par load_and_preprocess_data
+    """
+    return {
+        "columns": df_numeric.columns.tolist(),
+        "medians": df_numeric.median(),
+        "mean": df_numeric.mean().to_numpy(dtype=np.float64),
+        "scale": df_numeric.std(ddof=0).to_numpy(dtype=np.float64),
+        "n_rows": len(df_numeric),
+    }
+
+
+def transform_array(values, stats):
+    """
+    Même traitement que transform_chunk sur une matrice NumPy dont les
+    colonnes sont déjà dans l'ordre de stats["columns"]
+    """
+    values = np.array(values, dtype=np.float64)
+    missing = np.isnan(values)
+    if missing.any():
+        values[missing] = np.asarray(stats["medians"], dtype=np.float64)[np.nonzero(missing)[1]]
+    values -= stats["mean"]
+    values /= stats["scale"]
+    return values
+
+
+def transform_chunk(chunk, stats):
+    """
+    Applique des statistiques déjà calculées à un bloc de données :
+    complétion par la médiane puis normalisation.
+    """
+    block = chunk[stats["columns"]].fillna(stats["medians"])
+    return (block.to_numpy(dtype=np.float64) - stats["mean"]) / stats["scale"]
+
+
+def iter_preprocessed_chunks(csv_path, chunksize=DEFAULT_CHUNKSIZE, stats=None):
+    """
+    Version streaming de load_and_preprocess_data :
+    produit des couples (bloc brut, bloc normalisé) sans jamais charger
+    tout le fichier. Les statistiques sont calculées au préalable si besoin.
+    """
+    if stats is None:
+        stats = fit_streaming_stats(csv_path, chunksize=chunksize)
+
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        yield chunk, transform_chunk(chunk, stats)
@@ -0,0 +1,266 @@
+# readers.py
+# Lecture des KPI depuis plusieurs formats :
+# - CSV (pandas, comportement historique)
+# - Parquet : seules les colonnes KPI sont lues, filtre sur `time` poussé
+#   au niveau des row groups (statistiques min / max)
+# - Arrow IPC (.arrow / .feather) : fichier mappé en mémoire, lots hors de
+#   la plage de temps ignorés
+# - NumPy (.npy) mappé en mémoire, noms de colonnes dans un fichier .meta.json
+#   (plage de temps par recherche dichotomique si le fichier est trié)
+# pyarrow est optionnel : importé seulement pour Parquet / Arrow
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TIME_COLUMN = "time"
+DEFAULT_ROW_GROUP_ROWS = 128 * 1024
+
+FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".npy": "npy",
+}
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"Format de fichier non pris en charge : {path} "
+                         f"(extensions : {', '.join(sorted(FORMATS))})")
+    return FORMATS[ext]
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as exc:
+        raise ImportError("La lecture Parquet / Arrow nécessite pyarrow (pip install pyarrow)") from exc
+    return pa
+
+
+def _numeric_fields(schema):
+    pa = _pyarrow()
+    return [f.name for f in schema
+            if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)]
+
+
+def _projection(columns, time_range, time_column):
+    """
+    Colonnes à lire : KPI demandés, plus le temps si un filtre porte dessus
+    """
+    if time_range is not None and time_column not in columns:
+        return [*columns, time_column]
+    return list(columns)
+
+
+def _time_mask(times, time_range):
+    start, end = time_range
+    mask = np.ones(len(times), dtype=bool)
+    if start is not None:
+        mask &= times >= start
+    if end is not None:
+        mask &= times <= end
+    return mask
+
+
+def _finish(frame, columns, time_range, time_column):
+    """
+    Filtre exact des lignes (les row groups / lots ne sont qu'un premier tri)
+    et retrait de la colonne de temps si elle n'était lue que pour le filtre
+    """
+    if time_range is not None:
+        frame = frame[_time_mask(frame[time_column].to_numpy(), time_range)]
+    if columns is not None and time_column not in columns and time_column in frame.columns:
+        frame = frame.drop(columns=time_column)
+    return frame.reset_index(drop=True)
+
+
+def read_csv(path, columns=None, time_range=None, time_column=DEFAULT_TIME_COLUMN):
+    usecols = None if columns is None else _projection(columns, time_range, time_column)
+    return _finish(pd.read_csv(path, usecols=usecols), columns, time_range, time_column)
+
+
+def read_parquet(path, columns=None, time_range=None, time_column=DEFAULT_TIME_COLUMN):
+    _pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(path)
+    read_columns = _projection(columns or _numeric_fields(schema), time_range, time_column)
+
+    filters = None
+    if time_range is not None:
+        start, end = time_range
+        filters = [f for f in [(time_column, ">=", start) if start is not None else None,
+                               (time_column, "<=", end) if end is not None else None] if f]
+    # filters : row groups hors de la plage ignorés d'après leurs statistiques
+    table = pq.read_table(path, columns=read_columns, filters=filters or None)
+    return _finish(table.to_pandas(), columns, time_range, time_column)
+
+
+def read_arrow(path, columns=None, time_range=None, time_column=DEFAULT_TIME_COLUMN):
+    pa = _pyarrow()
+    import pyarrow.compute as pc
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        read_columns = _projection(columns or _numeric_fields(reader.schema), time_range, time_column)
+
+        batches = []
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if time_range is not None and batch.num_rows:
+                # Seule la colonne de temps du lot est parcourue (mémoire mappée)
+                bounds = pc.min_max(batch.column(time_column))
+                start, end = time_range
+                if ((start is not None and bounds["max"].as_py() < start)
+                        or (end is not None and bounds["min"].as_py() > end)):
+                    continue
+            batches.append(batch.select(read_columns))
+
+        schema = pa.schema([reader.schema.field(c) for c in read_columns])
+        frame = pa.Table.from_batches(batches, schema=schema).to_pandas()
+    return _finish(frame, columns, time_range, time_column)
+
+
+def _npy_meta_path(path):
+    return f"{path}.meta.json"
+
+
+def read_npy(path, columns=None, time_range=None, time_column=DEFAULT_TIME_COLUMN):
+    """
+    Matrice 2D mappée en mémoire : seules les lignes de la plage et les
+    colonnes demandées sont copiées
+    """
+    array = np.load(path, mmap_mode="r")
+    with open(_npy_meta_path(path), encoding="utf-8") as f:
+        meta = json.load(f)
+    names = meta["columns"]
+    read_columns = _projection(columns or names, time_range, time_column)
+
+    rows = slice(None)
+    if time_range is not None:
+        times = array[:, names.index(time_column)]
+        start, end = time_range
+        if meta.get("sorted_by") == time_column:
+            # Trié par temps : O(log n) pages lues pour trouver la plage
+            lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+            hi = len(times) if end is None else int(np.searchsorted(times, end, side="right"))
+            rows = slice(lo, hi)
+        else:
+            rows = np.flatnonzero(_time_mask(times, time_range))
+
+    index = [names.index(c) for c in read_columns]
+    # Une seule copie : lignes et colonnes sélectionnées ensemble (une tranche
+    # de lignes reste une vue de la matrice mappée)
+    values = array[rows, index] if isinstance(rows, slice) else array[np.ix_(rows, index)]
+    frame = pd.DataFrame(values, columns=read_columns)
+    return _finish(frame, columns, None, time_column)
+
+
+READERS = {"csv": read_csv, "parquet": read_parquet, "arrow": read_arrow, "npy": read_npy}
+
+
+def read_kpis(path, columns=None, time_range=None, time_column=DEFAULT_TIME_COLUMN):
+    """
+    Lecture d'un fichier KPI quel que soit son format
+    - columns : colonnes à lire (par défaut : colonnes numériques pour les
+      formats typés, tout le fichier pour le CSV)
+    - time_range : (début, fin) inclusifs sur `time_column`, None = non borné
+    """
+    return READERS[detect_format(path)](path, columns, time_range, time_column)
+
+
+def iter_kpis(path, columns=None, chunk_rows=DEFAULT_ROW_GROUP_ROWS):
+    """
+    Lecture bloc par bloc (au plus chunk_rows lignes) d'un fichier KPI, pour
+    les fichiers plus gros que la mémoire ; mêmes colonnes que read_kpis
+    """
+    fmt = detect_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+    elif fmt == "parquet":
+        _pyarrow()
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        read_columns = columns or _numeric_fields(parquet.schema_arrow)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=read_columns):
+            yield batch.to_pandas()
+    elif fmt == "arrow":
+        pa = _pyarrow()
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            read_columns = columns or _numeric_fields(reader.schema)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i).select(read_columns)
+                for start in range(0, batch.num_rows, chunk_rows):
+                    yield batch.slice(start, chunk_rows).to_pandas()
+    else:
+        array = np.load(path, mmap_mode="r")
+        with open(_npy_meta_path(path), encoding="utf-8") as f:
+            names = json.load(f)["columns"]
+        read_columns = columns or names
+        index = [names.index(c) for c in read_columns]
+        for start in range(0, len(array), chunk_rows):
+            # Seul le bloc est copié depuis la matrice mappée
+            yield pd.DataFrame(array[start:start + chunk_rows, index], columns=read_columns)
+
+
+# ======================================================
+# ÉCRITURE (archivage, conversion depuis le CSV)
+# ======================================================
+def write_kpis(frame, path, row_group_rows=DEFAULT_ROW_GROUP_ROWS, time_column=DEFAULT_TIME_COLUMN):
+    """
+    Écrit un DataFrame au format déduit de l'extension.
+    Les row groups / lots ne sont utiles au filtre de temps que si les
+    lignes sont dans l'ordre du temps.
+    """
+    fmt = detect_format(path)
+    if fmt == "csv":
+        frame.to_csv(path, index=False)
+    elif fmt == "parquet":
+        pa = _pyarrow()
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), path,
+                       row_group_size=row_group_rows)
+    elif fmt == "arrow":
+        pa = _pyarrow()
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=row_group_rows):
+                writer.write_batch(batch)
+    else:
+        numeric = frame.select_dtypes(include=[np.number])
+        np.save(path, numeric.to_numpy(dtype=np.float64))
+        sorted_by = None
+        if time_column in numeric.columns and numeric[time_column].is_monotonic_increasing:
+            sorted_by = time_column
+        with open(_npy_meta_path(path), "w", encoding="utf-8") as f:
+            json.dump({"columns": numeric.columns.tolist(), "sorted_by": sorted_by}, f)
+    return path
+
+
+def convert(src, dst, row_group_rows=DEFAULT_ROW_GROUP_ROWS):
+    return write_kpis(read_kpis(src), dst, row_group_rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversion d'un fichier KPI (CSV, Parquet, Arrow, npy)")
+    parser.add_argument("src", help="Fichier source")
+    parser.add_argument("dst", help="Fichier destination (format d'après l'extension)")
+    parser.add_argument("--row-group-rows", type=int, default=DEFAULT_ROW_GROUP_ROWS,
+                        help="Lignes par row group (Parquet) ou par lot (Arrow)")
+    args = parser.parse_args(argv)
+    print(f"Écrit : {convert(args.src, args.dst, args.row_group_rows)}")
+
+
+if __name__ == "__main__":
+    main()
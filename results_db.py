@@ -0,0 +1,392 @@
+# results_db.py
+# Base SQLite persistante des résultats de détection :
+# - une exécution (run) par fichier / fenêtre / flux scoré, avec la version
+#   du modèle et le seuil utilisé
+# - une ligne par mesure enregistrée : temps, valeurs KPI (colonnes kpi_*
+#   ajoutées à la volée), score, label, version du modèle
+# - journal WAL : les lectures (application) ne bloquent pas les écritures
+#   (main.py, streaming.py)
+# - insertions groupées (executemany) dans une transaction par lot
+# - index sur (run, temps) et sur (run, score) : pages d'anomalies par seuil
+#   de score sans parcourir la table ; parcours complet (export) paginé par
+#   clé (score, rowid), coût de chaque page indépendant de son rang
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_RESULTS_DB = "results.sqlite"
+INSERT_BATCH_ROWS = 50_000       # Lignes par appel executemany
+PAGE_ROWS = 50_000               # Lignes par page de iter_query
+KPI_PREFIX = "kpi_"
+DEFAULT_TIME_COLUMN = "time"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    source TEXT NOT NULL,
+    model_version TEXT,
+    threshold REAL,
+    columns TEXT,
+    rows INTEGER NOT NULL DEFAULT 0,
+    anomalies INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_source ON runs(source, model_version);
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS detections (
+    run_id INTEGER NOT NULL,
+    source_row INTEGER,
+    time REAL,
+    score REAL,
+    label INTEGER NOT NULL,
+    model_id INTEGER
+);
+DROP INDEX IF EXISTS idx_detections_time;
+CREATE INDEX IF NOT EXISTS idx_detections_run_time ON detections(run_id, time);
+CREATE INDEX IF NOT EXISTS idx_detections_score ON detections(run_id, score);
+"""
+
+BASE_COLUMNS = ["run_id", "source_row", "time", "score", "label", "model_id"]
+
+
+def model_label(artifact):
+    """
+    Identifiant lisible d'un modèle : date de l'artefact et version
+    (les réentraînements en continu incrémentent model_version)
+    """
+    if artifact is None:
+        return None
+    return f"{artifact.get('created_at', '?')}#{artifact.get('model_version', 0)}"
+
+
+def run_source(path, time_range=None):
+    """
+    Nom de source d'une exécution : chemin absolu, suivi de la plage de temps
+    lue ([début, fin]) ; partagé par main.py et l'application pour que
+    l'application retrouve les exécutions enregistrées
+    """
+    source = os.path.abspath(path)
+    if time_range is not None:
+        start, end = time_range
+        source += f"[{start if start is None else float(start)}, {end if end is None else float(end)}]"
+    return source
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ResultsDB:
+    """
+    Connexion unique protégée par un verrou (partagée entre les sessions
+    de l'application)
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_DB):
+        self.path = path
+        # isolation_level=None : transactions explicites (BEGIN / COMMIT)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")   # fsync aux checkpoints seulement
+            self._conn.execute("PRAGMA temp_store=MEMORY")
+            self._conn.executescript(SCHEMA)
+            self._kpi_columns = self._existing_kpi_columns()
+        self._models = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _existing_kpi_columns(self):
+        info = self._conn.execute("PRAGMA table_info(detections)").fetchall()
+        return [row[1][len(KPI_PREFIX):] for row in info if row[1].startswith(KPI_PREFIX)]
+
+    def _ensure_columns(self, columns):
+        missing = [c for c in columns if c not in self._kpi_columns]
+        for col in missing:
+            self._conn.execute(f"ALTER TABLE detections ADD COLUMN {_quote(KPI_PREFIX + col)} REAL")
+            self._kpi_columns.append(col)
+
+    def _model_id(self, label):
+        if label is None:
+            return None
+        if label not in self._models:
+            self._conn.execute("INSERT OR IGNORE INTO models(label) VALUES (?)", (label,))
+            self._models[label] = self._conn.execute(
+                "SELECT id FROM models WHERE label = ?", (label,)).fetchone()[0]
+        return self._models[label]
+
+    # ======================================================
+    # ÉCRITURE
+    # ======================================================
+    def start_run(self, source, model_version=None, threshold=None):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO runs(created_at, source, model_version, threshold) VALUES (?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), str(source), model_version,
+                 None if threshold is None else float(threshold)),
+            )
+            return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        """
+        Marque l'exécution comme complète et y reporte les comptes
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET complete = 1, "
+                "rows = (SELECT COUNT(*) FROM detections WHERE run_id = ?), "
+                "anomalies = (SELECT COUNT(*) FROM detections WHERE run_id = ? AND label = -1) "
+                "WHERE id = ?", (run_id, run_id, run_id))
+
+    def insert(self, run_id, frame, scores, labels, model_version=None,
+               time_column=DEFAULT_TIME_COLUMN, batch_rows=INSERT_BATCH_ROWS):
+        """
+        Enregistre des mesures scorées en une transaction :
+        - frame : valeurs KPI (colonnes numériques), index = numéro de ligne
+          dans la source
+        - scores, labels : sortie de predict_anomalies (score NaN -> NULL)
+        Renvoie le nombre de lignes écrites.
+        """
+        n_rows = len(frame)
+        if n_rows == 0:
+            return 0
+        numeric = frame.select_dtypes(include=[np.number])
+        kpis = [c for c in numeric.columns if c != time_column]
+
+        # Colonnes Python (tolist) : executemany n'itère que sur des tuples natifs
+        index = frame.index.to_numpy()
+        source_rows = index.tolist() if index.dtype.kind in "iu" else [None] * n_rows
+        times = (numeric[time_column].to_numpy(dtype=np.float64).tolist()
+                 if time_column in numeric.columns else [None] * n_rows)
+        scores = np.asarray(scores, dtype=np.float64).tolist()
+        labels = np.asarray(labels, dtype=np.int64).tolist()
+        values = [numeric[c].to_numpy(dtype=np.float64).tolist() for c in kpis]
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._ensure_columns(kpis)
+                model_id = self._model_id(model_version)
+                self._conn.execute("UPDATE runs SET columns = ? WHERE id = ? AND columns IS NULL",
+                                   (json.dumps(kpis), run_id))
+                names = BASE_COLUMNS + [KPI_PREFIX + c for c in kpis]
+                sql = (f"INSERT INTO detections({', '.join(_quote(n) for n in names)}) "
+                       f"VALUES ({', '.join('?' * len(names))})")
+                for start in range(0, n_rows, batch_rows):
+                    stop = start + batch_rows
+                    self._conn.executemany(sql, zip(
+                        [run_id] * (min(stop, n_rows) - start), source_rows[start:stop],
+                        times[start:stop], scores[start:stop], labels[start:stop],
+                        [model_id] * (min(stop, n_rows) - start),
+                        *(col[start:stop] for col in values)))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                # Colonnes et modèles ajoutés dans la transaction annulés eux aussi
+                self._kpi_columns = self._existing_kpi_columns()
+                self._models.clear()
+                raise
+        return n_rows
+
+    def delete_run(self, run_id):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM detections WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+            self._conn.execute("COMMIT")
+
+    # ======================================================
+    # LECTURE
+    # ======================================================
+    def runs(self, source=None):
+        sql = "SELECT * FROM runs"
+        params = ()
+        if source is not None:
+            sql += " WHERE source = ?"
+            params = (str(source),)
+        with self._lock:
+            return pd.read_sql_query(sql + " ORDER BY id", self._conn, params=params)
+
+    def find_run(self, source, model_version):
+        """
+        Dernière exécution complète pour cette source et ce modèle (ou None)
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM runs WHERE source = ? AND model_version IS ? AND complete = 1 "
+                "ORDER BY id DESC LIMIT 1", (str(source), model_version)).fetchone()
+        return None if row is None else row[0]
+
+    def latest_run(self, source):
+        """
+        Dernière exécution complète pour cette source, quel que soit le modèle
+        (dict des colonnes de runs, ou None)
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM runs WHERE source = ? AND complete = 1 ORDER BY id DESC LIMIT 1",
+                (str(source),))
+            row = cursor.fetchone()
+            names = [d[0] for d in cursor.description]
+        return None if row is None else dict(zip(names, row))
+
+    def scores(self, run_id):
+        """
+        (numéros de ligne, scores, labels) d'une exécution, sans les KPI
+        (score NULL -> NaN)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source_row, score, label FROM detections WHERE run_id = ?", (run_id,)).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64)
+        source_rows, scores, labels = zip(*rows)
+        return (np.array([-1 if r is None else r for r in source_rows], dtype=np.int64),
+                np.array(scores, dtype=np.float64), np.array(labels, dtype=np.int64))
+
+    @staticmethod
+    def _where(run_id, min_score, max_score, label, start, end):
+        clauses, params = [], []
+        for sql, value in [("d.run_id = ?", run_id), ("d.score >= ?", min_score),
+                           ("d.score <= ?", max_score), ("d.label = ?", label),
+                           ("d.time >= ?", start), ("d.time <= ?", end)]:
+            if value is not None:
+                clauses.append(sql)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, run_id=None, min_score=None, max_score=None, label=None, start=None, end=None):
+        """
+        (nombre de lignes, score moyen) sous les mêmes filtres que query
+        """
+        where, params = self._where(run_id, min_score, max_score, label, start, end)
+        with self._lock:
+            n, avg = self._conn.execute(
+                f"SELECT COUNT(*), AVG(d.score) FROM detections d{where}", params).fetchone()
+        return n, avg
+
+    def query(self, run_id=None, min_score=None, max_score=None, label=None, start=None, end=None,
+              limit=None, offset=0, order="score"):
+        """
+        Lignes filtrées, triées par score croissant (plus anormales d'abord)
+        ou par temps (order="time"), page LIMIT / OFFSET.
+        Colonnes : time, anomaly_score, anomaly, model_version puis les KPI ;
+        index = numéro de ligne dans la source.
+        """
+        if order not in ("score", "time"):
+            raise ValueError(f"Tri inconnu : {order}")
+        where, params = self._where(run_id, min_score, max_score, label, start, end)
+        columns = self.run_columns(run_id) if run_id is not None else list(self._kpi_columns)
+        suffix = f" ORDER BY d.{order}, d.rowid"
+        if limit is not None or offset:
+            suffix += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else int(limit), int(offset)]
+        return self._frame(self._select(columns, where, params, suffix), columns)
+
+    def iter_query(self, run_id, min_score=None, max_score=None, label=None, start=None, end=None,
+                   page_rows=PAGE_ROWS):
+        """
+        Mêmes lignes et même ordre que query(order="score"), par pages de
+        page_rows lignes : pagination par clé (score, rowid) sur l'index
+        (run, score), chaque page coûte O(page_rows) quel que soit son rang
+        (LIMIT / OFFSET relirait toutes les pages précédentes)
+        """
+        where, params = self._where(run_id, min_score, max_score, label, start, end)
+        columns = self.run_columns(run_id)
+
+        # 1. Scores NULL (placés en tête par SQLite), seulement sans filtre de score
+        if min_score is None and max_score is None:
+            last = 0
+            while True:
+                rows = self._select(columns, where + " AND d.score IS NULL AND d.rowid > ?",
+                                    [*params, last], " ORDER BY d.rowid LIMIT ?", page_rows)
+                if not rows:
+                    break
+                last = rows[-1][-1]
+                yield self._frame(rows, columns)
+
+        # 2. Scores renseignés : reprise strictement après le dernier couple (score, rowid)
+        key = None
+        while True:
+            clause = " AND d.score IS NOT NULL" if key is None else " AND (d.score, d.rowid) > (?, ?)"
+            rows = self._select(columns, where + clause, [*params, *(key or ())],
+                                " ORDER BY d.score, d.rowid LIMIT ?", page_rows)
+            if not rows:
+                break
+            key = (rows[-1][2], rows[-1][-1])
+            yield self._frame(rows, columns)
+
+    def _select(self, columns, where, params, suffix, limit=None):
+        # Dernière colonne : rowid (clé de pagination, retirée par _frame)
+        kpis = "".join(f", d.{_quote(KPI_PREFIX + c)}" for c in columns)
+        sql = (f"SELECT d.source_row, d.time, d.score, d.label, m.label{kpis}, d.rowid "
+               f"FROM detections d LEFT JOIN models m ON m.id = d.model_id{where}{suffix}")
+        if limit is not None:
+            params = [*params, int(limit)]
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _frame(rows, columns):
+        frame = pd.DataFrame(rows, columns=["source_row", "time", "anomaly_score", "anomaly",
+                                            "model_version", *columns, "rowid"])
+        # Colonne entièrement NULL dans une page : float (NaN) plutôt qu'objet
+        real = ["time", "anomaly_score", *columns]
+        frame[real] = frame[real].astype(np.float64)
+        frame = frame.drop(columns="rowid").set_index("source_row")
+        frame.index.name = None
+        return frame
+
+    def run_columns(self, run_id):
+        """
+        KPI enregistrés par une exécution (la table porte les colonnes de
+        toutes les sources)
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT columns FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Base des résultats de détection")
+    parser.add_argument("db", nargs="?", default=DEFAULT_RESULTS_DB)
+    parser.add_argument("--run", type=int, help="Exécution à interroger (défaut : liste des exécutions)")
+    parser.add_argument("--min-score", type=float)
+    parser.add_argument("--max-score", type=float, default=0.0,
+                        help="Score maximal (défaut 0 : anomalies au seuil du modèle)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--offset", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with ResultsDB(args.db) as db:
+        if args.run is None:
+            print(db.runs().to_string(index=False))
+            return
+        n, avg = db.count(args.run, args.min_score, args.max_score)
+        print(f"{n} lignes (score moyen {avg if avg is not None else float('nan'):.4f})")
+        print(db.query(args.run, args.min_score, args.max_score,
+                       limit=args.limit, offset=args.offset))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# retrain.py
+# Réentraînement en arrière-plan sur une fenêtre glissante de KPI récents :
+# - RollingWindow : tampon circulaire des N dernières lignes brutes
+# - ModelHolder : artefact courant, remplacé atomiquement (une seule affectation)
+# - BackgroundRetrainer : thread qui réentraîne périodiquement ou à la demande
+#   et expose durée d'entraînement, taille de fenêtre et horodatage des swaps
+# - TrainingJob : entraînement ponctuel avec d'autres hyperparamètres, hors du
+#   thread de l'interface, avec suivi de progression
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from artifact import build_artifact
+from features import add_temporal_features
+from model import train_isolation_forest
+from preprocess import preprocess_frame
+
+DEFAULT_WINDOW_ROWS = 100_000
+SWAP_HISTORY = 50
+
+
+class RollingWindow:
+    """
+    Tampon circulaire des `capacity` dernières lignes KPI (valeurs brutes)
+    """
+
+    def __init__(self, columns, capacity=DEFAULT_WINDOW_ROWS):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self._data = np.full((capacity, len(self.columns)), np.nan)
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, frame):
+        values = frame[self.columns].to_numpy(dtype=np.float64)[-self.capacity:]
+        n = len(values)
+        with self._lock:
+            first = min(n, self.capacity - self._next)
+            self._data[self._next:self._next + first] = values[:first]
+            self._data[:n - first] = values[first:]
+            self._next = (self._next + n) % self.capacity
+            self._size = min(self._size + n, self.capacity)
+
+    def snapshot(self):
+        """
+        Copie ordonnée (de la plus ancienne à la plus récente ligne)
+        """
+        with self._lock:
+            if self._size < self.capacity:
+                values = self._data[:self._size].copy()
+            else:
+                values = np.concatenate([self._data[self._next:], self._data[:self._next]])
+        return pd.DataFrame(values, columns=self.columns)
+
+
+class ModelHolder:
+    """
+    Référence vers l'artefact courant. Le remplacement est une simple
+    affectation : un lecteur voit l'ancien ou le nouveau modèle complet,
+    jamais un modèle à moitié construit, et le scoring ne s'arrête pas.
+    """
+
+    def __init__(self, artifact):
+        self._artifact = artifact
+        self.version = 1
+        self.swaps = deque(maxlen=SWAP_HISTORY)
+
+    def get(self):
+        return self._artifact
+
+    def swap(self, artifact):
+        artifact["model_version"] = self.version + 1
+        self._artifact = artifact
+        self.version += 1
+        self.swaps.append(datetime.now().isoformat(timespec="seconds"))
+
+
+def train_on_window(window, features=None, **params):
+    """
+    Même pipeline que main.py (features temporelles éventuelles, médianes,
+    filtre de variance, scaler, forêt) appliqué au contenu de la fenêtre
+    """
+    frame = window.snapshot()
+    if features:
+        frame = add_temporal_features(frame, features)
+    df_numeric, X_scaled = preprocess_frame(frame)
+    model = train_isolation_forest(X_scaled, **params)
+    return build_artifact(model, df_numeric, X_scaled, features=features)
+
+
+class BackgroundRetrainer(threading.Thread):
+    """
+    Thread de réentraînement :
+    - toutes les `interval` secondes (None = uniquement à la demande)
+    - ou dès request_retrain()
+    - prepare(artifact) optionnel (ex. compilation) exécuté avant le swap
+    """
+
+    def __init__(self, holder, window, interval=None, min_rows=256, prepare=None, **params):
+        super().__init__(daemon=True)
+        self.holder = holder
+        self.window = window
+        self.interval = interval
+        self.min_rows = min_rows
+        self.prepare = prepare
+        self.params = params
+
+        self._trigger = threading.Event()
+        self._stop_event = threading.Event()
+        self.running = False
+        self.retrain_count = 0
+        self.last_duration_s = None
+        self.last_window_rows = None
+        self.last_error = None
+
+    def request_retrain(self):
+        self._trigger.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._trigger.set()
+
+    def retrain_now(self):
+        if len(self.window) < self.min_rows:
+            self.last_error = f"Fenêtre trop petite ({len(self.window)} lignes)"
+            return False
+
+        self.running = True
+        start = time.perf_counter()
+        try:
+            # Mêmes features temporelles que le modèle remplacé
+            features = self.holder.get().get("features")
+            artifact = train_on_window(self.window, features=features, **self.params)
+            if self.prepare is not None:
+                artifact = self.prepare(artifact)
+        except Exception as exc:
+            self.last_error = str(exc)
+            return False
+        finally:
+            self.running = False
+
+        # Le modèle n'est publié qu'une fois entièrement construit
+        self.last_duration_s = time.perf_counter() - start
+        self.last_window_rows = len(self.window)
+        self.last_error = None
+        self.retrain_count += 1
+        self.holder.swap(artifact)
+        return True
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._trigger.wait(timeout=self.interval)
+            if self._stop_event.is_set():
+                break
+            self._trigger.clear()
+            self.retrain_now()
+
+    def metrics(self):
+        return {
+            "model_version": self.holder.version,
+            "retrain_count": self.retrain_count,
+            "running": self.running,
+            "last_duration_s": self.last_duration_s,
+            "window_rows": len(self.window),
+            "window_capacity": self.window.capacity,
+            "last_window_rows": self.last_window_rows,
+            "swaps": list(self.holder.swaps),
+            "last_error": self.last_error,
+        }
+
+
+class TrainingJob(threading.Thread):
+    """
+    Entraîne un artefact avec les hyperparamètres donnés dans un thread :
+    - progress (0 à 1) mis à jour à chaque palier d'arbres
+    - on_done(artifact) appelé une fois le modèle complet (cache, swap...)
+    """
+
+    def __init__(self, X, df_numeric, on_done=None, **params):
+        super().__init__(daemon=True)
+        self.X = X
+        self.df_numeric = df_numeric
+        self.on_done = on_done
+        self.params = params
+
+        self.progress = 0.0
+        self.status = "pending"
+        self.artifact = None
+        self.error = None
+        self.duration_s = None
+
+    def _report(self, done, total):
+        self.progress = done / total
+
+    def run(self):
+        self.status = "running"
+        start = time.perf_counter()
+        try:
+            model = train_isolation_forest(self.X, progress=self._report, **self.params)
+            self.artifact = build_artifact(model, self.df_numeric, self.X)
+            if self.on_done is not None:
+                self.on_done(self.artifact)
+        except Exception as exc:
+            self.error = str(exc)
+            self.status = "error"
+        else:
+            self.status = "done"
+        finally:
+            self.duration_s = time.perf_counter() - start
@@ -0,0 +1,102 @@
+# sampling.py
+# Entraînement sur échantillon pour les très gros historiques :
+# - Passe 1 : lecture du CSV par blocs, échantillon de réservoir borné
+#   (chaque ligne a la même probabilité d'être retenue, quelle que soit
+#   la taille du fichier)
+# - Médianes, scaler et forêt appris sur l'échantillon seul : la forêt ne
+#   tire de toute façon que max_samples (256) lignes par arbre
+# - Passe 2 : scoring de tout le fichier par blocs avec l'artefact obtenu
+# Mémoire et durée d'entraînement ne dépendent que de la taille de l'échantillon.
+
+import numpy as np
+import pandas as pd
+
+from artifact import build_artifact, predict_with_artifact
+from features import TemporalFeatureState
+from instrumentation import stage
+from model import train_isolation_forest
+from prefilter import DEFAULT_AUDIT_RATE, predict_anomalies_cascade
+from preprocess import DEFAULT_CHUNKSIZE, preprocess_frame, transform_chunk, _numeric_chunk
+
+# Taille par défaut du réservoir (lignes) : plusieurs centaines de fois
+# les 256 lignes tirées par arbre
+DEFAULT_SAMPLE_ROWS = 100_000
+
+
+def reservoir_sample_csv(csv_path, n_samples=DEFAULT_SAMPLE_ROWS, chunksize=DEFAULT_CHUNKSIZE,
+                         random_state=42):
+    """
+    Échantillon uniforme de `n_samples` lignes (colonnes numériques) en une
+    seule lecture du fichier (algorithme R, vectorisé par bloc).
+    Renvoie (échantillon, nombre de lignes lues).
+    """
+    rng = np.random.default_rng(random_state)
+    columns = reservoir = None
+    seen = 0
+
+    with stage("sample"):
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            numeric = _numeric_chunk(chunk)
+            if columns is None:
+                columns = list(numeric.columns)
+                reservoir = np.empty((n_samples, len(columns)), dtype=np.float64)
+            non_numeric = [c for c in columns if c not in numeric.columns]
+            if non_numeric:
+                raise ValueError(f"Colonnes non numériques après la ligne {seen} : {non_numeric}")
+            values = numeric[columns].to_numpy(dtype=np.float64)
+
+            # 1. Remplissage initial du réservoir
+            n_fill = max(0, min(n_samples - seen, len(values)))
+            reservoir[seen:seen + n_fill] = values[:n_fill]
+
+            # 2. Ligne d'indice global i retenue avec la probabilité n_samples / (i + 1),
+            #    à une place tirée au hasard
+            rest = values[n_fill:]
+            if len(rest):
+                index = np.arange(seen + n_fill, seen + len(values))
+                slots = (rng.random(len(rest)) * (index + 1)).astype(np.int64)
+                accepted = slots < n_samples
+                slots, rest = slots[accepted], rest[accepted]
+                # Même place tirée plusieurs fois dans le bloc : la dernière ligne l'emporte
+                _, last = np.unique(slots[::-1], return_index=True)
+                last = len(slots) - 1 - last
+                reservoir[slots[last]] = rest[last]
+            seen += len(values)
+
+    if columns is None:
+        raise ValueError(f"Aucune donnée dans {csv_path}")
+    return pd.DataFrame(reservoir[:min(seen, n_samples)], columns=columns), seen
+
+
+def train_on_sample(csv_path, n_samples=DEFAULT_SAMPLE_ROWS, chunksize=DEFAULT_CHUNKSIZE,
+                    random_state=42, **params):
+    """
+    Artefact appris sur un échantillon de réservoir du CSV (médianes, filtre
+    de variance, scaler et forêt : même pipeline que main.py)
+    Renvoie (artefact, nombre de lignes du fichier).
+    """
+    sample, n_rows = reservoir_sample_csv(csv_path, n_samples, chunksize, random_state)
+    df_numeric, X_sample = preprocess_frame(sample)
+    model = train_isolation_forest(X_sample, **params)
+    return build_artifact(model, df_numeric, X_sample), n_rows
+
+
+def iter_scored_chunks(csv_path, artifact, chunksize=DEFAULT_CHUNKSIZE, prefilter=False,
+                       audit_rate=DEFAULT_AUDIT_RATE):
+    """
+    Scoring complet du fichier, bloc par bloc : produit des triplets
+    (bloc brut, labels, scores) ; prefilter : cascade de l'artefact.
+    Features temporelles de l'artefact : état porté d'un bloc à l'autre
+    (même résultat que le calcul sur tout le fichier, lignes dans l'ordre du temps)
+    """
+    model = artifact["model"]
+    features = TemporalFeatureState(artifact["features"]) if artifact.get("features") else None
+    for i, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunksize)):
+        frame = features.transform(chunk) if features is not None else chunk
+        X = transform_chunk(frame, artifact["stats"])
+        if prefilter and artifact.get("prefilter") is not None:
+            predictions, scores, _ = predict_anomalies_cascade(
+                model, X, artifact["prefilter"], audit_rate, random_state=i)
+        else:
+            predictions, scores = predict_with_artifact(artifact, chunk, X)
+        yield chunk, predictions, scores
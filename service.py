@@ -0,0 +1,430 @@
+# service.py
+# Service HTTP asynchrone de scoring (asyncio, sans dépendance externe) :
+# - POST /score : lignes KPI en JSON ou CSV -> labels et scores
+# - Les petites requêtes concurrentes sont regroupées (coalescence) en un seul
+#   lot vectorisé dans une courte fenêtre de temps
+# - GET /stats : profondeur de file, tailles de lots, latences
+# - Entrées bornées : requête mal formée -> 400, corps trop gros -> 413,
+#   file de scoring pleine -> 503 (la mémoire ne croît pas avec la charge)
+# - GET /metrics : mêmes mesures + durées par étape au format Prometheus
+# - Client de charge local : python service.py loadtest ...
+
+import argparse
+import asyncio
+import io
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from artifact import load_or_train_artifact, require_single_forest
+from features import TemporalFeatureState, raw_columns
+from instrumentation import RECORDER, stage
+from model import predict_anomalies
+from preprocess import transform_array, transform_chunk
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_WINDOW_MS = 2.0          # Fenêtre de coalescence
+DEFAULT_MAX_BATCH_ROWS = 8192    # Taille maximale d'un lot coalescé
+DEFAULT_MAX_BODY_BYTES = 16 << 20   # Corps de requête accepté (Content-Length)
+DEFAULT_MAX_QUEUE = 1024         # Requêtes en attente de scoring (au-delà : 503)
+LATENCY_WINDOW = 10_000          # Requêtes conservées pour les percentiles
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 413: "Payload Too Large",
+                500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+# ======================================================
+# COALESCENCE DES REQUÊTES
+# ======================================================
+class BatchCoalescer:
+    """
+    Regroupe les requêtes en attente en un lot unique :
+    - le premier arrivé ouvre une fenêtre de `window_ms`
+    - le lot part à la fin de la fenêtre ou dès `max_batch_rows` lignes
+    - le scoring tourne dans un thread pour ne pas bloquer la boucle asyncio
+    - au plus max_queue requêtes en attente : score lève asyncio.QueueFull
+    """
+
+    def __init__(self, artifact, scorer=None, window_ms=DEFAULT_WINDOW_MS,
+                 max_batch_rows=DEFAULT_MAX_BATCH_ROWS, max_queue=DEFAULT_MAX_QUEUE):
+        self.stats = artifact["stats"]
+        self.model = artifact["model"]
+        # Colonnes attendues dans les requêtes : KPI bruts (les features
+        # temporelles éventuelles sont calculées ici, pas par le client)
+        self.columns = raw_columns(self.stats["columns"], artifact.get("features"))
+        # Features temporelles : les requêtes forment un seul flux, dans
+        # l'ordre d'arrivée (état en tampon circulaire comme streaming.py)
+        self.features = TemporalFeatureState(artifact["features"]) if artifact.get("features") else None
+        self.scorer = scorer
+        self.window = window_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+        self.requests = 0
+        self.rejected = 0
+        self.rows = 0
+        self.batches = 0
+        self.max_batch_size = 0
+        self.last_batch_size = 0
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    async def score(self, rows):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((rows, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        return await future
+
+    def _score_batch(self, blocks):
+        rows = np.concatenate(blocks)
+        with stage("score", rows=len(rows)):
+            if self.features is not None:
+                # Lots scorés un par un (boucle run) : état mis à jour dans l'ordre
+                frame = self.features.transform(pd.DataFrame(rows, columns=self.columns))
+                X = transform_chunk(frame, self.stats)
+            else:
+                X = transform_array(rows, self.stats)
+            if self.scorer is not None:
+                return self.scorer.predict_anomalies(X)
+            return predict_anomalies(self.model, X)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            n_rows = len(items[0][0])
+            deadline = loop.time() + self.window
+            while n_rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                n_rows += len(item[0])
+
+            blocks = [rows for rows, _, _ in items]
+            try:
+                predictions, scores = await loop.run_in_executor(None, self._score_batch, blocks)
+            except Exception as exc:
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            # Redécoupage du lot : chaque requête reçoit ses propres lignes
+            done = time.perf_counter()
+            start = 0
+            for rows, future, received in items:
+                stop = start + len(rows)
+                if not future.done():
+                    future.set_result((predictions[start:stop], scores[start:stop]))
+                self.latencies.append(done - received)
+                start = stop
+
+            self.requests += len(items)
+            self.rows += n_rows
+            self.batches += 1
+            self.last_batch_size = len(items)
+            self.max_batch_size = max(self.max_batch_size, len(items))
+            self.batch_sizes.append(len(items))
+
+    def metrics(self):
+        latencies = np.asarray(self.latencies) * 1000
+        sizes = np.asarray(self.batch_sizes)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "requests": self.requests,
+            "rejected_requests": self.rejected,
+            "rows": self.rows,
+            "batches": self.batches,
+            "mean_batch_requests": float(sizes.mean()) if len(sizes) else 0.0,
+            "last_batch_requests": self.last_batch_size,
+            "max_batch_requests": self.max_batch_size,
+            "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            "latency_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        }
+
+
+# ======================================================
+# HTTP MINIMAL
+# ======================================================
+def parse_rows(body, content_type, columns):
+    """
+    Corps de requête -> matrice brute (colonnes dans l'ordre `columns`)
+    - text/csv : CSV avec en-tête
+    - JSON : liste d'objets, {"rows": [...]} ou {"columns": [...], "data": [[...]]}
+    Les valeurs absentes (null) sont complétées ensuite par la médiane.
+    """
+    if "csv" in content_type:
+        frame = pd.read_csv(io.BytesIO(body))
+        missing = [c for c in columns if c not in frame.columns]
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {missing}")
+        return frame[columns].to_numpy(dtype=np.float64)
+
+    payload = json.loads(body)
+    if isinstance(payload, dict) and "data" in payload:
+        missing = [c for c in columns if c not in payload["columns"]]
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {missing}")
+        data = np.array(payload["data"], dtype=np.float64).reshape(-1, len(payload["columns"]))
+        return data[:, [payload["columns"].index(c) for c in columns]]
+
+    if isinstance(payload, dict):
+        payload = payload.get("rows", [])
+    missing = sorted({c for row in payload for c in columns if c not in row})
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {missing}")
+    return np.array([[row[c] for c in columns] for row in payload], dtype=np.float64)
+
+
+async def _write_response(writer, status, payload, keep_alive,
+                          content_type="application/json"):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    writer.write(head.encode() + body)
+    await writer.drain()
+
+
+def parse_head(head):
+    """
+    En-tête HTTP -> (méthode, chemin, version, en-têtes, longueur du corps) ;
+    ValueError si la ligne de requête ou Content-Length est invalide
+    """
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    parts = request_line.split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise ValueError(f"Ligne de requête invalide : {request_line[:100]!r}")
+    method, path, version = parts
+    headers = {}
+    for line in header_lines:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    length = headers.get("content-length", "0")
+    if not length.isdigit():
+        raise ValueError(f"Content-Length invalide : {length[:100]!r}")
+    return method, path, version, headers, int(length)
+
+
+async def handle_connection(reader, writer, coalescer, max_body_bytes=DEFAULT_MAX_BODY_BYTES):
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                # En-têtes plus longs que la limite du flux : la connexion est abandonnée
+                await _write_response(writer, 400, {"error": "En-têtes trop longs"}, False)
+                break
+
+            # Requête illisible ou corps trop gros : réponse puis fermeture
+            # (la suite du flux ne peut pas être découpée en requêtes)
+            try:
+                method, path, version, headers, length = parse_head(head)
+            except ValueError as exc:
+                await _write_response(writer, 400, {"error": str(exc)}, False)
+                break
+            if length > max_body_bytes:
+                await _write_response(writer, 413, {"error": f"Corps limité à {max_body_bytes} octets"},
+                                      False)
+                break
+            try:
+                body = await reader.readexactly(length)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+            if path == "/score":
+                if method != "POST":
+                    await _write_response(writer, 405, {"error": "POST attendu"}, keep_alive)
+                    continue
+                try:
+                    rows = parse_rows(body, headers.get("content-type", "application/json"),
+                                      coalescer.columns)
+                except (ValueError, KeyError, TypeError) as exc:
+                    await _write_response(writer, 400, {"error": str(exc)}, keep_alive)
+                    continue
+                if len(rows) == 0:
+                    await _write_response(writer, 200, {"predictions": [], "scores": []}, keep_alive)
+                    continue
+                try:
+                    predictions, scores = await coalescer.score(rows)
+                except asyncio.QueueFull:
+                    await _write_response(writer, 503, {"error": "File de scoring pleine, réessayer"},
+                                          keep_alive)
+                    continue
+                except Exception as exc:
+                    await _write_response(writer, 500, {"error": str(exc)}, keep_alive)
+                    continue
+                await _write_response(writer, 200, {
+                    "predictions": predictions.tolist(),
+                    "scores": scores.tolist(),
+                }, keep_alive)
+            elif path == "/stats":
+                await _write_response(writer, 200, coalescer.metrics(), keep_alive)
+            elif path == "/metrics":
+                text = RECORDER.prometheus(coalescer.metrics()).encode()
+                await _write_response(writer, 200, text, keep_alive,
+                                      content_type="text/plain; version=0.0.4")
+            elif path == "/health":
+                await _write_response(writer, 200, {"status": "ok"}, keep_alive)
+            else:
+                await _write_response(writer, 404, {"error": f"{path} inconnu"}, keep_alive)
+
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve(artifact, host=DEFAULT_HOST, port=DEFAULT_PORT, scorer=None,
+                window_ms=DEFAULT_WINDOW_MS, max_batch_rows=DEFAULT_MAX_BATCH_ROWS,
+                max_body_bytes=DEFAULT_MAX_BODY_BYTES, max_queue=DEFAULT_MAX_QUEUE):
+    coalescer = BatchCoalescer(artifact, scorer=scorer, window_ms=window_ms,
+                               max_batch_rows=max_batch_rows, max_queue=max_queue)
+    worker = asyncio.create_task(coalescer.run())
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(r, w, coalescer, max_body_bytes), host, port
+    )
+    print(f"📡 Service de scoring sur http://{host}:{port} (POST /score, GET /stats, GET /metrics)")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        worker.cancel()
+
+
+# ======================================================
+# CLIENT DE CHARGE LOCAL
+# ======================================================
+async def _client(host, port, n_requests, payload, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = (
+        f"POST /score HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n"
+    ).encode() + payload
+    try:
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.decode("latin-1").split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    length = int(line.split(":", 1)[1])
+            await reader.readexactly(length)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors.append(head.split(b"\r\n", 1)[0].decode())
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def load_test(host=DEFAULT_HOST, port=DEFAULT_PORT, concurrency=64, requests=5000,
+                    rows_per_request=10, reference_csv="kpi_5g.csv"):
+    """
+    Envoie `requests` requêtes de `rows_per_request` lignes avec `concurrency`
+    clients simultanés (connexions keep-alive) et mesure le débit / les latences
+    """
+    reference = pd.read_csv(reference_csv)
+    sample = reference.sample(rows_per_request, replace=True, random_state=0)
+    payload = json.dumps({
+        "columns": sample.columns.tolist(),
+        "data": sample.to_numpy().tolist(),
+    }).encode()
+
+    latencies, errors = [], []
+    per_client = max(1, requests // concurrency)
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, per_client, payload, latencies, errors)
+        for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    lat = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_s": len(latencies) / elapsed,
+        "rows_per_s": len(latencies) * rows_per_request / elapsed,
+        "latency_p50_ms": float(np.percentile(lat, 50)),
+        "latency_p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service HTTP de scoring KPI 5G")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    srv = sub.add_parser("serve", help="Démarre le service de scoring")
+    srv.add_argument("--host", default=DEFAULT_HOST)
+    srv.add_argument("--port", type=int, default=DEFAULT_PORT)
+    srv.add_argument("--model", metavar="CHEMIN", help="Artefact modèle (main.py --save-model)")
+    srv.add_argument("--reference", default="kpi_5g.csv",
+                     help="CSV d'entraînement si aucun artefact n'est fourni")
+    srv.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS)
+    srv.add_argument("--max-batch-rows", type=int, default=DEFAULT_MAX_BATCH_ROWS)
+    srv.add_argument("--max-body-bytes", type=int, default=DEFAULT_MAX_BODY_BYTES,
+                     help="Taille maximale d'un corps de requête (au-delà : 413)")
+    srv.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                     help="Requêtes en attente de scoring (au-delà : 503)")
+    srv.add_argument("--compiled", action="store_true",
+                     help="Scoring avec le moteur compilé (compiled_forest)")
+
+    load = sub.add_parser("loadtest", help="Client de charge local")
+    load.add_argument("--host", default=DEFAULT_HOST)
+    load.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load.add_argument("--concurrency", type=int, default=64)
+    load.add_argument("--requests", type=int, default=5000)
+    load.add_argument("--rows", type=int, default=10, help="Lignes par requête")
+    load.add_argument("--reference", default="kpi_5g.csv")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "loadtest":
+        report = asyncio.run(load_test(args.host, args.port, args.concurrency,
+                                       args.requests, args.rows, args.reference))
+        print(json.dumps(report, indent=2))
+        return
+
+    artifact = load_or_train_artifact(args.model, args.reference)
+    try:
+        # Requêtes sans colonne de partition : une seule forêt
+        require_single_forest(artifact, "service.py")
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    scorer = None
+    if args.compiled:
+        from compiled_forest import compile_forest
+        scorer = compile_forest(artifact["model"])
+
+    try:
+        asyncio.run(serve(artifact, args.host, args.port, scorer=scorer,
+                          window_ms=args.window_ms, max_batch_rows=args.max_batch_rows,
+                          max_body_bytes=args.max_body_bytes, max_queue=args.max_queue))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,621 @@
+# streaming.py
+# Détection en continu sur un flux de KPI 5G :
+# - Sources : fichier CSV qui grossit (tail -f), socket TCP locale, pipe (stdin)
+# - Prétraitement incrémental avec les médianes / le scaler de l'artefact
+#   (features temporelles éventuelles : état en tampon circulaire entre les lots)
+# - Scoring par micro-lots, file bornée entre lecture et scoring (contre-pression)
+#   avec préfiltre en cascade optionnel (--prefilter)
+# - Émission des anomalies et des latences par lot
+# - Anomalies enregistrées dans une base SQLite de résultats (--results-db)
+# - Métriques Prometheus écrites périodiquement dans un fichier (--metrics-file)
+# - Producteur local de test : python streaming.py produce ...
+
+import argparse
+import io
+import os
+import queue
+import select
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from artifact import load_or_train_artifact, require_single_forest
+from features import TemporalFeatureState, raw_columns
+from instrumentation import RECORDER, stage
+from model import predict_anomalies
+from prefilter import DEFAULT_AUDIT_RATE, predict_anomalies_cascade
+from preprocess import transform_chunk
+from results_db import ResultsDB, model_label
+from retrain import BackgroundRetrainer, ModelHolder, RollingWindow, DEFAULT_WINDOW_ROWS
+
+DEFAULT_BATCH_ROWS = 50_000      # Taille maximale d'un micro-lot
+DEFAULT_MAX_WAIT = 0.2           # Attente maximale avant d'envoyer un lot incomplet (s)
+DEFAULT_QUEUE_BATCHES = 8        # Lots en attente avant blocage du lecteur
+DEFAULT_METRICS_INTERVAL = 5.0   # Période d'écriture du fichier de métriques (s)
+PUT_TIMEOUT = 0.1                # Attente d'une place dans la file avant de revérifier l'arrêt (s)
+LATENCY_WINDOW = 10_000          # Lots conservés pour les percentiles de latence
+READ_BLOCK = 1 << 20
+
+
+# ======================================================
+# SOURCES : chaque source produit des couples (en-tête, bloc) où le bloc
+# contient uniquement des lignes complètes (bytes), ou None lorsqu'aucune
+# donnée n'est disponible pour l'instant. La première ligne de chaque flux
+# (fichier, pipe, connexion) est l'en-tête CSV.
+# ======================================================
+class _LineBlocks:
+    """
+    Découpe un flux d'octets en blocs de lignes complètes, sans
+    découper ligne par ligne en Python
+    """
+
+    def __init__(self):
+        self.header = None
+        self._rest = b""
+
+    def feed(self, data):
+        data = self._rest + data
+        end = data.rfind(b"\n") + 1
+        self._rest = data[end:]
+        block = data[:end]
+        if self.header is None:
+            cut = block.find(b"\n") + 1
+            if cut == 0:
+                self._rest = data
+                return None
+            self.header, block = block[:cut].strip(), block[cut:]
+        return (self.header, block) if block.strip() else None
+
+    def flush(self):
+        rest, self._rest = self._rest, b""
+        if self.header is not None and rest.strip():
+            return self.header, rest + b"\n"
+        return None
+
+
+def follow_file(path, stop_event, poll_interval=0.05):
+    """
+    Suit un fichier CSV qui grossit (équivalent de tail -f depuis le début)
+    """
+    blocks = _LineBlocks()
+    with open(path, "rb") as f:
+        while not stop_event.is_set():
+            data = f.read(READ_BLOCK)
+            if not data:
+                yield None
+                time.sleep(poll_interval)
+                continue
+            item = blocks.feed(data)
+            if item is not None:
+                yield item
+
+
+def read_pipe(fileobj, stop_event, poll_interval=0.05):
+    """
+    Lit un pipe (stdin par défaut) sans bloquer indéfiniment
+    """
+    blocks = _LineBlocks()
+    fd = fileobj.fileno()
+    while not stop_event.is_set():
+        ready, _, _ = select.select([fd], [], [], poll_interval)
+        if not ready:
+            yield None
+            continue
+        data = os.read(fd, READ_BLOCK)
+        if not data:
+            break
+        item = blocks.feed(data)
+        if item is not None:
+            yield item
+    item = blocks.flush()
+    if item is not None:
+        yield item
+
+
+def listen_socket(host, port, stop_event, poll_interval=0.05):
+    """
+    Serveur TCP local : chaque connexion envoie un en-tête CSV puis des lignes.
+    Tant que le lot précédent n'est pas consommé, le socket n'est plus lu :
+    la contre-pression TCP ralentit le producteur.
+    """
+    with socket.create_server((host, port)) as server:
+        server.settimeout(poll_interval)
+        while not stop_event.is_set():
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                yield None
+                continue
+            blocks = _LineBlocks()
+            with conn:
+                conn.settimeout(poll_interval)
+                while not stop_event.is_set():
+                    try:
+                        data = conn.recv(READ_BLOCK)
+                    except socket.timeout:
+                        yield None
+                        continue
+                    if not data:
+                        break
+                    item = blocks.feed(data)
+                    if item is not None:
+                        yield item
+            item = blocks.flush()
+            if item is not None:
+                yield item
+
+
+# ======================================================
+# MICRO-LOTS ET FILE BORNÉE
+# ======================================================
+def _csv_engine():
+    # pyarrow (optionnel) : analyse CSV environ 2x plus rapide que le moteur C
+    try:
+        import pyarrow.csv  # noqa: F401
+    except ImportError:
+        return "c"
+    return "pyarrow"
+
+
+CSV_ENGINE = _csv_engine()
+
+
+class _Stopped(Exception):
+    """Arrêt demandé pendant l'attente d'une place dans la file"""
+
+
+def _put(out_queue, item, stop_event):
+    """
+    Dépose item dans la file bornée ; renvoie False si l'arrêt est demandé
+    avant qu'une place se libère (consommateur arrêté : jamais de blocage)
+    """
+    while True:
+        try:
+            out_queue.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            if stop_event.is_set():
+                return False
+
+
+def _batch_reader(source, out_queue, stop_event, batch_rows, max_wait, idle_timeout):
+    """
+    Regroupe les blocs en micro-lots et les dépose dans une file bornée.
+    Quand la file est pleine la lecture s'arrête d'elle-même, jusqu'à ce
+    qu'une place se libère ou que l'arrêt soit demandé.
+    """
+    pending, pending_rows, first_arrival, header = [], 0, None, None
+    last_data = time.perf_counter()
+
+    def flush():
+        nonlocal pending, pending_rows, first_arrival
+        if pending and not _put(out_queue, (header, b"".join(pending), pending_rows, first_arrival),
+                                stop_event):
+            raise _Stopped
+        pending, pending_rows, first_arrival = [], 0, None
+
+    try:
+        for item in source:
+            now = time.perf_counter()
+            if item is None:
+                if idle_timeout is not None and now - last_data > idle_timeout:
+                    break
+            else:
+                last_data = now
+                if item[0] != header:
+                    flush()               # Un lot ne mélange pas deux schémas
+                    header = item[0]
+                if first_arrival is None:
+                    first_arrival = now
+                pending.append(item[1])
+                pending_rows += item[1].count(b"\n")
+            if pending_rows >= batch_rows or (pending and now - first_arrival >= max_wait):
+                flush()
+        flush()
+    except _Stopped:
+        pass
+    finally:
+        # Fin de flux (abandonnée si l'arrêt est demandé pendant que la file est pleine)
+        _put(out_queue, None, stop_event)
+        stop_event.set()
+
+
+def with_scorer(artifact, compiled=False):
+    """
+    Ajoute à l'artefact le moteur de scoring à utiliser : tout objet exposant
+    predict_anomalies(X) (ex. CompiledForest), sinon la forêt scikit-learn
+    """
+    if compiled:
+        from compiled_forest import compile_forest
+        return {**artifact, "scorer": compile_forest(artifact["model"])}
+    return artifact
+
+
+class StreamDetector:
+    """
+    Applique l'artefact courant (médianes, scaler, forêt) à des micro-lots CSV.
+    L'artefact est relu à chaque lot : un réentraînement en arrière-plan
+    (retrain.py) prend effet au lot suivant sans interrompre le flux.
+    """
+
+    def __init__(self, holder, window=None, prefilter=False, audit_rate=DEFAULT_AUDIT_RATE):
+        self.holder = holder
+        self.window = window
+        self.features = None     # TemporalFeatureState si l'artefact utilise des features
+        self.prefilter = prefilter
+        self.audit_rate = audit_rate
+        self.batches = 0
+        self.rows = 0
+        self.anomalies = 0
+        self.forest_rows = 0       # Lignes évaluées par la forêt (toutes sans préfiltre)
+        self.audit_anomalies = 0
+        self.model_label = None    # Modèle du dernier lot scoré
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def score_block(self, header, block):
+        """
+        Analyse et score un lot de lignes CSV : renvoie les anomalies du lot
+        """
+        columns = header.decode().split(",")
+        with stage("parse"):
+            chunk = pd.read_csv(io.BytesIO(block), names=columns, header=None, engine=CSV_ENGINE)
+        artifact = self.holder.get()
+        config = artifact.get("features")
+        if config and (self.features is None or self.features.config != config):
+            self.features = TemporalFeatureState(config)
+        with stage("score", rows=len(chunk)):
+            frame = self.features.transform(chunk) if config else chunk
+            X = transform_chunk(frame, artifact["stats"])
+            scorer = artifact.get("scorer") or artifact["model"]
+            if self.prefilter and artifact.get("prefilter") is not None:
+                # Tirage d'audit différent à chaque lot
+                predictions, scores, info = predict_anomalies_cascade(
+                    scorer, X, artifact["prefilter"], self.audit_rate, random_state=self.batches)
+                self.forest_rows += info["forest_rows"]
+                self.audit_anomalies += info["audit_anomalies"]
+            else:
+                if artifact.get("scorer") is not None:
+                    predictions, scores = scorer.predict_anomalies(X)
+                else:
+                    predictions, scores = predict_anomalies(scorer, X)
+                self.forest_rows += len(X)
+        if self.window is not None:
+            self.window.append(chunk)
+
+        mask = predictions == -1
+        anomalies = chunk[mask].copy()
+        anomalies["anomaly_score"] = scores[mask]
+        anomalies.index += self.rows     # Numéros de ligne dans le flux
+        self.model_label = model_label(artifact)
+
+        self.batches += 1
+        self.rows += len(chunk)
+        self.anomalies += int(mask.sum())
+        return anomalies
+
+    def latency_summary(self):
+        if not self.latencies:
+            return {}
+        lat = np.asarray(self.latencies) * 1000
+        return {
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p99_ms": float(np.percentile(lat, 99)),
+            "max_ms": float(lat.max()),
+        }
+
+
+def run_detection(source, holder, emit, report=None, batch_rows=DEFAULT_BATCH_ROWS,
+                  max_wait=DEFAULT_MAX_WAIT, queue_batches=DEFAULT_QUEUE_BATCHES,
+                  idle_timeout=None, window=None, stop_event=None, prefilter=False,
+                  audit_rate=DEFAULT_AUDIT_RATE):
+    """
+    Boucle de détection : un thread lit la source, le thread appelant score.
+    - holder : ModelHolder contenant l'artefact courant
+    - window : RollingWindow (optionnelle) alimentée avec les lignes scorées
+    - prefilter : préfiltre en cascade de l'artefact (s'il en contient un)
+    - emit(anomalies_df, batch_info) est appelé pour chaque lot
+    - report(detector, batch_info) (optionnel) après chaque lot
+    """
+    stop_event = stop_event or threading.Event()
+    batches = queue.Queue(maxsize=queue_batches)
+    reader = threading.Thread(
+        target=_batch_reader,
+        args=(source, batches, stop_event, batch_rows, max_wait, idle_timeout),
+        daemon=True,
+    )
+    detector = StreamDetector(holder, window=window, prefilter=prefilter, audit_rate=audit_rate)
+    start = time.perf_counter()
+    reader.start()
+
+    try:
+        while True:
+            try:
+                item = batches.get(timeout=PUT_TIMEOUT)
+            except queue.Empty:
+                # Lecteur arrêté sans marqueur de fin (arrêt demandé, file pleine)
+                if reader.is_alive():
+                    continue
+                break
+            if item is None:
+                break
+            header, block, n_rows, first_arrival = item
+            t0 = time.perf_counter()
+            anomalies = detector.score_block(header, block)
+            done = time.perf_counter()
+
+            # Latence de bout en bout : arrivée de la 1re ligne -> anomalies émises
+            detector.latencies.append(done - first_arrival)
+            batch_info = {
+                "batch": detector.batches,
+                "rows": n_rows,
+                "anomalies": len(anomalies),
+                "score_ms": (done - t0) * 1000,
+                "latency_ms": (done - first_arrival) * 1000,
+                "queue_depth": batches.qsize(),
+                "model_version": holder.version,
+                "model_label": detector.model_label,
+            }
+            emit(anomalies, batch_info)
+            if report is not None:
+                report(detector, batch_info)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        reader.join(timeout=1.0)
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "batches": detector.batches,
+        "rows": detector.rows,
+        "anomalies": detector.anomalies,
+        "elapsed_s": elapsed,
+        "rows_per_s": detector.rows / elapsed if elapsed > 0 else 0.0,
+        "forest_fraction": detector.forest_rows / detector.rows if detector.rows else 0.0,
+        "audit_anomalies": detector.audit_anomalies,
+        **detector.latency_summary(),
+    }
+    return summary
+
+
+# ======================================================
+# PRODUCTEUR LOCAL (SIMULATION D'UN FLUX KPI)
+# ======================================================
+def generate_kpi_rows(reference, n_rows, anomaly_rate=0.01, noise=0.05, rng=None):
+    """
+    Lignes KPI synthétiques dans le schéma du CSV de référence :
+    lignes de référence tirées au hasard + bruit gaussien (conserve les
+    corrélations entre KPI), quelques anomalies injectées
+    """
+    rng = rng or np.random.default_rng()
+    numeric = reference.select_dtypes(include=[np.number])
+    base = numeric.to_numpy(dtype=np.float64)
+    std = numeric.std().to_numpy()
+
+    values = base[rng.integers(len(base), size=n_rows)]
+    noisy = rng.normal(0.0, noise, size=values.shape) * std
+    anomalous = rng.random(n_rows) < anomaly_rate
+    noisy[anomalous] += rng.choice([-6, 6], size=(anomalous.sum(), len(std))) * std
+
+    rows = pd.DataFrame(values, columns=numeric.columns)
+    for i, col in enumerate(numeric.columns):
+        # `time` est une feature du modèle : on garde l'index de la ligne tirée
+        if col != "time":
+            rows[col] += noisy[:, i]
+    return rows
+
+
+def produce(target, n_rows, rate=None, block_rows=10_000, reference_csv="kpi_5g.csv",
+            anomaly_rate=0.01, seed=0):
+    """
+    Écrit n_rows lignes KPI vers un fichier (ajout), host:port (TCP) ou '-' (stdout),
+    à un débit cible de `rate` lignes/s (None = le plus vite possible)
+    """
+    reference = pd.read_csv(reference_csv)
+    rng = np.random.default_rng(seed)
+    header = ",".join(reference.select_dtypes(include=[np.number]).columns) + "\n"
+
+    if target == "-":
+        out, close = sys.stdout.buffer, False
+    elif ":" in target:
+        host, port = target.rsplit(":", 1)
+        sock = socket.create_connection((host, int(port)))
+        out, close = sock.makefile("wb"), True
+    else:
+        new_file = not os.path.exists(target) or os.path.getsize(target) == 0
+        out, close = open(target, "ab"), True
+        if not new_file:
+            header = ""
+
+    start = time.perf_counter()
+    written = 0
+    try:
+        out.write(header.encode())
+        while written < n_rows:
+            n = min(block_rows, n_rows - written)
+            block = generate_kpi_rows(reference, n, anomaly_rate=anomaly_rate, rng=rng)
+            out.write(block.to_csv(header=False, index=False).encode())
+            out.flush()
+            written += n
+            if rate:
+                delay = written / rate - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        if close:
+            out.close()
+    return written
+
+
+# ======================================================
+# LIGNE DE COMMANDE
+# ======================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Détection d'anomalies KPI 5G en continu")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    detect = sub.add_parser("detect", help="Score un flux KPI en continu")
+    source = detect.add_mutually_exclusive_group(required=True)
+    source.add_argument("--follow", metavar="CSV", help="Fichier CSV qui grossit")
+    source.add_argument("--listen", metavar="HOTE:PORT", help="Socket TCP locale")
+    source.add_argument("--stdin", action="store_true", help="Lecture sur l'entrée standard")
+    detect.add_argument("--model", metavar="CHEMIN", help="Artefact modèle (main.py --save-model)")
+    detect.add_argument("--reference", default="kpi_5g.csv",
+                        help="CSV d'entraînement si aucun artefact n'est fourni")
+    detect.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    detect.add_argument("--max-wait", type=float, default=DEFAULT_MAX_WAIT)
+    detect.add_argument("--queue-batches", type=int, default=DEFAULT_QUEUE_BATCHES)
+    detect.add_argument("--idle-timeout", type=float,
+                        help="Arrêt après N secondes sans nouvelle donnée")
+    detect.add_argument("--compiled", action=argparse.BooleanOptionalAction, default=True,
+                        help="Scoring avec le moteur compilé (compiled_forest, scores "
+                             "identiques, environ 1.5x plus rapide) ; --no-compiled : scikit-learn")
+    detect.add_argument("--prefilter", action="store_true",
+                        help="Préfiltre z-score robuste de l'artefact avant la forêt")
+    detect.add_argument("--audit-rate", type=float, default=DEFAULT_AUDIT_RATE,
+                        help="Part des lignes normales auditées par la forêt avec --prefilter")
+    detect.add_argument("--output", help="Fichier CSV des anomalies (défaut : stdout)")
+    detect.add_argument("--retrain-interval", type=float,
+                        help="Réentraînement en arrière-plan toutes les N secondes")
+    detect.add_argument("--window-rows", type=int, default=DEFAULT_WINDOW_ROWS,
+                        help="Taille de la fenêtre glissante de réentraînement")
+    detect.add_argument("--results-db", metavar="CHEMIN",
+                        help="Enregistre les anomalies (score, modèle) dans une base SQLite")
+    detect.add_argument("--metrics-file", metavar="CHEMIN",
+                        help="Fichier de métriques Prometheus (collecteur textfile)")
+    detect.add_argument("--metrics-interval", type=float, default=DEFAULT_METRICS_INTERVAL,
+                        help="Période d'écriture du fichier de métriques (s)")
+
+    prod = sub.add_parser("produce", help="Producteur local de KPI synthétiques")
+    prod.add_argument("target", help="Fichier CSV, HOTE:PORT ou '-'")
+    prod.add_argument("--rows", type=int, default=1_000_000)
+    prod.add_argument("--rate", type=float, help="Lignes par seconde (défaut : max)")
+    prod.add_argument("--anomaly-rate", type=float, default=0.01)
+    prod.add_argument("--reference", default="kpi_5g.csv")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "produce":
+        produce(args.target, args.rows, rate=args.rate,
+                reference_csv=args.reference, anomaly_rate=args.anomaly_rate)
+        return
+
+    artifact = load_or_train_artifact(args.model, args.reference)
+    try:
+        require_single_forest(artifact, "streaming.py")
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    holder = ModelHolder(with_scorer(artifact, args.compiled))
+
+    window = retrainer = None
+    if args.retrain_interval:
+        window = RollingWindow(raw_columns(artifact["stats"]["columns"], artifact.get("features")),
+                               capacity=args.window_rows)
+        retrainer = BackgroundRetrainer(
+            holder, window, interval=args.retrain_interval,
+            prepare=lambda new: with_scorer(new, args.compiled),
+        )
+        retrainer.start()
+
+    stop_event = threading.Event()
+    if args.follow:
+        source = follow_file(args.follow, stop_event)
+    elif args.listen:
+        host, port = args.listen.rsplit(":", 1)
+        source = listen_socket(host, int(port), stop_event)
+    else:
+        source = read_pipe(sys.stdin.buffer, stop_event)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    header_written = False
+
+    db = run_id = None
+    if args.results_db:
+        db = ResultsDB(args.results_db)
+        name = os.path.abspath(args.follow) if args.follow else (
+            f"tcp://{args.listen}" if args.listen else "stdin")
+        run_id = db.start_run(name, model_label(artifact), artifact["threshold"])
+
+    def emit(anomalies, batch_info):
+        nonlocal header_written
+        if len(anomalies):
+            anomalies.to_csv(out, header=not header_written, index=False)
+            header_written = True
+            out.flush()
+            if db is not None:
+                # Une transaction par lot
+                with stage("results_db", rows=len(anomalies)):
+                    db.insert(run_id, anomalies.drop(columns="anomaly_score"),
+                              anomalies["anomaly_score"].to_numpy(), np.full(len(anomalies), -1),
+                              batch_info["model_label"])
+        print(f"lot {batch_info['batch']} : {batch_info['rows']} lignes, "
+              f"{batch_info['anomalies']} anomalies, scoring {batch_info['score_ms']:.1f} ms, "
+              f"latence {batch_info['latency_ms']:.1f} ms, file {batch_info['queue_depth']}, "
+              f"modèle v{batch_info['model_version']}",
+              file=sys.stderr)
+
+    last_metrics = 0.0
+
+    def write_metrics(detector, batch_info, force=False):
+        nonlocal last_metrics
+        now = time.perf_counter()
+        if not force and now - last_metrics < args.metrics_interval:
+            return
+        last_metrics = now
+        extra = {"stream_batches": detector.batches, "stream_rows": detector.rows,
+                 "stream_anomalies": detector.anomalies,
+                 "stream_forest_rows": detector.forest_rows,
+                 "stream_audit_anomalies": detector.audit_anomalies,
+                 "queue_depth": batch_info.get("queue_depth"),
+                 "model_version": holder.version,
+                 **{f"latency_{k}": v for k, v in detector.latency_summary().items()}}
+        if retrainer is not None:
+            m = retrainer.metrics()
+            extra.update(retrain_count=m["retrain_count"], retrain_running=m["running"],
+                         retrain_last_duration_s=m["last_duration_s"], window_rows=m["window_rows"])
+        RECORDER.write_prometheus(args.metrics_file, extra)
+
+    detector_ref = {}
+
+    def report(detector, batch_info):
+        detector_ref["detector"] = detector
+        write_metrics(detector, batch_info)
+
+    try:
+        summary = run_detection(
+            source, holder, emit, report=report if args.metrics_file else None,
+            batch_rows=args.batch_rows, max_wait=args.max_wait,
+            queue_batches=args.queue_batches, idle_timeout=args.idle_timeout,
+            window=window, stop_event=stop_event,
+            prefilter=args.prefilter, audit_rate=args.audit_rate,
+        )
+    finally:
+        if retrainer is not None:
+            retrainer.stop()
+        if args.output:
+            out.close()
+        if db is not None:
+            db.finish_run(run_id)
+            db.close()
+        if args.metrics_file and "detector" in detector_ref:
+            write_metrics(detector_ref["detector"], {}, force=True)
+
+    print(f"Total : {summary['rows']} lignes, {summary['anomalies']} anomalies, "
+          f"{summary['rows_per_s']:,.0f} lignes/s, latence p50 {summary.get('p50_ms', 0):.1f} ms "
+          f"/ p99 {summary.get('p99_ms', 0):.1f} ms", file=sys.stderr)
+    if args.prefilter:
+        print(f"Préfiltre : {summary['forest_fraction']:.1%} des lignes évaluées par la forêt, "
+              f"{summary['audit_anomalies']} anomalie(s) trouvée(s) par l'audit", file=sys.stderr)
+    if retrainer is not None:
+        m = retrainer.metrics()
+        print(f"Réentraînements : {m['retrain_count']} (dernier {m['last_duration_s'] or 0:.2f} s "
+              f"sur {m['last_window_rows'] or 0} lignes), swaps : {m['swaps']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
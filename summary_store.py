@@ -0,0 +1,189 @@
+# summary_store.py
+# Résumés statistiques incrémentaux par KPI et par classe (normal / anomalie) :
+# - count, moyenne, écart-type (Welford, fusion de Chan), min, max
+# - sketch de quantiles fusionnable (médiane, quartiles des box plots)
+# - Mis à jour bloc par bloc : la page Analyse KPI ne relit jamais l'historique
+# - Résumés par rang (RankedSummaryStore) : blocs de lignes triées par score,
+#   changer de seuil ne relit que le bloc coupé
+
+import numpy as np
+import pandas as pd
+
+from preprocess import QuantileSketch
+
+# Valeurs gardées par niveau de sketch : quartiles exacts en dessous,
+# erreur de rang de l'ordre de 1/capacity au-delà
+DEFAULT_SUMMARY_CAPACITY = 4096
+
+# Libellés de classe (sortie de predict_anomalies)
+CLASS_LABELS = {1: "normal", -1: "anomaly"}
+
+# Blocs de lignes triées par score (RankedSummaryStore)
+DEFAULT_RANK_BLOCKS = 64
+
+# Index identique à pandas.Series.describe()
+DESCRIBE_INDEX = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+
+class KpiSummary:
+    """
+    Résumé d'une colonne pour une classe
+    """
+
+    def __init__(self, capacity=DEFAULT_SUMMARY_CAPACITY):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(capacity)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        n_b = len(values)
+        mean_b = values.mean()
+        self._merge_moments(n_b, mean_b, ((values - mean_b) ** 2).sum())
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.sketch.update(values)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    def _merge_moments(self, n_b, mean_b, m2_b):
+        total = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / total
+        self.m2 += m2_b + delta ** 2 * self.count * n_b / total
+        self.count = total
+
+    def stats(self):
+        """
+        Statistiques descriptives et bornes du box plot (moustaches de Tukey :
+        1,5 x écart interquartile, limitées au min / max observés)
+        """
+        if self.count == 0:
+            return dict.fromkeys(
+                ["count", "mean", "std", "min", "q1", "median", "q3", "max",
+                 "lower_fence", "upper_fence"], np.nan)
+        q1, median, q3 = (self.sketch.quantile(q) for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan,
+            "min": self.min,
+            "q1": q1,
+            "median": median,
+            "q3": q3,
+            "max": self.max,
+            "lower_fence": max(self.min, q1 - 1.5 * iqr),
+            "upper_fence": min(self.max, q3 + 1.5 * iqr),
+        }
+
+
+class SummaryStore:
+    """
+    Résumés de toutes les colonnes KPI, pour chaque classe de prédiction
+    """
+
+    def __init__(self, columns, capacity=DEFAULT_SUMMARY_CAPACITY):
+        self.columns = list(columns)
+        self.summaries = {
+            label: {col: KpiSummary(capacity) for col in self.columns}
+            for label in CLASS_LABELS
+        }
+
+    def update(self, frame, predictions):
+        """
+        Ajoute un bloc de lignes scorées (predictions : -1 / 1 par ligne)
+        """
+        predictions = np.asarray(predictions)
+        for label, summaries in self.summaries.items():
+            mask = predictions == label
+            if not mask.any():
+                continue
+            block = frame.loc[mask, self.columns].to_numpy(dtype=np.float64)
+            for i, col in enumerate(self.columns):
+                summaries[col].update(block[:, i])
+
+    def merge(self, other):
+        for label, summaries in other.summaries.items():
+            for col, summary in summaries.items():
+                self.summaries[label][col].merge(summary)
+
+    def stats(self, column, label):
+        return self.summaries[label][column].stats()
+
+    def describe(self, column, label):
+        """
+        Même forme que Series.describe() (count, mean, std, min, 25%...)
+        """
+        s = self.stats(column, label)
+        return pd.Series(
+            [s["count"], s["mean"], s["std"], s["min"], s["q1"], s["median"], s["q3"], s["max"]],
+            index=DESCRIBE_INDEX, dtype=np.float64,
+        )
+
+
+def build_summary_store(frame, predictions, columns, chunk_rows=100_000,
+                        capacity=DEFAULT_SUMMARY_CAPACITY):
+    """
+    Construit le résumé d'un historique déjà scoré, bloc par bloc
+    """
+    store = SummaryStore(columns, capacity)
+    predictions = np.asarray(predictions)
+    for start in range(0, len(frame), chunk_rows):
+        store.update(frame.iloc[start:start + chunk_rows], predictions[start:start + chunk_rows])
+    return store
+
+
+class RankedSummaryStore:
+    """
+    Résumés de lignes triées par score croissant (plus anormales d'abord),
+    par blocs consécutifs : pour une coupure k (k premières lignes =
+    anomalies), chaque classe fusionne les blocs entiers de son côté et
+    seul le bloc coupé est relu
+    """
+
+    def __init__(self, ranked, columns, n_blocks=DEFAULT_RANK_BLOCKS,
+                 capacity=DEFAULT_SUMMARY_CAPACITY):
+        self.ranked = ranked
+        self.columns = list(columns)
+        self.capacity = capacity
+        self.block_rows = max(1, -(-len(ranked) // n_blocks))
+        self.blocks = []
+        for start in range(0, len(ranked), self.block_rows):
+            values = ranked.iloc[start:start + self.block_rows][self.columns].to_numpy(dtype=np.float64)
+            block = {col: KpiSummary(capacity) for col in self.columns}
+            for i, col in enumerate(self.columns):
+                block[col].update(values[:, i])
+            self.blocks.append(block)
+
+    def at(self, n_anomalies):
+        """
+        SummaryStore des deux classes pour les n_anomalies premières lignes
+        """
+        store = SummaryStore(self.columns, self.capacity)
+        cut = n_anomalies // self.block_rows
+        for b, block in enumerate(self.blocks):
+            if b == cut:
+                continue
+            summaries = store.summaries[-1 if b < cut else 1]
+            for col, summary in block.items():
+                summaries[col].merge(summary)
+
+        # Bloc coupé : ses lignes sont réparties entre les deux classes
+        if cut < len(self.blocks):
+            start = cut * self.block_rows
+            rows = self.ranked.iloc[start:start + self.block_rows]
+            store.update(rows, np.where(np.arange(len(rows)) < n_anomalies - start, -1, 1))
+        return store
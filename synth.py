@@ -0,0 +1,119 @@
+# synth.py
+# Générateur vectorisé de tables KPI 5G synthétiques :
+# - Même schéma que kpi_5g.csv (time, dl_throughput, ul_throughput, latency, packet_loss)
+# - KPI supplémentaires (kpi_5, kpi_6...) pour tester des tables plus larges
+# - Anomalies injectées par rafales (profil d'attaque observé dans kpi_5g.csv :
+#   débit effondré, latence et pertes en hausse), étiquettes renvoyées à part
+# - Écriture CSV par blocs : taille mémoire indépendante du nombre de lignes
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# (moyenne, écart-type) en régime normal puis pendant une attaque
+BASE_KPIS = {
+    "dl_throughput": ((120.0, 10.0), (42.0, 8.0)),
+    "ul_throughput": ((40.0, 5.0), (15.0, 4.0)),
+    "latency": ((15.0, 2.0), (61.0, 10.0)),
+    "packet_loss": ((0.2, 0.05), (3.0, 0.5)),
+}
+EXTRA_KPI = ((50.0, 5.0), (75.0, 8.0))
+
+DEFAULT_BURST_ROWS = 30
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def kpi_columns(n_kpis=len(BASE_KPIS)):
+    names = list(BASE_KPIS)[:n_kpis]
+    names += [f"kpi_{i}" for i in range(len(BASE_KPIS) + 1, n_kpis + 1)]
+    return names
+
+
+def _burst_mask(n_rows, anomaly_rate, burst_rows, rng):
+    """
+    Masque des lignes anormales : rafales contiguës de `burst_rows` lignes
+    couvrant environ `anomaly_rate` des lignes
+    """
+    mask = np.zeros(n_rows, dtype=bool)
+    n_bursts = int(round(n_rows * anomaly_rate / burst_rows))
+    if n_bursts == 0 or n_rows == 0:
+        return mask
+    starts = rng.integers(0, max(n_rows - burst_rows, 1), size=n_bursts)
+    # Différences cumulées : +1 au début de chaque rafale, -1 à la fin
+    edges = np.zeros(n_rows + 1, dtype=np.int64)
+    np.add.at(edges, starts, 1)
+    np.add.at(edges, np.minimum(starts + burst_rows, n_rows), -1)
+    return np.cumsum(edges[:-1]) > 0
+
+
+def generate_kpi_table(n_rows, n_kpis=len(BASE_KPIS), anomaly_rate=0.05,
+                       burst_rows=DEFAULT_BURST_ROWS, n_cells=None, missing_rate=0.0,
+                       start_time=0, seed=0):
+    """
+    Génère n_rows lignes KPI : renvoie (DataFrame, étiquettes)
+    - étiquettes : True pour les lignes injectées comme anomalies
+    - n_cells : ajoute une colonne cell_id (entraînement par partition)
+    - missing_rate : proportion de valeurs manquantes (NaN)
+    """
+    rng = np.random.default_rng(seed)
+    labels = _burst_mask(n_rows, anomaly_rate, burst_rows, rng)
+
+    data = {"time": np.arange(start_time, start_time + n_rows, dtype=np.int64)}
+    for name in kpi_columns(n_kpis):
+        (mean, std), (attack_mean, attack_std) = BASE_KPIS.get(name, EXTRA_KPI)
+        values = rng.standard_normal(n_rows)
+        values *= np.where(labels, attack_std, std)
+        values += np.where(labels, attack_mean, mean)
+        if name == "packet_loss":
+            np.abs(values, out=values)
+        if missing_rate:
+            values[rng.random(n_rows) < missing_rate] = np.nan
+        data[name] = values
+
+    if n_cells:
+        data["cell_id"] = rng.integers(0, n_cells, size=n_rows)
+
+    return pd.DataFrame(data), labels
+
+
+def write_kpi_csv(path, n_rows, chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, labels_path=None, **kwargs):
+    """
+    Écrit une table KPI synthétique bloc par bloc (10^8 lignes sans tout
+    matérialiser). Les étiquettes peuvent être écrites dans un .npy à part.
+    """
+    labels_out = None
+    if labels_path:
+        labels_out = np.lib.format.open_memmap(labels_path, mode="w+", dtype=bool, shape=(n_rows,))
+
+    for i, start in enumerate(range(0, n_rows, chunk_rows)):
+        n = min(chunk_rows, n_rows - start)
+        chunk, labels = generate_kpi_table(n, start_time=start, seed=seed + i, **kwargs)
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        if labels_out is not None:
+            labels_out[start:start + n] = labels
+
+    if labels_out is not None:
+        labels_out.flush()
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère une table KPI 5G synthétique")
+    parser.add_argument("output", help="Fichier CSV de sortie")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--kpis", type=int, default=len(BASE_KPIS), help="Nombre de colonnes KPI")
+    parser.add_argument("--anomaly-rate", type=float, default=0.05)
+    parser.add_argument("--cells", type=int, help="Ajoute une colonne cell_id")
+    parser.add_argument("--missing-rate", type=float, default=0.0)
+    parser.add_argument("--labels", help="Fichier .npy des étiquettes injectées")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    write_kpi_csv(args.output, args.rows, seed=args.seed, labels_path=args.labels,
+                  n_kpis=args.kpis, anomaly_rate=args.anomaly_rate,
+                  n_cells=args.cells, missing_rate=args.missing_rate)
+
+
+if __name__ == "__main__":
+    main()
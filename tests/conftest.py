@@ -0,0 +1,33 @@
+# conftest.py
+# Fixtures communes aux tests : modules à la racine du dépôt importables,
+# tables KPI synthétiques (synth.py) et modèle entraîné une fois par session
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import train_isolation_forest  # noqa: E402
+from preprocess import preprocess_frame  # noqa: E402
+from synth import generate_kpi_table  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def kpi_frame():
+    """
+    2 000 lignes KPI avec rafales d'anomalies et quelques valeurs manquantes
+    """
+    frame, _ = generate_kpi_table(2_000, missing_rate=0.01, seed=1)
+    return frame
+
+
+@pytest.fixture(scope="session")
+def trained(kpi_frame):
+    """
+    (df_numeric, X_scaled, modèle) sur kpi_frame
+    """
+    df_numeric, X_scaled = preprocess_frame(kpi_frame)
+    model = train_isolation_forest(X_scaled, n_estimators=50, n_jobs=1)
+    return df_numeric, X_scaled, model
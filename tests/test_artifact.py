@@ -0,0 +1,36 @@
+import joblib
+import numpy as np
+import pytest
+
+from artifact import (ARTIFACT_VERSION, build_artifact, load_artifact, predict_with_artifact,
+                      save_artifact, transform_with_artifact)
+
+
+def test_artifact_round_trip(tmp_path, kpi_frame, trained):
+    df_numeric, X_scaled, model = trained
+    artifact = build_artifact(model, df_numeric, X=X_scaled)
+    path = save_artifact(artifact, str(tmp_path / "models" / "artifact.joblib"))
+
+    loaded = load_artifact(path)
+    assert loaded["version"] == ARTIFACT_VERSION
+    assert loaded["threshold"] == artifact["threshold"]
+    assert loaded["stats"]["columns"] == artifact["stats"]["columns"]
+    np.testing.assert_array_equal(loaded["train_scores"], artifact["train_scores"])
+    assert loaded["prefilter"].keys() == artifact["prefilter"].keys()
+
+    # Prétraitement et scores identiques avec l'artefact rechargé (mémoire mappée)
+    X = transform_with_artifact(kpi_frame, loaded)
+    np.testing.assert_allclose(X, X_scaled)
+    labels, scores = predict_with_artifact(loaded, kpi_frame, X)
+    ref_labels, ref_scores = predict_with_artifact(artifact, kpi_frame, X_scaled)
+    np.testing.assert_array_equal(labels, ref_labels)
+    np.testing.assert_array_equal(scores, ref_scores)
+
+
+def test_artifact_version_mismatch_is_rejected(tmp_path, trained):
+    df_numeric, _, model = trained
+    artifact = build_artifact(model, df_numeric)
+    path = str(tmp_path / "old.joblib")
+    joblib.dump({**artifact, "version": ARTIFACT_VERSION - 1}, path)
+    with pytest.raises(ValueError, match="version"):
+        load_artifact(path)
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from batch import SUMMARY_FIELDS, output_paths, process_file
+from features import DEFAULT_EWMA_SPANS, DEFAULT_WINDOWS
+from main import main
+from results_db import ResultsDB
+
+OPTIONS = {"time_range": None, "all_rows": False, "features": False,
+           "feature_windows": DEFAULT_WINDOWS, "ewma_spans": DEFAULT_EWMA_SPANS,
+           "prefilter": False, "audit_rate": 0.0}
+
+
+def test_output_names_do_not_collide(tmp_path):
+    files = [str(tmp_path / "site1" / "kpi.csv"), str(tmp_path / "site2" / "kpi.csv"),
+             str(tmp_path / "site1" / "kpi.parquet"), str(tmp_path / "site2" / "other.npy")]
+    outputs = output_paths(files, str(tmp_path / "out"), "csv")
+
+    assert len(set(outputs)) == len(files)
+    assert [os.path.basename(p) for p in outputs] == [
+        "site1__kpi_csv_anomalies.csv", "site2__kpi_anomalies.csv",
+        "site1__kpi_parquet_anomalies.csv", "site2__other_anomalies.csv"]
+    assert all(os.path.dirname(p) == str(tmp_path / "out") for p in outputs)
+
+
+def test_output_extension_follows_the_format(tmp_path):
+    (output,) = output_paths([str(tmp_path / "kpi.csv")], str(tmp_path), "parquet")
+    assert output == str(tmp_path / "kpi_anomalies.parquet")
+
+
+def test_unreadable_file_is_reported_in_its_summary_row(tmp_path):
+    path = tmp_path / "missing.csv"
+    summary = process_file(str(path), str(tmp_path / "out.csv"), OPTIONS)
+
+    assert summary["error"].startswith("FileNotFoundError")
+    assert summary["rows"] == 0 and summary["anomalies"] == 0
+    assert summary["total_s"] >= 0
+    assert set(summary) <= set(SUMMARY_FIELDS)
+    assert not os.path.exists(tmp_path / "out.csv")
+
+
+def test_empty_file_is_reported(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("time,latency\n")
+    summary = process_file(str(path), str(tmp_path / "out.csv"), OPTIONS)
+    assert summary["error"].startswith("ValueError")
+    assert summary["rows"] == 0
+
+
+def test_scored_file_writes_its_anomalies(tmp_path, kpi_frame):
+    path = tmp_path / "kpi.csv"
+    kpi_frame.to_csv(path, index=False)
+    output = tmp_path / "kpi_anomalies.csv"
+    summary = process_file(str(path), str(output), OPTIONS)
+
+    assert summary["error"] == ""
+    assert summary["rows"] == len(kpi_frame)
+    result = pd.read_csv(output)
+    assert len(result) == summary["anomalies"] > 0
+    assert (result["anomaly"] == -1).all()
+    assert result["anomaly_score"].min() == summary["score_min"]
+
+
+def test_results_db_error_is_reported_and_the_batch_continues(tmp_path, kpi_frame, monkeypatch):
+    inputs = tmp_path / "sites"
+    inputs.mkdir()
+    for name in ("a", "b"):
+        kpi_frame.to_csv(inputs / f"{name}.csv", index=False)
+    output_dir, db_path = tmp_path / "out", str(tmp_path / "results.db")
+
+    insert = ResultsDB.insert
+    calls = []
+
+    def failing_insert(self, *args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database or disk is full")
+        return insert(self, *args, **kwargs)
+
+    monkeypatch.setattr(ResultsDB, "insert", failing_insert)
+    with pytest.raises(SystemExit, match="1 fichier"):
+        main(["--inputs", str(inputs), "--output-dir", str(output_dir),
+              "--results-db", db_path, "--workers", "1"])
+
+    summary = pd.read_csv(output_dir / "summary.csv", keep_default_na=False)
+    assert len(summary) == 2
+    errors = summary["error"].tolist()
+    assert sorted(bool(e) for e in errors) == [False, True]
+    assert "database or disk is full" in next(e for e in errors if e)
+
+    # Le fichier suivant est enregistré ; l'exécution en échec reste incomplète
+    with ResultsDB(db_path) as db:
+        runs = db.runs()
+    assert sorted(runs["complete"].tolist()) == [0, 1]
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from compiled_forest import compile_forest
+from model import predict_anomalies
+
+# Écart de score toléré (float32 : seuils arrondis vers -inf, comparaisons exactes)
+SCORE_TOLERANCE = 1e-9
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("n_rows", [1, 10, 300, 2_000])
+def test_compiled_matches_sklearn(trained, dtype, n_rows):
+    _, X_scaled, model = trained
+    X = X_scaled[:n_rows]
+    labels_ref, scores_ref = predict_anomalies(model, X)
+    # crossover=None : la forme compilée est utilisée quelle que soit la taille
+    labels, scores = compile_forest(model, dtype=dtype, crossover=None).predict_anomalies(X)
+
+    np.testing.assert_array_equal(labels, labels_ref)
+    assert np.abs(scores - scores_ref).max() <= SCORE_TOLERANCE
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_compiled_handles_missing_values(trained, dtype):
+    _, X_scaled, model = trained
+    X = X_scaled[:200].copy()
+    X[::7, 1] = np.nan
+    labels_ref, scores_ref = predict_anomalies(model, X)
+    labels, scores = compile_forest(model, dtype=dtype, crossover=None).predict_anomalies(X)
+
+    np.testing.assert_array_equal(labels, labels_ref)
+    assert np.abs(scores - scores_ref).max() <= SCORE_TOLERANCE
+
+
+def test_large_calls_delegate_to_sklearn(trained):
+    _, X_scaled, model = trained
+    compiled = compile_forest(model, crossover=500)
+    labels_ref, scores_ref = predict_anomalies(model, X_scaled)
+    labels, scores = compiled.predict_anomalies(X_scaled)
+
+    np.testing.assert_array_equal(labels, labels_ref)
+    np.testing.assert_array_equal(scores, scores_ref)
@@ -0,0 +1,53 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import load_and_preprocess_cached
+from preprocess import load_and_preprocess_data
+from readers import write_kpis
+
+
+def test_npy_columns_file_is_part_of_the_key(tmp_path, kpi_frame):
+    path = str(tmp_path / "kpi.npy")
+    write_kpis(kpi_frame, path)
+    cache_dir = str(tmp_path / "cache")
+    _, df_numeric, X_scaled = load_and_preprocess_cached(path, cache_dir)
+    assert isinstance(X_scaled, np.memmap)
+
+    # Colonnes renommées dans le .meta.json, matrice .npy inchangée
+    with open(f"{path}.meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["columns"] = [f"kpi_{c}" for c in meta["columns"]]
+    with open(f"{path}.meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    _, renamed, _ = load_and_preprocess_cached(path, cache_dir)
+    assert renamed.columns.tolist() == [f"kpi_{c}" for c in df_numeric.columns]
+
+
+def test_warm_start_maps_frames_without_pickling_them(tmp_path, kpi_frame):
+    path = str(tmp_path / "kpi.csv")
+    frame = kpi_frame.assign(cell=[f"c{i % 3}" for i in range(len(kpi_frame))])
+    frame.to_csv(path, index=False)
+    cache_dir = str(tmp_path / "cache")
+
+    cold = load_and_preprocess_cached(path, cache_dir)
+    warm = load_and_preprocess_cached(path, cache_dir)
+    expected_df, expected_numeric, expected_X = load_and_preprocess_data(path)
+
+    for df, df_numeric, X_scaled in (cold, warm):
+        pd.testing.assert_frame_equal(df, expected_df)
+        pd.testing.assert_frame_equal(df_numeric, expected_numeric)
+        np.testing.assert_array_equal(X_scaled, expected_X)
+        # Colonnes numériques : vues en lecture seule sur les .npy de la version
+        assert not df_numeric["latency"].to_numpy().flags.writeable
+        assert not df["dl_throughput"].to_numpy().flags.writeable
+
+    # Seule la colonne texte passe par pickle
+    (entry,) = os.listdir(cache_dir)
+    version = os.path.join(cache_dir, entry, open(os.path.join(cache_dir, entry, "CURRENT")).read())
+    assert sorted(f for f in os.listdir(version) if f.endswith(".pkl")) == ["frame.pkl"]
+    others, index = pd.read_pickle(os.path.join(version, "frame.pkl"))
+    assert others.columns.tolist() == ["cell"] and index is None
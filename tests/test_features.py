@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import TemporalFeatureState, add_temporal_features, feature_config, feature_names
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 7, 300])
+def test_streaming_features_match_batch(kpi_frame, chunk_rows):
+    frame = kpi_frame.iloc[:900]
+    config = feature_config(frame)
+    batch = add_temporal_features(frame, config)
+
+    state = TemporalFeatureState(config)
+    streamed = pd.concat([state.transform(frame.iloc[start:start + chunk_rows])
+                          for start in range(0, len(frame), chunk_rows)])
+
+    names = feature_names(config)
+    np.testing.assert_allclose(streamed[names].to_numpy(), batch[names].to_numpy(),
+                               rtol=1e-9, atol=1e-9, equal_nan=True)
+    assert state.rows == len(frame)
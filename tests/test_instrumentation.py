@@ -0,0 +1,33 @@
+import threading
+import time
+
+from instrumentation import StageRecorder
+
+
+def _burn(stop):
+    while not stop.is_set():
+        sum(range(10_000))
+
+
+def test_stage_cpu_is_per_thread_and_process_cpu_is_reported():
+    recorder = StageRecorder()
+    stop = threading.Event()
+    burner = threading.Thread(target=_burn, args=(stop,))
+    burner.start()
+    try:
+        # L'étape attend pendant qu'un autre thread consomme du CPU
+        with recorder.stage("wait", rows=10):
+            time.sleep(0.3)
+    finally:
+        stop.set()
+        burner.join()
+
+    totals = recorder.summary()["wait"]
+    assert totals["cpu_s"] < 0.05
+    assert totals["process_cpu_s"] > 0.1
+    event = recorder.report()["events"][0]
+    assert event["cpu_s"] == totals["cpu_s"] and event["process_cpu_s"] == totals["process_cpu_s"]
+
+    text = recorder.prometheus()
+    assert 'kpi_stage_cpu_seconds_total{stage="wait"}' in text
+    assert 'kpi_stage_process_cpu_seconds_total{stage="wait"}' in text
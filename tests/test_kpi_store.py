@@ -0,0 +1,53 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from kpi_store import MANIFEST, KpiStore, build_store
+
+
+def _numeric(frame):
+    return frame.select_dtypes(include=[np.number]).astype(np.float64)
+
+
+def test_chunked_build_matches_source(tmp_path, kpi_frame):
+    path = tmp_path / "kpi.csv"
+    kpi_frame.to_csv(path, index=False)
+    store = build_store(str(path), str(tmp_path / "store"), bucket_width=500, chunk_rows=128)
+    expected = _numeric(kpi_frame).sort_values("time", kind="stable", ignore_index=True)
+    pd.testing.assert_frame_equal(store.query(), expected)
+    window = store.query(300, 900)
+    pd.testing.assert_frame_equal(
+        window, expected[expected["time"].between(300, 900)].reset_index(drop=True))
+
+
+def test_appends_write_segments_not_partitions(tmp_path, kpi_frame):
+    frame = _numeric(kpi_frame)
+    store = KpiStore.create(str(tmp_path / "store"), frame.columns, bucket_width=1e9)
+    for start in range(0, len(frame), 100):
+        store.append(frame.iloc[start:start + 100])
+    (partition,) = store.manifest["partitions"]
+    # 20 ajouts dans la même tranche : fusion par taille, O(log n) segments
+    assert len(partition["segments"]) <= 5
+    files = {name for name in os.listdir(store.root) if name.endswith(".npy")}
+    assert files == {s["file"] for s in partition["segments"]}
+    pd.testing.assert_frame_equal(store.query(), frame.reset_index(drop=True))
+    assert store.tail(10)["time"].tolist() == frame["time"].iloc[-10:].tolist()
+
+
+def test_single_file_manifest_is_still_readable(tmp_path, kpi_frame):
+    frame = _numeric(kpi_frame).iloc[:50]
+    store = KpiStore.create(str(tmp_path / "store"), frame.columns, bucket_width=1e9)
+    store.append(frame)
+    # Manifeste de l'ancien format : un champ "file" par partition
+    manifest = store.manifest
+    for p in manifest["partitions"]:
+        p["file"] = p.pop("segments")[0]["file"]
+    del manifest["next_segment"]
+    with open(os.path.join(store.root, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    reopened = KpiStore(store.root)
+    pd.testing.assert_frame_equal(reopened.query(), frame.reset_index(drop=True))
+    reopened.append(frame)
+    assert reopened.n_rows == 100
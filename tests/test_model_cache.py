@@ -0,0 +1,30 @@
+import pickle
+
+from artifact import build_artifact
+from model_cache import ModelCache, artifact_nbytes, canonical_params, config_key, model_nbytes
+
+
+def test_fraction_and_count_of_features_share_a_key():
+    default = {"contamination": 0.05, "n_estimators": 200, "max_features": 1.0}
+    chosen = {"n_estimators": 200, "max_features": 5, "contamination": 0.05}
+    assert (config_key("data", **canonical_params(default, 5))
+            == config_key("data", **canonical_params(chosen, 5)))
+    assert canonical_params({"max_features": 0.5}, 5)["max_features"] == 2
+    assert canonical_params({"max_features": 0.01}, 5)["max_features"] == 1
+
+
+def test_size_counts_trees_train_scores_and_prefilter(trained):
+    df_numeric, X_scaled, model = trained
+    artifact = build_artifact(model, df_numeric, X_scaled)
+
+    # Tableaux des arbres : du même ordre que le modèle sérialisé
+    size = model_nbytes(model)
+    assert 0.8 < size / len(pickle.dumps(model)) < 1.2
+    prefilter = artifact["prefilter"]["median"].nbytes + artifact["prefilter"]["scale"].nbytes
+    assert artifact_nbytes(artifact) == size + artifact["train_scores"].nbytes + prefilter
+
+    cache = ModelCache(budget_bytes=2 * artifact_nbytes(artifact) + 1)
+    for key in "abc":
+        assert cache.put(key, artifact)
+    assert len(cache) == 2 and "a" not in cache and cache.evictions == 1
+    assert cache.nbytes == 2 * artifact_nbytes(artifact)
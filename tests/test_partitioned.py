@@ -0,0 +1,76 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from model import predict_anomalies
+from partitioned import train_per_partition
+
+
+@pytest.fixture(scope="module")
+def partitioned(trained):
+    _, X_scaled, _ = trained
+    # Trois cellules assez grandes, une trop petite pour avoir son modèle
+    keys = np.repeat(np.array(["a", "b", "c", "d"]), [700, 650, 610, len(X_scaled) - 1960])
+    forest = train_per_partition(X_scaled, keys, n_workers=1, min_rows=64,
+                                 n_estimators=20, random_state=0)
+    return X_scaled, keys, forest
+
+
+def test_small_partitions_use_the_fallback(partitioned):
+    _, _, forest = partitioned
+    assert sorted(forest.models) == ["a", "b", "c"]
+    assert forest.model_for("d") is forest.fallback
+    assert forest.model_for("inconnue") is forest.fallback
+
+
+def test_rows_are_scored_by_their_partition_model(partitioned):
+    X, keys, forest = partitioned
+    # Clés mélangées : le routage ne dépend pas de l'ordre des lignes
+    rng = np.random.default_rng(0)
+    shuffled = rng.permutation(keys)
+    predictions, scores = forest.predict_anomalies(X, shuffled)
+
+    for key in ["a", "b", "c", "d"]:
+        rows = shuffled == key
+        expected_predictions, expected_scores = predict_anomalies(forest.model_for(key), X[rows])
+        np.testing.assert_array_equal(predictions[rows], expected_predictions)
+        np.testing.assert_allclose(scores[rows], expected_scores)
+
+
+def test_unknown_keys_are_scored_by_the_fallback(partitioned):
+    X, _, forest = partitioned
+    predictions, scores = forest.predict_anomalies(X[:100], np.full(100, "z"))
+    expected_predictions, expected_scores = predict_anomalies(forest.fallback, X[:100])
+    np.testing.assert_array_equal(predictions, expected_predictions)
+    np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_only_fallback_when_every_partition_is_small(trained):
+    _, X_scaled, _ = trained
+    keys = np.arange(len(X_scaled)) % 50
+    forest = train_per_partition(X_scaled[:500], keys[:500], n_workers=1, min_rows=64,
+                                 n_estimators=10)
+    assert forest.models == {}
+    assert forest.model_for(3) is forest.fallback
+
+
+def test_fit_error_is_raised_and_shared_memory_released(trained, monkeypatch):
+    _, X_scaled, _ = trained
+    created = []
+    original = shared_memory.SharedMemory
+
+    def tracking(*args, **kwargs):
+        shm = original(*args, **kwargs)
+        created.append(shm.name)
+        return shm
+
+    monkeypatch.setattr(shared_memory, "SharedMemory", tracking)
+    keys = np.repeat([0, 1], len(X_scaled) // 2)
+    # Erreur d'entraînement dans le pool : c'est elle qui doit remonter
+    with pytest.raises(ValueError, match="n_estimators"):
+        train_per_partition(X_scaled[:len(keys)], keys, n_workers=1, n_estimators=0)
+
+    assert len(created) == 1
+    with pytest.raises(FileNotFoundError):
+        original(name=created[0])
@@ -0,0 +1,26 @@
+import numpy as np
+
+from model import score_samples_batched
+from prefilter import fit_prefilter, predict_anomalies_cascade, robust_z_max, score_upper_bound
+
+
+def test_skipped_rows_get_the_forest_upper_bound(trained):
+    _, X_scaled, model = trained
+    prefilter = fit_prefilter(X_scaled, score_samples_batched(model, X_scaled), model.offset_,
+                              model=model)
+    predictions, scores, info = predict_anomalies_cascade(model, X_scaled, prefilter, audit_rate=0.0)
+
+    assert info["forest_rows"] < len(X_scaled)
+    assert np.isfinite(scores).all()
+    bound = score_upper_bound(model)
+    assert scores.max() == bound
+    assert (score_samples_batched(model, X_scaled) - model.offset_).max() <= bound
+
+
+def test_threshold_is_a_low_quantile_of_training_anomalies(trained):
+    _, X_scaled, model = trained
+    raw_scores = score_samples_batched(model, X_scaled)
+    prefilter = fit_prefilter(X_scaled, raw_scores, model.offset_, quantile=0.1, sample_rows=500)
+
+    z = robust_z_max(X_scaled, prefilter)[raw_scores < model.offset_]
+    assert np.mean(z > prefilter["threshold"]) >= 0.9 - 1e-9
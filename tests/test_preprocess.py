@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocess import iter_csv_rows, load_preprocessed_matrix
+
+
+@pytest.mark.parametrize("text", [
+    # Saut de ligne entre guillemets : comptage trop haut
+    'site,a,b\n"x\ny",1,2\nz,3,\nw,5,7\n',
+    # Fins de ligne \r : comptage trop bas
+    "site,a,b\rx,1,2\rz,3,\rw,5,7\r",
+])
+def test_lean_matrix_ignores_wrong_row_estimate(tmp_path, text):
+    path = tmp_path / "kpi.csv"
+    path.write_bytes(text.encode())
+    X, stats = load_preprocessed_matrix(path, chunksize=2)
+    assert X.shape == (3, 2)
+    assert stats["n_rows"] == 3
+    # Médiane de b (2, 7) utilisée pour la ligne manquante
+    assert stats["medians"]["b"] == 4.5
+
+
+def test_iter_csv_rows_returns_raw_rows(tmp_path, kpi_frame):
+    path = tmp_path / "kpi.csv"
+    kpi_frame.to_csv(path, index=False)
+    rows = np.array([0, 3, 999, 1500, 1999])
+    selected = pd.concat(list(iter_csv_rows(path, rows, chunksize=256)))
+    assert selected.index.tolist() == rows.tolist()
+    # Valeurs brutes : les valeurs manquantes restent NaN
+    pd.testing.assert_frame_equal(selected, kpi_frame.iloc[rows], check_exact=False)
+
+
+def test_streaming_stats_match_in_memory_preprocessing(tmp_path, kpi_frame):
+    from preprocess import (fit_streaming_stats, iter_preprocessed_chunks, preprocess_frame,
+                            stats_from_frame)
+
+    path = tmp_path / "kpi.csv"
+    kpi_frame.to_csv(path, index=False)
+    df_numeric, X_scaled = preprocess_frame(pd.read_csv(path))
+    expected = stats_from_frame(df_numeric)
+
+    stats = fit_streaming_stats(path, chunksize=300)
+    assert stats["columns"] == expected["columns"]
+    assert stats["n_rows"] == expected["n_rows"]
+    # Sketch exact sous sa capacité : mêmes médianes
+    pd.testing.assert_series_equal(stats["medians"], expected["medians"], check_names=False)
+    np.testing.assert_allclose(stats["mean"], expected["mean"], rtol=1e-10)
+    np.testing.assert_allclose(stats["scale"], expected["scale"], rtol=1e-10)
+
+    streamed = np.concatenate([X for _, X in iter_preprocessed_chunks(path, 300, stats)])
+    np.testing.assert_allclose(streamed, X_scaled, rtol=1e-9, atol=1e-9)
+
+    # Mode allégé : même matrice en float32
+    X_lean, lean_stats = load_preprocessed_matrix(path, chunksize=300)
+    assert lean_stats["columns"] == expected["columns"]
+    np.testing.assert_allclose(X_lean, X_scaled, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("text", ["", "time,latency\n"])
+def test_lean_matrix_rejects_empty_file(tmp_path, text):
+    path = tmp_path / "empty.csv"
+    path.write_text(text)
+    with pytest.raises(ValueError):
+        load_preprocessed_matrix(path)
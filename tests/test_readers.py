@@ -0,0 +1,20 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from readers import read_kpis, write_kpis
+
+
+def test_npy_time_range_on_unsorted_rows(tmp_path, kpi_frame):
+    frame = kpi_frame.select_dtypes(include=[np.number]).astype(np.float64)
+    shuffled = frame.sample(frac=1.0, random_state=0).reset_index(drop=True)
+    path = str(tmp_path / "kpi.npy")
+    write_kpis(shuffled, path)
+    with open(f"{path}.meta.json", encoding="utf-8") as f:
+        assert json.load(f)["sorted_by"] is None
+
+    columns = ["latency", "time"]
+    window = read_kpis(path, columns=columns, time_range=(100, 400))
+    expected = shuffled.loc[shuffled["time"].between(100, 400), columns].reset_index(drop=True)
+    pd.testing.assert_frame_equal(window, expected)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+from results_db import ResultsDB, run_source
+
+
+def _frame():
+    frame = pd.DataFrame({"time": [10.0, 11.0, 12.0, 13.0], "latency": [1.0, 9.0, 2.0, 8.0],
+                          "packet_loss": [0.1, 0.9, 0.2, np.nan]}, index=[100, 101, 102, 103])
+    scores = np.array([0.2, -0.3, 0.1, np.nan])
+    labels = np.array([1, -1, 1, -1])
+    return frame, scores, labels
+
+
+def test_insert_and_query(tmp_path):
+    frame, scores, labels = _frame()
+    with ResultsDB(str(tmp_path / "results.sqlite")) as db:
+        run_id = db.start_run(run_source("kpi.csv"), "v1", threshold=-0.5)
+        assert db.latest_run(run_source("kpi.csv")) is None     # Exécution pas encore complète
+        assert db.insert(run_id, frame, scores, labels, "v1") == 4
+        db.finish_run(run_id)
+
+        run = db.latest_run(run_source("kpi.csv"))
+        assert (run["id"], run["rows"], run["anomalies"], run["complete"]) == (run_id, 4, 2, 1)
+        assert db.run_columns(run_id) == ["latency", "packet_loss"]
+
+        anomalies = db.query(run_id, label=-1, order="time")
+        assert anomalies.index.tolist() == [101, 103]
+        assert anomalies["model_version"].tolist() == ["v1", "v1"]
+        assert np.isnan(anomalies.loc[103, "packet_loss"])
+
+        # Tri par score (plus anormales d'abord), pages LIMIT / OFFSET, filtres
+        assert db.query(run_id, max_score=0.15).index.tolist() == [101, 102]
+        assert db.query(run_id, limit=1, offset=1, min_score=-1).index.tolist() == [102]
+        assert db.count(run_id, start=11, end=12)[0] == 2
+
+        source_rows, stored_scores, stored_labels = db.scores(run_id)
+        order = np.argsort(source_rows)
+        np.testing.assert_array_equal(source_rows[order], frame.index)
+        np.testing.assert_array_equal(stored_scores[order], scores)     # NULL -> NaN
+        np.testing.assert_array_equal(stored_labels[order], labels)
+
+
+def test_runs_are_separated_and_latest_wins(tmp_path):
+    frame, scores, labels = _frame()
+    with ResultsDB(str(tmp_path / "results.sqlite")) as db:
+        ids = []
+        for version in ("v1", "v2"):
+            run_id = db.start_run(run_source("kpi.csv", (10, 12)), version)
+            db.insert(run_id, frame.iloc[:2], scores[:2], labels[:2], version)
+            db.finish_run(run_id)
+            ids.append(run_id)
+        assert db.latest_run(run_source("kpi.csv", (10, 12)))["id"] == ids[1]
+        assert db.find_run(run_source("kpi.csv", (10, 12)), "v1") == ids[0]
+        assert db.count(ids[0])[0] == 2
+        db.delete_run(ids[0])
+        assert db.count()[0] == 2
+
+
+def test_iter_query_pages_match_query(tmp_path):
+    rng = np.random.default_rng(0)
+    n_rows = 1000
+    frame = pd.DataFrame({"time": np.arange(n_rows, dtype=float), "latency": rng.random(n_rows)})
+    # Scores répétés (égalités départagées par rowid) et quelques NULL
+    scores = np.round(rng.normal(size=n_rows), 1)
+    scores[::97] = np.nan
+    with ResultsDB(str(tmp_path / "results.sqlite")) as db:
+        run_id = db.start_run("kpi.csv")
+        db.insert(run_id, frame, scores, np.where(scores < 0, -1, 1))
+        for bounds in ({}, {"max_score": 0.0}, {"min_score": -1.0, "max_score": 0.5}):
+            pages = list(db.iter_query(run_id, page_rows=64, **bounds))
+            assert all(len(p) <= 64 for p in pages)
+            pd.testing.assert_frame_equal(pd.concat(pages), db.query(run_id, **bounds))
+
+
+def test_queries_use_run_indexes(tmp_path):
+    with ResultsDB(str(tmp_path / "results.sqlite")) as db:
+        plan = " ".join(str(row) for row in db._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM detections WHERE run_id = 1 AND time >= 5"))
+        assert "idx_detections_run_time" in plan
+        plan = " ".join(str(row) for row in db._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM detections WHERE run_id = 1 "
+            "AND (score, rowid) > (0.5, 10) ORDER BY score, rowid LIMIT 5"))
+        assert "idx_detections_score" in plan and "TEMP B-TREE" not in plan
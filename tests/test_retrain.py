@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from retrain import BackgroundRetrainer, ModelHolder, RollingWindow
+
+COLUMNS = ["dl_throughput", "ul_throughput", "latency", "packet_loss"]
+
+
+@pytest.fixture
+def window(kpi_frame):
+    window = RollingWindow(COLUMNS, capacity=1000)
+    window.append(kpi_frame.iloc[:1000])
+    return window
+
+
+def test_rolling_window_keeps_the_latest_rows_in_order():
+    window = RollingWindow(["x"], capacity=5)
+    window.append(pd.DataFrame({"x": [0.0, 1.0, 2.0]}))
+    window.append(pd.DataFrame({"x": [3.0, 4.0, 5.0, 6.0]}))
+    assert len(window) == 5
+    assert window.snapshot()["x"].tolist() == [2.0, 3.0, 4.0, 5.0, 6.0]
+
+
+def test_swap_publishes_only_a_complete_model(window):
+    old = {"model": None, "features": None}
+    holder = ModelHolder(old)
+    seen = []
+
+    def prepare(artifact):
+        # Pendant la construction, les lecteurs voient encore l'ancien modèle
+        seen.append(holder.get())
+        return artifact
+
+    retrainer = BackgroundRetrainer(holder, window, prepare=prepare, n_estimators=10, n_jobs=1)
+    assert retrainer.retrain_now()
+
+    assert seen == [old]
+    new = holder.get()
+    assert new is not old
+    assert hasattr(new["model"], "offset_") and new["train_scores"] is not None
+    assert holder.version == new["model_version"] == 2
+    assert len(holder.swaps) == 1
+    assert retrainer.metrics()["last_window_rows"] == 1000
+
+
+def test_failed_retrain_keeps_the_current_model(window):
+    old = {"model": None, "features": None}
+    holder = ModelHolder(old)
+
+    def prepare(artifact):
+        raise RuntimeError("compilation impossible")
+
+    retrainer = BackgroundRetrainer(holder, window, prepare=prepare, n_estimators=10, n_jobs=1)
+    assert not retrainer.retrain_now()
+    assert holder.get() is old and holder.version == 1
+    assert retrainer.last_error == "compilation impossible"
+    assert not retrainer.running
+
+
+def test_small_window_does_not_retrain():
+    holder = ModelHolder({"model": None, "features": None})
+    window = RollingWindow(COLUMNS, capacity=100)
+    window.append(pd.DataFrame(np.ones((10, len(COLUMNS))), columns=COLUMNS))
+    retrainer = BackgroundRetrainer(holder, window, min_rows=256)
+    assert not retrainer.retrain_now()
+    assert holder.version == 1 and "10 lignes" in retrainer.last_error
+
+
+def test_thread_retrains_on_request(window):
+    holder = ModelHolder({"model": None, "features": None})
+    retrainer = BackgroundRetrainer(holder, window, n_estimators=10, n_jobs=1)
+    retrainer.start()
+    try:
+        retrainer.request_retrain()
+        for _ in range(600):
+            if holder.version == 2:
+                break
+            retrainer.join(0.05)
+    finally:
+        retrainer.stop()
+        retrainer.join(5)
+    assert holder.version == 2
+    assert not retrainer.is_alive()
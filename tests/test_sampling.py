@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from sampling import reservoir_sample_csv
+
+
+def _write(tmp_path, n_rows):
+    path = tmp_path / "kpi.csv"
+    pd.DataFrame({"time": np.arange(n_rows), "latency": np.arange(n_rows) * 0.5}).to_csv(
+        path, index=False)
+    return path
+
+
+def test_small_file_is_kept_whole(tmp_path):
+    path = _write(tmp_path, 50)
+    sample, seen = reservoir_sample_csv(path, n_samples=100, chunksize=16)
+    assert seen == 50
+    assert sample["time"].tolist() == list(range(50))
+
+
+def test_sample_rows_are_distinct_source_rows(tmp_path):
+    path = _write(tmp_path, 1000)
+    sample, seen = reservoir_sample_csv(path, n_samples=64, chunksize=37, random_state=3)
+    assert seen == 1000
+    assert len(sample) == 64
+    assert sample["time"].is_unique
+    np.testing.assert_array_equal(sample["latency"], sample["time"] * 0.5)
+
+
+def test_every_row_has_the_same_inclusion_probability(tmp_path):
+    n_rows, n_samples, n_draws = 200, 20, 400
+    path = _write(tmp_path, n_rows)
+    counts = np.zeros(n_rows)
+    for seed in range(n_draws):
+        sample, _ = reservoir_sample_csv(path, n_samples=n_samples, chunksize=37, random_state=seed)
+        counts[sample["time"].astype(int)] += 1
+    # Espérance 40 par ligne : premières et dernières lignes comprises
+    expected = n_draws * n_samples / n_rows
+    assert abs(counts[:50].mean() - expected) < 6
+    assert abs(counts[-50:].mean() - expected) < 6
+    assert counts.min() > 15 and counts.max() < 70
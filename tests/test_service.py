@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from artifact import build_artifact
+from service import BatchCoalescer, parse_head
+
+
+def test_parse_head_reads_request_line_and_length():
+    method, path, version, headers, length = parse_head(
+        b"POST /score HTTP/1.1\r\nContent-Type: text/csv\r\nContent-Length: 42\r\n\r\n")
+    assert (method, path, version, length) == ("POST", "/score", "HTTP/1.1", 42)
+    assert headers["content-type"] == "text/csv"
+
+
+@pytest.mark.parametrize("head", [
+    b"GARBAGE\r\n\r\n",
+    b"POST /score\r\n\r\n",
+    b"POST /score HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+    b"POST /score HTTP/1.1\r\nContent-Length: -1\r\n\r\n",
+])
+def test_parse_head_rejects_malformed_requests(head):
+    with pytest.raises(ValueError):
+        parse_head(head)
+
+
+def test_full_queue_rejects_new_requests(trained):
+    df_numeric, _, model = trained
+    rows = df_numeric.to_numpy()[:1]
+
+    async def scenario():
+        # File d'une requête, sans boucle de scoring : la deuxième est refusée
+        coalescer = BatchCoalescer(build_artifact(model, df_numeric), max_queue=1)
+        first = asyncio.ensure_future(coalescer.score(rows))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.QueueFull):
+            await coalescer.score(rows)
+        first.cancel()
+        return coalescer.metrics()["rejected_requests"]
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,39 @@
+import queue
+import threading
+
+import pytest
+
+from streaming import LATENCY_WINDOW, StreamDetector, _batch_reader
+
+
+def test_reader_stops_when_queue_is_full():
+    # Consommateur arrêté, file pleine : le lecteur ne doit pas rester bloqué
+    out_queue = queue.Queue(maxsize=1)
+    out_queue.put("lot non consommé")
+    stop_event = threading.Event()
+    source = iter([(b"a,b", b"1,2\n"), None])
+    reader = threading.Thread(target=_batch_reader,
+                              args=(source, out_queue, stop_event, 1, 0.0, None), daemon=True)
+    reader.start()
+    stop_event.set()
+    reader.join(timeout=2.0)
+    assert not reader.is_alive()
+
+
+def test_reader_sends_batches_then_end_marker():
+    out_queue = queue.Queue(maxsize=4)
+    source = iter([(b"a,b", b"1,2\n3,4\n"), (b"a,b", b"5,6\n")])
+    _batch_reader(source, out_queue, threading.Event(), 10, 60.0, None)
+    header, block, n_rows, _ = out_queue.get_nowait()
+    assert (header, block, n_rows) == (b"a,b", b"1,2\n3,4\n5,6\n", 3)
+    assert out_queue.get_nowait() is None
+
+
+def test_latency_history_is_bounded():
+    detector = StreamDetector(holder=None)
+    for i in range(LATENCY_WINDOW + 10):
+        detector.latencies.append(i / 1000)
+    assert len(detector.latencies) == LATENCY_WINDOW
+    summary = detector.latency_summary()
+    assert summary["max_ms"] == pytest.approx(LATENCY_WINDOW + 9)
+    assert summary["p50_ms"] > 10
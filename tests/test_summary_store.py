@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from summary_store import RankedSummaryStore, build_summary_store
+
+
+@pytest.mark.parametrize("n_anomalies", [0, 1, 37, 100, 1_999, 2_000])
+def test_ranked_cut_matches_full_build(kpi_frame, n_anomalies):
+    columns = ["dl_throughput", "latency", "packet_loss"]
+    scores = np.random.default_rng(0).random(len(kpi_frame))
+    ranked = kpi_frame.iloc[np.argsort(scores, kind="stable")]
+    predictions = np.where(np.arange(len(ranked)) < n_anomalies, -1, 1)
+
+    expected = build_summary_store(ranked, predictions, columns)
+    store = RankedSummaryStore(ranked, columns, n_blocks=16).at(n_anomalies)
+
+    for label in (1, -1):
+        for column in columns:
+            got, want = store.stats(column, label), expected.stats(column, label)
+            for key in ("count", "mean", "std", "min", "max", "q1", "median", "q3"):
+                np.testing.assert_allclose(got[key], want[key], rtol=1e-9, equal_nan=True)
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from model import predict_anomalies, score_samples_batched, train_isolation_forest
+from thresholds import ScoreIndex, labels_for_rate
+
+
+@pytest.mark.parametrize("contamination", [0.01, 0.05, 0.2])
+def test_rethreshold_matches_a_model_trained_with_the_rate(trained, contamination):
+    _, X_scaled, _ = trained
+    # Même graine : seuls l'offset et donc les labels dépendent du taux
+    model = train_isolation_forest(X_scaled, n_estimators=30, contamination=contamination,
+                                   n_jobs=1, random_state=0)
+    raw_scores = score_samples_batched(model, X_scaled)
+    index = ScoreIndex(raw_scores)
+
+    assert index.threshold_for_rate(contamination) == pytest.approx(model.offset_, abs=1e-12)
+
+    predictions, _ = predict_anomalies(model, X_scaled)
+    np.testing.assert_array_equal(labels_for_rate(raw_scores, index, contamination), predictions)
+    assert index.count_below(model.offset_) == int((predictions == -1).sum())
+
+
+def test_threshold_interpolates_between_sorted_scores():
+    index = ScoreIndex([4.0, 0.0, 2.0, 1.0, 3.0])
+    assert index.threshold_for_rate(0.0) == 0.0
+    assert index.threshold_for_rate(1.0) == 4.0
+    assert index.threshold_for_rate(0.3) == pytest.approx(1.2)
+    assert index.count_below(2.0) == 2
+    assert index.rate_below(10.0) == 1.0
+
+
+def test_rate_out_of_range_is_rejected():
+    with pytest.raises(ValueError):
+        ScoreIndex([0.0, 1.0]).threshold_for_rate(1.5)
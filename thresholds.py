@@ -0,0 +1,59 @@
+# thresholds.py
+# Seuils de détection sans réentraînement :
+# - Les scores bruts (score_samples) ne dépendent pas du taux de contamination,
+#   seul l'offset de l'Isolation Forest en dépend
+# - Un tableau trié de scores permet de retrouver le seuil de n'importe quel
+#   taux (quantile, O(1)) et le nombre d'anomalies d'un seuil (O(log n))
+
+import numpy as np
+
+
+class ScoreIndex:
+    """
+    Scores bruts triés (plus bas = plus anormal)
+    """
+
+    def __init__(self, scores, presorted=False):
+        scores = np.asarray(scores, dtype=np.float64)
+        self.sorted = scores if presorted else np.sort(scores)
+
+    def __len__(self):
+        return len(self.sorted)
+
+    def threshold_for_rate(self, contamination):
+        """
+        Seuil tel qu'une proportion `contamination` des scores soit en dessous :
+        même valeur que l'offset_ d'un IsolationForest entraîné avec ce taux
+        (np.percentile, interpolation linéaire)
+        """
+        if not 0.0 <= contamination <= 1.0:
+            raise ValueError(f"Taux de contamination hors de [0, 1] : {contamination}")
+        position = contamination * (len(self.sorted) - 1)
+        low = int(np.floor(position))
+        high = min(low + 1, len(self.sorted) - 1)
+        return float(self.sorted[low] + (position - low) * (self.sorted[high] - self.sorted[low]))
+
+    def count_below(self, threshold):
+        """
+        Nombre de scores strictement inférieurs au seuil (= anomalies)
+        """
+        return int(np.searchsorted(self.sorted, threshold, side="left"))
+
+    def rate_below(self, threshold):
+        return self.count_below(threshold) / len(self.sorted) if len(self.sorted) else 0.0
+
+
+def labels_for_threshold(raw_scores, threshold):
+    """
+    Labels -1 (anomalie) / 1 (normal) pour un seuil absolu sur les scores bruts,
+    comme IsolationForest.predict avec offset_ = threshold
+    """
+    return np.where(np.asarray(raw_scores) < threshold, -1, 1)
+
+
+def labels_for_rate(raw_scores, index, contamination):
+    """
+    Labels pour un taux de contamination, seuil lu dans `index`
+    (scores d'entraînement de l'artefact)
+    """
+    return labels_for_threshold(raw_scores, index.threshold_for_rate(contamination))